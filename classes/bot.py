@@ -22,32 +22,56 @@ import os
 import sys
 import traceback
 
-from decimal import Decimal
-
 import aiohttp
 import asyncpg
 import discord
 import fantasy_names as fn
+import orjson
 
 from discord import AllowedMentions
 from discord.ext import commands
 from discord.ext.commands.cooldowns import BucketType
 from discord.http import handle_message_parameters
+from lru import LRU
 from redis import asyncio as aioredis
 
 from classes.bucket_cooldown import Cooldown, CooldownMapping
-from classes.classes import Mage, Paragon, Raider, Ranger, Ritualist, Thief, Warrior
-from classes.classes import from_string as class_from_string
 from classes.context import Context
 from classes.enums import DonatorRank
 from classes.exceptions import GlobalCooldown
 from classes.http import ProxiedClientSession
 from classes.items import ALL_ITEM_TYPES, Hand, ItemType
 from utils import i18n, paginator, random
-from utils.cache import cache
+from utils.cache import cache, shared_cache
 from utils.checks import user_is_patron
+from utils.combat.stats import STATS_QUERY, resolve_stats
 from utils.config import ConfigLoader
+from utils.cooldowns import RedisCooldowns
 from utils.i18n import _
+from utils.ipc import Channels
+from utils.leaderboard import Leaderboard
+from utils.transactions import TransactionLog, structure
+
+# How many guild prefixes are kept per cluster
+PREFIX_CACHE_SIZE = 50_000
+
+
+def _dump_user(user):
+    return orjson.dumps(user._to_minimal_user_json() if user else None)
+
+
+def _load_user(data, bot, *args, **kwargs):
+    data = orjson.loads(data)
+    return discord.User(state=bot._connection, data=data) if data else None
+
+
+def _dump_donator_rank(rank):
+    return orjson.dumps(rank.name if isinstance(rank, DonatorRank) else rank)
+
+
+def _load_donator_rank(data, bot, *args, **kwargs):
+    rank = orjson.loads(data)
+    return getattr(DonatorRank, rank) if isinstance(rank, str) else rank
 
 
 class Bot(commands.AutoShardedBot):
@@ -73,7 +97,8 @@ class Bot(commands.AutoShardedBot):
         self.support_server_id = self.config.game.support_server_id
         self.linecount = 0
         self.make_linecount()
-        self.all_prefixes = {}
+        # guild ID -> custom prefix, None for guilds using the global prefix
+        self.all_prefixes = LRU(PREFIX_CACHE_SIZE)
         self.activity = discord.Game(
             name=f"IdleRPG v{self.version}"
             if self.config.bot.is_beta
@@ -161,7 +186,9 @@ class Bot(commands.AutoShardedBot):
 
         await self.session.close()
         await self.trusted_session.close()
+        await self.transaction_log.close()
         await self.pool.close()
+        await shared_cache.close()
         await self.redis.close()
 
     async def setup_hook(self):
@@ -177,6 +204,13 @@ class Bot(commands.AutoShardedBot):
             max_connections=20,
         )
         self.redis = aioredis.Redis(connection_pool=pool)
+        self.cooldowns = RedisCooldowns(self.redis)
+        await shared_cache.connect(self.redis, self.config.database.redis_cache_channel)
+        shared_cache.register(
+            "prefix",
+            lambda key: self.all_prefixes.pop(int(key), None),
+            lambda key: self.all_prefixes.clear(),
+        )
         database_creds = {
             "database": self.config.database.postgres_name,
             "user": self.config.database.postgres_user,
@@ -187,6 +221,9 @@ class Bot(commands.AutoShardedBot):
         self.pool = await asyncpg.create_pool(
             **database_creds, min_size=10, max_size=20, command_timeout=60.0
         )
+        self.leaderboard = Leaderboard(self.redis, self.pool)
+        self.transaction_log = TransactionLog(self.pool)
+        self.transaction_log.start()
 
         for extension in self.config.bot.initial_extensions:
             try:
@@ -194,6 +231,11 @@ class Bot(commands.AutoShardedBot):
             except Exception:
                 print(f"Failed to load extension {extension}.", file=sys.stderr)
                 traceback.print_exc()
+        # Only writes if a file changed since the launcher indexed them
+        try:
+            i18n.docstring_index.save()
+        except OSError:
+            pass
 
         self.redis_version = await self.get_redis_version()
         await self.load_bans()
@@ -233,6 +275,10 @@ class Bot(commands.AutoShardedBot):
     async def get_ranks_for(self, thing, conn=None):
         """Returns the rank in money and xp for a user"""
         v = thing.id if isinstance(thing, (discord.Member, discord.User)) else thing
+        if ranks := await self.leaderboard.ranks(v, "money", "xp"):
+            return tuple(ranks)
+
+        # The leaderboards are not built yet
         if conn is None:
             conn = await self.pool.acquire()
             local = True
@@ -251,57 +297,42 @@ class Bot(commands.AutoShardedBot):
             await self.pool.release(conn)
         return money, xp
 
-    async def get_raidstats(
-        self,
-        thing,
-        atkmultiply=None,
-        defmultiply=None,
-        classes=None,
-        race=None,
-        guild=None,
-        god=None,
-        conn=None,
-    ):
-        """Generates the raidstats for a user"""
+    async def get_combat_stats_many(self, things, conn=None):
+        """
+        Resolves the combat stats for many users in a single query
+        Returns a dict of user ID to CombatStats for all users that have a character
+        """
+        user_ids = [
+            t.id if isinstance(t, (discord.Member, discord.User)) else t for t in things
+        ]
+        obj = conn or self.pool
+        rows = await obj.fetch(STATS_QUERY, user_ids)
+        return {row["user"]: resolve_stats(row) for row in rows}
+
+    async def get_combat_stats(self, thing, conn=None):
+        """Resolves the combat stats for a user, None if they have no character"""
         v = thing.id if isinstance(thing, (discord.Member, discord.User)) else thing
-        local = False
-        if conn is None:
-            conn = await self.pool.acquire()
-            local = True
-        if (
-            atkmultiply is None
-            or defmultiply is None
-            or classes is None
-            or guild is None
-        ):
-            row = await conn.fetchrow('SELECT * FROM profile WHERE "user"=$1;', v)
-            atkmultiply, defmultiply, classes, race, guild, user_god = (
-                row["atkmultiply"],
-                row["defmultiply"],
-                row["class"],
-                row["race"],
-                row["guild"],
-                row["god"],
-            )
-            if god is not None and god != user_god:
-                raise ValueError()
-        damage, armor = await self.get_damage_armor_for(
-            v, classes=classes, race=race, conn=conn
-        )
-        if buildings := await self.get_city_buildings(guild, conn=conn):
-            atkmultiply += buildings["raid_building"] * Decimal("0.1")
-            defmultiply += buildings["raid_building"] * Decimal("0.1")
-        classes = [class_from_string(c) for c in classes]
-        for c in classes:
-            if c and c.in_class_line(Raider):
-                grade = c.class_grade()
-                atkmultiply = atkmultiply + Decimal("0.1") * grade
-                defmultiply = defmultiply + Decimal("0.1") * grade
-        dmg = damage * atkmultiply
-        deff = armor * defmultiply
-        if local:
-            await self.pool.release(conn)
-        return dmg, deff
+        return (await self.get_combat_stats_many([v], conn=conn)).get(v)
+
+    async def get_raidstats(self, thing, god=None, conn=None):
+        """Generates the raidstats for a user"""
+        stats = await self.get_combat_stats(thing, conn=conn)
+        if god is not None and god != stats.god:
+            raise ValueError()
+        return stats.raid_damage, stats.raid_armor
+
+    async def get_raidstats_many(self, things, god=None, conn=None):
+        """
+        Generates the raidstats for many users at once
+        Returns a dict of user ID to (damage, armor) for all users that
+        have a character (and follow god, if given)
+        """
+        stats = await self.get_combat_stats_many(things, conn=conn)
+        return {
+            user_id: (user_stats.raid_damage, user_stats.raid_armor)
+            for user_id, user_stats in stats.items()
+            if god is None or user_stats.god == god
+        }
 
     async def get_equipped_items_for(self, thing, conn=None):
         """Fetches a list of equipped items of a user from the database"""
@@ -334,17 +365,55 @@ class Bot(commands.AutoShardedBot):
             return commands.when_mentioned_or(self.config.bot.global_prefix)(
                 self, message
             )  # Use global prefix in DMs
-        pref = self.all_prefixes.get(message.guild.id)
-        if pref is None:
-            pref = (
-                await self.pool.fetchval(
-                    'SELECT "prefix" FROM server WHERE "id"=$1;', message.guild.id
-                )
-                or self.config.bot.global_prefix
-            )
-            self.all_prefixes[message.guild.id] = pref
+        pref = await self.get_guild_prefix(message.guild.id)
         return commands.when_mentioned_or(pref)(self, message)
 
+    async def get_guild_prefix(self, guild_id):
+        """Returns the prefix of a guild, the custom one or the global_prefix"""
+        try:
+            pref = self.all_prefixes[guild_id]
+        except KeyError:
+            pref = self.all_prefixes[guild_id] = await self.pool.fetchval(
+                'SELECT "prefix" FROM server WHERE "id"=$1;', guild_id
+            )
+        return pref or self.config.bot.global_prefix
+
+    async def warm_prefixes(self, guild_ids):
+        """Caches the prefixes of all uncached guilds with a single query"""
+        missing = [i for i in guild_ids if i not in self.all_prefixes]
+        if not missing:
+            return
+        custom = {
+            row["id"]: row["prefix"]
+            for row in await self.pool.fetch(
+                'SELECT "id", "prefix" FROM server WHERE "id"=ANY($1);', missing
+            )
+        }
+        for guild_id in missing:
+            self.all_prefixes[guild_id] = custom.get(guild_id)
+
+    async def invalidate_prefix(self, guild_id):
+        """Drops the cached prefix of a guild on all clusters"""
+        self.all_prefixes.pop(guild_id, None)
+        await shared_cache.announce("prefix", str(guild_id))
+
+    async def register_view(self, message, view):
+        """
+        Remembers that this cluster owns the view of a DM message
+        DM interactions arrive on shard 0, which routes them by this.
+        """
+        if message.guild is not None or 0 in self.shard_ids:
+            return
+        await self.redis.execute_command(
+            "SET",
+            Channels(self.config.database.redis_shard_announce_channel).view_owner(
+                message.id
+            ),
+            self.cluster_id,
+            "EX",
+            int(view.timeout or 900) + 60,
+        )
+
     async def wait_for_dms(self, check, timeout=30):
         """
         Cross-process DM event handling, check is a dictionary
@@ -356,6 +425,7 @@ class Bot(commands.AutoShardedBot):
                     args={"check": check, "timeout": timeout},
                     expected_count=1,
                     _timeout=timeout,
+                    cluster=self.cogs["Sharding"].main_cluster,
                 )
             )[0]
         except IndexError:
@@ -365,7 +435,13 @@ class Bot(commands.AutoShardedBot):
             state=self._connection, channel=discord.Object(channel_id), data=data
         )
 
-    @cache(maxsize=8096)
+    @cache(
+        maxsize=8096,
+        negative_ttl=300,
+        shared_ttl=3600,
+        dumps=_dump_user,
+        loads=_load_user,
+    )
     async def get_user_global(self, user_id: int):
         """Fetches Discord user data across multiple processes"""
         if user := self.get_user(user_id):
@@ -376,25 +452,45 @@ class Bot(commands.AutoShardedBot):
         except discord.NotFound:
             return None
 
+    @cache(maxsize=8096, shared_ttl=3600)
+    async def get_user_guild(self, user_id: int):
+        """Returns a user's guild ID, 0 if they have none and None without a character"""
+        return await self.pool.fetchval(
+            'SELECT guild FROM profile WHERE "user"=$1;', user_id
+        )
+
+    @cache(maxsize=8096, shared_ttl=3600)
+    async def get_guild_alliance(self, guild_id: int):
+        """Returns the ID of a guild's alliance"""
+        return await self.pool.fetchval(
+            'SELECT alliance FROM guild WHERE "id"=$1;', guild_id
+        )
+
+    def clear_membership_cache(self, user_ids=(), guild_ids=()):
+        """
+        Invalidates the cached guild of users and the cached alliance of guilds
+        on all clusters, has to be called whenever they change
+        """
+        for user_id in user_ids:
+            self.get_user_guild.invalidate(self, user_id)
+        for guild_id in guild_ids:
+            self.get_guild_alliance.invalidate(self, guild_id)
+
     async def reset_cooldown(self, ctx):
         """Resets someone's cooldown for a Context"""
-        await self.redis.execute_command(
-            "DEL", f"cd:{ctx.author.id}:{ctx.command.qualified_name}"
-        )
+        await self.cooldowns.reset(f"cd:{ctx.author.id}:{ctx.command.qualified_name}")
 
     async def reset_guild_cooldown(self, ctx):
         """Resets a guild's cooldown for a Context"""
-        await self.redis.execute_command(
-            "DEL", f"guildcd:{ctx.character_data['guild']}:{ctx.command.qualified_name}"
+        await self.cooldowns.reset(
+            f"guildcd:{ctx.character_data['guild']}:{ctx.command.qualified_name}"
         )
 
     async def reset_alliance_cooldown(self, ctx):
         """Resets an alliance cooldown for a Context"""
-        alliance = await self.pool.fetchval(
-            'SELECT alliance FROM guild WHERE "id"=$1;', ctx.character_data["guild"]
-        )
-        await self.redis.execute_command(
-            "DEL", f"alliancecd:{alliance}:{ctx.command.qualified_name}"
+        alliance = await self.get_guild_alliance(ctx.character_data["guild"])
+        await self.cooldowns.reset(
+            f"alliancecd:{alliance}:{ctx.command.qualified_name}"
         )
 
     async def set_cooldown(
@@ -410,13 +506,7 @@ class Bot(commands.AutoShardedBot):
         else:
             user_id = ctx_or_user_id
 
-        await self.redis.execute_command(
-            "SET",
-            f"cd:{user_id}:{cmd_id}",
-            cmd_id,
-            "EX",
-            cooldown,
-        )
+        await self.cooldowns.set(f"cd:{user_id}:{cmd_id}", cmd_id, cooldown)
 
     async def activate_booster(self, user, type_):
         """Activates a boost of type_ for a user"""
@@ -548,33 +638,74 @@ class Bot(commands.AutoShardedBot):
             await self.pool.release(conn)
         return item
 
+    async def create_items(self, items, conn=None):
+        """
+        Creates many unequipped items with one query per table and returns
+        them in the order of items
+        """
+        if conn is None:
+            conn = await self.pool.acquire()
+            local = True
+        else:
+            local = False
+        keys = ("owner", "name", "value", "type_", "damage", "armor", "hand")
+        try:
+            created = await conn.fetch(
+                'INSERT INTO allitems ("owner", "name", "value", "type", "damage",'
+                ' "armor", "hand") SELECT * FROM unnest($1::bigint[], $2::text[],'
+                " $3::integer[], $4::text[], $5::numeric[], $6::numeric[],"
+                " $7::text[]) RETURNING *;",
+                *([item[key] for item in items] for key in keys),
+            )
+            await conn.execute(
+                'INSERT INTO inventory ("item", "equipped") SELECT'
+                " unnest($1::bigint[]), FALSE;",
+                [item["id"] for item in created],
+            )
+        finally:
+            if local:
+                await self.pool.release(conn)
+
+        # RETURNING has no guaranteed order, so match the rows up by their values
+        rows = {}
+        for row in created:
+            rows.setdefault(
+                tuple(row["type" if key == "type_" else key] for key in keys), []
+            ).append(row)
+        return [rows[tuple(item[key] for key in keys)].pop() for item in items]
+
+    def random_items(self, amount, minstat, maxstat, minvalue, maxvalue, owner):
+        """Rolls the data for amount random items with a few batched draws"""
+        owner = owner.id if isinstance(owner, (discord.User, discord.Member)) else owner
+        items = []
+        for type_, stat, value, uneven in zip(
+            random.choices(ALL_ITEM_TYPES, k=amount),
+            random.randints(amount, minstat, maxstat),
+            random.randints(amount, minvalue, maxvalue),
+            random.randints(amount, 0, 1),
+        ):
+            item = {}
+            item["owner"] = owner
+            hand = type_.get_hand()
+            item["hand"] = hand.value
+            item["type_"] = type_.value
+            item["damage"] = stat if type_ != ItemType.Shield else 0
+            item["armor"] = stat if type_ == ItemType.Shield else 0
+            item["value"] = value
+            item["name"] = fn.weapon_name(type_.value)
+            if hand == Hand.Both:
+                # both hands = higher damage, else they would be worse
+                # The issue with multiplying by 2
+                # is that everything will be even
+                # so we have to force uneven ones
+                item["damage"] = item["damage"] * 2 - uneven
+            items.append(item)
+        return items
+
     async def create_random_item(
         self, minstat, maxstat, minvalue, maxvalue, owner, insert=True, conn=None
     ):
-        owner = owner.id if isinstance(owner, (discord.User, discord.Member)) else owner
-        item = {}
-        item["owner"] = owner
-        type_ = random.choice(ALL_ITEM_TYPES)
-        hand = type_.get_hand()
-        item["hand"] = hand.value
-        item["type_"] = type_.value
-        item["damage"] = (
-            random.randint(minstat, maxstat) if type_ != ItemType.Shield else 0
-        )
-        item["armor"] = (
-            random.randint(minstat, maxstat) if type_ == ItemType.Shield else 0
-        )
-        item["value"] = random.randint(minvalue, maxvalue)
-        item["name"] = fn.weapon_name(type_.value)
-        if hand == Hand.Both:
-            item["damage"] = round(
-                item["damage"] * 2
-            )  # both hands = higher damage, else they would be worse
-            # The issue with multiplying by 2
-            # is that everything will be even
-            # so we have to force uneven ones
-            if random.randint(1, 2) == 1:
-                item["damage"] -= 1
+        item = self.random_items(1, minstat, maxstat, minvalue, maxvalue, owner)[0]
         if insert:
             return await self.create_item(**item, conn=conn)
         return item
@@ -677,9 +808,8 @@ class Bot(commands.AutoShardedBot):
 
     async def clear_donator_cache(self, user):
         user = user if isinstance(user, int) else user.id
-        await self.cogs["Sharding"].handler(
-            "clear_donator_cache", 0, args={"user_id": user}
-        )
+        # This invalidates the shared cache and all clusters' local caches
+        self.get_donator_rank.invalidate(self, user)
 
     async def load_bans(self):
         bans = await self.pool.fetch('SELECT "user" FROM bans;')
@@ -689,7 +819,13 @@ class Bot(commands.AutoShardedBot):
     async def reload_bans(self):
         await self.cogs["Sharding"].handler("reload_bans", 0)
 
-    @cache(maxsize=8096)
+    @cache(
+        maxsize=8096,
+        negative_ttl=600,
+        shared_ttl=86400,
+        dumps=_dump_donator_rank,
+        loads=_load_donator_rank,
+    )
     async def get_donator_rank(self, user_id):
         if self.config.bot.is_beta or self.config.bot.is_custom:
             return DonatorRank.diamond
@@ -707,82 +843,20 @@ class Bot(commands.AutoShardedBot):
                 top_donator_role = role.tier
         return getattr(DonatorRank, top_donator_role) if top_donator_role else None
 
-    async def get_damage_armor_for(
-        self, user, items=None, classes=None, race=None, conn=None
-    ):
-        user = user.id if isinstance(user, (discord.User, discord.Member)) else user
-        if conn is None:
-            conn = await self.pool.acquire()
-            local = True
-        else:
-            local = False
-        if items is None:
-            items = await self.get_equipped_items_for(user, conn=conn)
-        if not classes or not race:
-            row = await conn.fetchrow('SELECT * FROM profile WHERE "user"=$1;', user)
-            classes, race = row["class"], row["race"]
-
-        if local:
-            await self.pool.release(conn)
-
-        damage = 0
-        armor = 0
-
-        classes = [i for c in classes if (i := class_from_string(c))]
-        is_paragon = any(c.in_class_line(Paragon) for c in classes)
-        is_ranger = any(c.in_class_line(Ranger) for c in classes)
-        is_warrior = any(c.in_class_line(Warrior) for c in classes)
-        is_thief = any(c.in_class_line(Thief) for c in classes)
-        is_raider = any(c.in_class_line(Raider) for c in classes)
-        is_caster = any(
-            c.in_class_line(Mage) or c.in_class_line(Ritualist) for c in classes
-        )
+    async def get_damage_armor_for(self, user, conn=None):
+        """Returns the damage and armor of a user"""
+        stats = await self.get_combat_stats(user, conn=conn)
+        return stats.damage, stats.armor
 
-        for item in items:
-            damage += item["damage"]
-            armor += item["armor"]
-
-            type_ = ItemType.from_string(item["type"])
-            if type_ == ItemType.Spear and is_paragon:
-                damage += 5
-            elif (type_ == ItemType.Dagger or type_ == ItemType.Knife) and is_thief:
-                damage += 5
-            elif type_ == ItemType.Sword and is_warrior:
-                damage += 5
-            elif type_ == ItemType.Bow and is_ranger:
-                damage += 10
-            elif type_ == ItemType.Wand and is_caster:
-                damage += 5
-            elif type_ == ItemType.Axe and is_raider:
-                damage += 5
-
-        lines = [class_.get_class_line() for class_ in classes]
-        grades = [class_.class_grade() for class_ in classes]
-        for line, grade in zip(lines, grades):
-            if line == Mage:
-                damage += grade
-            elif line == Warrior:
-                armor += grade
-            elif line == Paragon:
-                damage += grade
-                armor += grade
-        if race == "Human":
-            damage += 2
-            armor += 2
-        elif race == "Dwarf":
-            damage += 1
-            armor += 3
-        elif race == "Elf":
-            damage += 3
-            armor += 1
-        elif race == "Orc":
-            armor += 4
-        elif race == "Jikill":
-            damage += 4
-        return damage, armor
-
-    async def log_transaction(self, ctx, from_, to, subject, data, conn=None):
-        """Logs a transaction."""
+    async def log_transaction(
+        self, ctx, from_, to, subject, data, conn=None, persist=False
+    ):
+        """
+        Logs a transaction.
+        It is written in the background, unless conn is in a transaction or
+        persist is True. Then it is written on conn before returning, so it is
+        rolled back along with the caller's transaction.
+        """
         from_ = from_.id if isinstance(from_, (discord.Member, discord.User)) else from_
         to = to.id if isinstance(to, (discord.Member, discord.User)) else to
         timestamp = datetime.datetime.now()
@@ -805,43 +879,16 @@ class Bot(commands.AutoShardedBot):
             "raid",
         ]
 
-        id_map = {
-            0: "Guild Bank",
-            1: "Bot (added to player)",
-            2: "Bot (removed from player)",
-        }
-        from_readable = from_ if from_ not in id_map else id_map[from_]
-        to_readable = to if to not in id_map else id_map[to]
-        data_ = "\n".join(
-            [f"{name}: {content}" for name, content in data.items()]
-        )  # data is expected to be a dict
-
-        description = f"""\
-From: {from_readable}
-To: {to_readable}
-Subject: {subject}
-Command: {ctx.command.qualified_name}
-{data_}"""
-
-        if conn is None:
-            conn = await self.pool.acquire()
-            local = True
-        else:
-            local = False
-        await conn.execute(
-            'INSERT INTO transactions ("from", "to", "subject", "info",'
-            ' "timestamp") VALUES ($1, $2, $3, $4, $5);',
+        transaction = (
             from_,
             to,
             subject,
-            description,
+            ctx.command.qualified_name,
+            *structure(data),
             timestamp,
         )
         if subject == "shop":
-            await conn.execute(
-                'INSERT INTO market_history ("item", "name", "value", "type",'
-                ' "damage", "armor", "signature", "price", "offer") VALUES ($1, $2,'
-                " $3, $4, $5, $6, $7, $8, $9);",
+            market = (
                 data["id"],
                 data["name"],
                 data["value"],
@@ -851,9 +898,27 @@ Command: {ctx.command.qualified_name}
                 data["signature"],
                 data["price"],
                 data["offer"],
+                timestamp,
+            )
+        else:
+            market = None
+
+        if conn is None or not (persist or conn.is_in_transaction()):
+            await self.transaction_log.log(transaction, market, persist=persist)
+            return
+        await conn.execute(
+            'INSERT INTO transactions ("from", "to", "subject", "command", "amount",'
+            ' "item", "rarity", "data", "timestamp") VALUES ($1, $2, $3, $4, $5, $6,'
+            " $7, $8, $9);",
+            *transaction,
+        )
+        if market is not None:
+            await conn.execute(
+                'INSERT INTO market_history ("item", "name", "value", "type",'
+                ' "damage", "armor", "signature", "price", "offer", "timestamp")'
+                " VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10);",
+                *market,
             )
-        if local:
-            await self.pool.release(conn)
 
     async def public_log(self, event: str):
         with handle_message_parameters(content=event) as params:
@@ -889,6 +954,7 @@ Command: {ctx.command.qualified_name}
         await conn.execute('DELETE FROM profile WHERE "user"=$1;', user)
         if local:
             await self.pool.release(conn)
+        self.clear_membership_cache(user_ids=[user])
 
     async def delete_items(self, items, conn=None):
         local = False
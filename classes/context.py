@@ -19,7 +19,8 @@ from __future__ import annotations
 
 import asyncio
 
-from typing import TYPE_CHECKING
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
 
 import discord
 
@@ -29,7 +30,70 @@ from classes.errors import NoChoice
 from utils.i18n import _
 
 if TYPE_CHECKING:
+    from asyncpg import Record
+
     from classes.bot import Bot
+    from utils.combat.stats import CombatStats
+
+
+class DataLoader:
+    """
+    Loads data about the author of a command at most once per invocation.
+    Parts that are requested together are fetched in a single query.
+    """
+
+    # Every part is a subselect returning a row (or an array of rows)
+    QUERIES = {
+        "profile": '(SELECT p FROM profile p WHERE p."user"=$1)',
+        "guild": (
+            '(SELECT g FROM guild g WHERE g."id"=(SELECT "guild" FROM profile WHERE'
+            ' "user"=$1))'
+        ),
+        "settings": '(SELECT s FROM user_settings s WHERE s."user"=$1)',
+        "items": (
+            'ARRAY(SELECT ai FROM allitems ai JOIN inventory i ON (ai."id"=i."item")'
+            ' WHERE ai."owner"=$1 AND i."equipped" IS TRUE)'
+        ),
+    }
+
+    def __init__(self, bot: Bot, user_id: int) -> None:
+        self.bot = bot
+        self.user_id = user_id
+        self._data: dict[str, Any] = {}
+
+    async def load(self, *parts: str) -> list[Any]:
+        """Returns the requested parts, fetching all missing ones at once"""
+        missing = [part for part in dict.fromkeys(parts) if part not in self._data]
+        if missing:
+            columns = ", ".join(f'{self.QUERIES[part]} AS "{part}"' for part in missing)
+            row = await self.bot.pool.fetchrow(f"SELECT {columns};", self.user_id)
+            for part in missing:
+                self._data[part] = row[part]
+        return [self._data[part] for part in parts]
+
+    def invalidate(self, *parts: str) -> None:
+        """Forgets the given parts, or everything if none are given"""
+        if not parts:
+            self._data.clear()
+        for part in parts:
+            self._data.pop(part, None)
+
+    async def profile(self) -> Record | None:
+        return (await self.load("profile"))[0]
+
+    async def guild(self) -> Record | None:
+        return (await self.load("guild"))[0]
+
+    async def settings(self) -> Record | None:
+        return (await self.load("settings"))[0]
+
+    async def equipped_items(self) -> list[Record]:
+        return (await self.load("items"))[0]
+
+    async def combat_stats(self) -> CombatStats | None:
+        if "combat_stats" not in self._data:
+            self._data["combat_stats"] = await self.bot.get_combat_stats(self.user_id)
+        return self._data["combat_stats"]
 
 
 class Confirmation(discord.ui.View):
@@ -99,7 +163,8 @@ class Confirmation(discord.ui.View):
 class Context(commands.Context):
     """
     A custom version of the default Context.
-    We use it to provide a shortcut to the display name and
+    We use it to provide a shortcut to the display name,
+    a loader for the author's data and
     for escaping massmentions in ctx.send.
     """
 
@@ -109,9 +174,19 @@ class Context(commands.Context):
     def disp(self) -> str:
         return self.author.display_name
 
+    @cached_property
+    def loader(self) -> DataLoader:
+        return DataLoader(self.bot, self.author.id)
+
     def __repr__(self):
         return "<Context>"
 
+    async def send(self, *args, **kwargs) -> discord.Message:
+        message = await super().send(*args, **kwargs)
+        if (view := kwargs.get("view")) is not None:
+            await self.bot.register_view(message, view)
+        return message
+
     async def confirm(
         self,
         message: str,
@@ -442,7 +442,8 @@ class Adventure(commands.Cog):
             """Shows all adventures, their names, descriptions, and your chances to beat them in picture form.
             Your chances are determined by your equipped items, race and class bonuses, your level and your God-given luck."""
         )
-        damage, defense = await self.bot.get_damage_armor_for(ctx.author)
+        stats = await ctx.loader.combat_stats()
+        damage, defense = stats.damage, stats.armor
         level = rpgtools.xptolevel(ctx.character_data["xp"])
         luck_booster = await self.bot.get_booster(ctx.author, "luck")
 
@@ -512,21 +513,16 @@ class Adventure(commands.Cog):
             time = time / 2
         await self.bot.start_adventure(ctx.author, adventure_number, time)
 
-        async with self.bot.pool.acquire() as conn:
-            remind_adv = await conn.fetchval(
-                'SELECT "adventure_reminder" FROM user_settings WHERE "user"=$1;',
-                ctx.author.id,
+        settings = await ctx.loader.settings()
+        if settings and settings["adventure_reminder"]:
+            subject = f"{adventure_number}"
+            finish_time = datetime.utcnow() + time
+            await self.bot.cogs["Scheduling"].create_reminder(
+                subject,
+                ctx,
+                finish_time,
+                type="adventure",
             )
-            if remind_adv:
-                subject = f"{adventure_number}"
-                finish_time = datetime.utcnow() + time
-                await self.bot.cogs["Scheduling"].create_reminder(
-                    subject,
-                    ctx,
-                    finish_time,
-                    type="adventure",
-                    conn=conn,
-                )
 
         await ctx.send(
             _(
@@ -571,7 +567,8 @@ class Adventure(commands.Cog):
         ):
             return
 
-        attack, defense = await self.bot.get_damage_armor_for(ctx.author)
+        stats = await ctx.loader.combat_stats()
+        attack, defense = stats.damage, stats.armor
 
         await ActiveAdventure(ctx, int(attack), int(defense), width=12, height=12).run()
 
@@ -614,7 +611,8 @@ class Adventure(commands.Cog):
                 )
             )
 
-        damage, armor = await self.bot.get_damage_armor_for(ctx.author)
+        stats = await ctx.loader.combat_stats()
+        damage, armor = stats.damage, stats.armor
 
         luck_booster = await self.bot.get_booster(ctx.author, "luck")
         current_level = int(rpgtools.xptolevel(ctx.character_data["xp"]))
@@ -775,7 +773,7 @@ class Adventure(commands.Cog):
         )
 
         if id is not None:
-            await self.bot.cogs["Scheduling"].remove_timer(id)
+            await self.bot.cogs["Scheduling"].remove_timer(id, ctx.author.id)
 
         await ctx.send(
             _(
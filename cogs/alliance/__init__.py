@@ -212,6 +212,7 @@ class Alliance(commands.Cog):
                 ctx.character_data["guild"],
                 ctx.user_data["guild"],
             )
+        self.bot.clear_membership_cache(guild_ids=[ctx.user_data["guild"]])
 
         await ctx.send(
             _("**{newguild}** is now part of your alliance, {user}!").format(
@@ -241,6 +242,7 @@ class Alliance(commands.Cog):
                 'UPDATE guild SET "alliance"="id" WHERE "id"=$1;',
                 ctx.character_data["guild"],
             )
+        self.bot.clear_membership_cache(guild_ids=[ctx.character_data["guild"]])
         await ctx.send(_("Your guild left the alliance."))
 
     @is_alliance_leader()
@@ -288,6 +290,7 @@ class Alliance(commands.Cog):
             await conn.execute(
                 'UPDATE guild SET "alliance"=$1 WHERE "id"=$1;', guild["id"]
             )
+        self.bot.clear_membership_cache(guild_ids=[guild["id"]])
 
         await ctx.send(
             _("**{guild}** is no longer part of your alliance.").format(
@@ -793,26 +796,13 @@ class Alliance(commands.Cog):
         view.stop()
 
         async with self.bot.pool.acquire() as conn:
+            stats = await self.bot.get_combat_stats_many(view.joined, conn=conn)
             for u in view.joined:
-                profile = await conn.fetchrow(
-                    'SELECT * FROM profile WHERE "user"=$1;', u.id
-                )
-                if not profile:
+                if not (user_stats := stats.get(u.id)):
                     continue  # not a player
-                user_alliance = await conn.fetchval(
-                    'SELECT alliance FROM guild WHERE "id"=$1;', profile["guild"]
-                )
-                if user_alliance != alliance_id:
+                if user_stats.alliance != alliance_id:
                     continue
-                damage, defense = await self.bot.get_raidstats(
-                    u,
-                    atkmultiply=profile["atkmultiply"],
-                    defmultiply=profile["defmultiply"],
-                    classes=profile["class"],
-                    race=profile["race"],
-                    guild=profile["guild"],
-                    conn=conn,
-                )
+                damage, defense = user_stats.raid_damage, user_stats.raid_armor
                 if u not in attacking_users:
                     attacking_users.append(u)
                     attackers.append(
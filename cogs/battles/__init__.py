@@ -28,7 +28,6 @@ from discord.ext import commands
 from discord.ui.button import Button
 
 from classes.classes import Ranger
-from classes.classes import from_string as class_from_string
 from classes.converters import IntGreaterThan
 from cogs.shard_communication import user_on_cooldown as user_cooldown
 from utils import random
@@ -128,11 +127,12 @@ class Battles(commands.Cog):
             ).format(author=ctx.disp, enemy=enemy_.display_name)
         )
 
+        players = [ctx.author, enemy_]
+        combat_stats = await self.bot.get_combat_stats_many(players)
         stats = [
-            sum(await self.bot.get_damage_armor_for(ctx.author)) + random.randint(1, 7),
-            sum(await self.bot.get_damage_armor_for(enemy_)) + random.randint(1, 7),
+            combat_stats[p.id].damage + combat_stats[p.id].armor + random.randint(1, 7)
+            for p in players
         ]
-        players = [ctx.author, enemy_]
         if stats[0] == stats[1]:
             winner = random.choice(players)
         else:
@@ -246,11 +246,11 @@ class Battles(commands.Cog):
 
         players = []
 
-        async with self.bot.pool.acquire() as conn:
-            for player in (ctx.author, enemy_):
-                dmg, deff = await self.bot.get_raidstats(player, conn=conn)
-                u = {"user": player, "hp": 250, "armor": deff, "damage": dmg}
-                players.append(u)
+        stats = await self.bot.get_raidstats_many((ctx.author, enemy_))
+        for player in (ctx.author, enemy_):
+            dmg, deff = stats[player.id]
+            u = {"user": player, "hp": 250, "armor": deff, "damage": dmg}
+            players.append(u)
 
         # players[0] is the author, players[1] is the enemy
 
@@ -455,21 +455,15 @@ class Battles(commands.Cog):
                 enemy_.id,
             )
 
+            stats = await self.bot.get_combat_stats_many(players, conn=conn)
             for p in players:
-                classes = [
-                    class_from_string(i)
-                    for i in await conn.fetchval(
-                        'SELECT class FROM profile WHERE "user"=$1;', p.id
-                    )
-                ]
-                if any(c.in_class_line(Ranger) for c in classes if c):
+                if stats[p.id].in_class_line(Ranger):
                     players[p]["hp"] = 120
                 else:
                     players[p]["hp"] = 100
 
-                attack, defense = await self.bot.get_damage_armor_for(p, conn=conn)
-                players[p]["damage"] = int(attack)
-                players[p]["defense"] = int(defense)
+                players[p]["damage"] = int(stats[p.id].damage)
+                players[p]["defense"] = int(stats[p.id].armor)
 
         moves = {
             "\U00002694": "attack",
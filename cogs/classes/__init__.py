@@ -739,7 +739,7 @@ class Classes(commands.Cog):
             from_=1,
             to=ctx.author.id,
             subject="item",
-            data={"Name": item["name"], "Value": item["value"]},
+            data={"Id": item["id"], "Name": item["name"], "Value": item["value"]},
         )
 
 
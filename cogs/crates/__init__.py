@@ -32,6 +32,16 @@ from utils import random
 from utils.checks import has_char, has_money
 from utils.i18n import _, locale_doc
 
+# The stat ranges of a crate's items, 20%, 30% and 50% of them fall into
+# the respective range
+CRATE_STATS = {
+    "common": ((20, 30), (10, 19), (1, 9)),
+    "uncommon": ((30, 35), (20, 29), (10, 19)),
+    "rare": ((35, 40), (30, 34), (20, 29)),
+    "magic": ((41, 45), (35, 40), (30, 34)),
+    "legendary": ((49, 50), (46, 48), (41, 45)),
+}
+
 
 class Crates(commands.Cog):
     def __init__(self, bot):
@@ -122,9 +132,7 @@ class Crates(commands.Cog):
                     "legendary": 0,
                 }
 
-                for _i in range(amount):
-                    rng = random.randint(0, 10000)
-
+                for rng in random.randints(amount, 0, 10000):
                     if rng < 20:
                         new_rarity = "legendary"
                     elif rng < 200:
@@ -184,63 +192,42 @@ class Crates(commands.Cog):
                 await ctx.send(text)
 
             else:
+                # A number to detemine the crate item range of every item
+                tiers = Counter(
+                    0 if rand < 2 else 1 if rand < 5 else 2
+                    for rand in random.randints(amount, 0, 9)
+                )
                 items = []
-                for _i in range(amount):
-                    # A number to detemine the crate item range
-                    rand = random.randint(0, 9)
-                    if rarity == "common":
-                        if rand < 2:  # 20% 20-30
-                            minstat, maxstat = (20, 30)
-                        elif rand < 5:  # 30% 10-19
-                            minstat, maxstat = (10, 19)
-                        else:  # 50% 1-9
-                            minstat, maxstat = (1, 9)
-                    elif rarity == "uncommon":
-                        if rand < 2:  # 20% 30-35
-                            minstat, maxstat = (30, 35)
-                        elif rand < 5:  # 30% 20-29
-                            minstat, maxstat = (20, 29)
-                        else:  # 50% 10-19
-                            minstat, maxstat = (10, 19)
-                    elif rarity == "rare":
-                        if rand < 2:  # 20% 35-40
-                            minstat, maxstat = (35, 40)
-                        elif rand < 5:  # 30% 30-34
-                            minstat, maxstat = (30, 34)
-                        else:  # 50% 20-29
-                            minstat, maxstat = (20, 29)
-                    elif rarity == "magic":
-                        if rand < 2:  # 20% 41-45
-                            minstat, maxstat = (41, 45)
-                        elif rand < 5:  # 30% 35-40
-                            minstat, maxstat = (35, 40)
-                        else:
-                            minstat, maxstat = (30, 34)
-                    elif rarity == "legendary":  # no else because why
-                        if rand < 2:  # 20% 49-50
-                            minstat, maxstat = (49, 50)
-                        elif rand < 5:  # 30% 46-48
-                            minstat, maxstat = (46, 48)
-                        else:  # 50% 41-45
-                            minstat, maxstat = (41, 45)
-
-                    item = await self.bot.create_random_item(
-                        minstat=minstat,
-                        maxstat=maxstat,
-                        minvalue=1,
-                        maxvalue=250,
-                        owner=ctx.author,
-                        conn=conn,
-                    )
-                    items.append(item)
-                    await self.bot.log_transaction(
-                        ctx,
-                        from_=1,
-                        to=ctx.author.id,
-                        subject="item",
-                        data={"Name": item["name"], "Value": item["value"]},
-                        conn=conn,
+                for tier, count in tiers.items():
+                    minstat, maxstat = CRATE_STATS[rarity][tier]
+                    items.extend(
+                        self.bot.random_items(
+                            count,
+                            minstat=minstat,
+                            maxstat=maxstat,
+                            minvalue=1,
+                            maxvalue=250,
+                            owner=ctx.author,
+                        )
                     )
+                items = await self.bot.create_items(items, conn=conn)
+                item = items[0]
+                # "Crates", not "Amount", so the amount column stays empty for items
+                await self.bot.log_transaction(
+                    ctx,
+                    from_=1,
+                    to=ctx.author.id,
+                    subject="item",
+                    data={
+                        "Rarity": rarity,
+                        "Crates": amount,
+                        "Items": [
+                            {"Id": i["id"], "Name": i["name"], "Value": i["value"]}
+                            for i in items
+                        ],
+                    },
+                    conn=conn,
+                )
 
                 if amount == 1:
                     embed = discord.Embed(
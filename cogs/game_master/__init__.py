@@ -16,6 +16,7 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import asyncio
+import datetime
 
 import discord
 
@@ -25,10 +26,12 @@ from discord.http import handle_message_parameters
 
 from classes.converters import CrateRarity, IntFromTo, IntGreaterThan, UserWithCharacter
 from classes.items import ItemType
+from cogs.help import chunks
 from cogs.shard_communication import user_on_cooldown as user_cooldown
 from utils import random
 from utils.checks import has_char, is_gm
 from utils.i18n import _, locale_doc
+from utils.transactions import fetch_item_transactions, fetch_transfers
 
 
 class GameMaster(commands.Cog):
@@ -91,6 +94,72 @@ class GameMaster(commands.Cog):
         await self.bot.clear_donator_cache(other)
         await ctx.send(_("Done"))
 
+    @is_gm()
+    @commands.command(
+        hidden=True, aliases=["gmtx"], brief=_("Show a user's recent transactions")
+    )
+    @locale_doc
+    async def gmtransactions(
+        self, ctx, other: int | discord.User, days: IntFromTo(1, 365) = 7
+    ):
+        _(
+            """`<other>` - A discord User or their User ID
+            `[days]` - How many days to look back, from 1 to 365; defaults to 7
+
+            Shows the newest 200 transactions from or to a user.
+
+            Only Game Masters can use this command."""
+        )
+        id_ = other if isinstance(other, int) else other.id
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+            days=days
+        )
+        transfers = await fetch_transfers(self.bot.pool, id_, since, limit=200)
+        await self.paginate_transactions(
+            ctx, transfers, _("Transactions of {user}").format(user=id_)
+        )
+
+    @is_gm()
+    @commands.command(
+        hidden=True,
+        aliases=["gmitx"],
+        brief=_("Show the transactions involving an item"),
+    )
+    @locale_doc
+    async def gmitemtransactions(self, ctx, item: int):
+        _(
+            """`<item>` - The item's ID
+
+            Shows the newest 200 transactions that involved an item, including crate openings.
+
+            Only Game Masters can use this command."""
+        )
+        transfers = await fetch_item_transactions(self.bot.pool, item, limit=200)
+        await self.paginate_transactions(
+            ctx, transfers, _("Transactions of item {item}").format(item=item)
+        )
+
+    async def paginate_transactions(self, ctx, transfers, title):
+        if not transfers:
+            return await ctx.send(_("No transactions found."))
+        embeds = []
+        for chunk in chunks(transfers, 10):
+            embed = discord.Embed(
+                title=title,
+                color=self.bot.config.game.primary_colour,
+            )
+            for t in chunk:
+                embed.add_field(
+                    name=f"#{t['id']} {t['subject']} ({t['command']})",
+                    value=(
+                        f"{discord.utils.format_dt(t['timestamp'])}\n{t['from']} ->"
+                        f" {t['to']}\n{t['data'] or t['info']}"
+                    )[:1024],
+                    inline=False,
+                )
+            embeds.append(embed)
+        await self.bot.paginator.Paginator(extras=embeds).paginate(ctx)
+
     @is_gm()
     @commands.command(hidden=True, brief=_("Bot-ban a user"))
     @locale_doc
@@ -273,13 +342,17 @@ class GameMaster(commands.Cog):
                 'DELETE FROM guild WHERE "leader"=$1 RETURNING id;', other.id
             )
             if g:
-                await conn.execute(
-                    'UPDATE profile SET "guildrank"=$1, "guild"=$2 WHERE "guild"=$3;',
+                members = await conn.fetch(
+                    'UPDATE profile SET "guildrank"=$1, "guild"=$2 WHERE "guild"=$3'
+                    ' RETURNING "user";',
                     "Member",
                     0,
                     g,
                 )
                 await conn.execute('UPDATE city SET "owner"=1 WHERE "owner"=$1;', g)
+                self.bot.clear_membership_cache(
+                    user_ids=[m["user"] for m in members], guild_ids=[g]
+                )
             partner = await conn.fetchval(
                 'UPDATE profile SET "marriage"=$1 WHERE "marriage"=$2 RETURNING'
                 ' "user";',
@@ -787,9 +860,7 @@ class GameMaster(commands.Cog):
         else:
             user_id = user
 
-        result = await self.bot.redis.execute_command("DEL", f"cd:{user_id}:{command}")
-
-        if result == 1:
+        if await self.bot.cooldowns.reset(f"cd:{user_id}:{command}"):
             with handle_message_parameters(
                 content="**{gm}** reset **{user}**'s cooldown for the {command} command.\n\nReason: *{reason}*".format(
                     gm=ctx.author,
@@ -37,6 +37,8 @@ class GlobalEvents(commands.Cog):
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
+        if not self.bot.config.bot.is_beta:
+            await self.bot.warm_prefixes([guild.id for guild in self.bot.guilds])
         if self.is_first_ready:
             self.is_first_ready = False
             text1 = f"Logged in as {self.bot.user.name} (ID: {self.bot.user.id})"
@@ -134,50 +136,32 @@ class GlobalEvents(commands.Cog):
         ):
             return
         while not self.bot.is_closed():
+            stats = await self.bot.cogs["Sharding"].cluster_stats()
             await self.bot.session.post(
                 f"https://top.gg/api/bots/{self.bot.user.id}/stats",
-                data=await self.get_topgg_payload(),
+                data=self.get_topgg_payload(stats["guilds"]),
                 headers=self.topgg_auth_headers,
             )
             await self.bot.session.post(
                 f"https://botsfordiscord.com/api/bot/{self.bot.user.id}",
-                data=await self.get_bfd_payload(),
+                data=self.get_bfd_payload(stats["guilds"]),
                 headers=self.bfd_auth_headers,
             )
             await self.bot.session.post(
                 f"https://discordbotlist.com/api/v1/bots/{self.bot.user.id}/stats",
-                data=await self.get_dbl_payload(),
+                data=self.get_dbl_payload(stats["guilds"]),
                 headers=self.dbl_auth_headers,
             )
             await asyncio.sleep(60 * 10)  # update once every 10 minutes
 
-    async def get_topgg_payload(self) -> dict[str, int]:
-        return {
-            "server_count": sum(
-                await self.bot.cogs["Sharding"].handler(
-                    "guild_count", self.bot.shard_count
-                )
-            ),
-            "shard_count": self.bot.shard_count,
-        }
-
-    async def get_bfd_payload(self) -> dict[str, int]:
-        return {
-            "server_count": sum(
-                await self.bot.cogs["Sharding"].handler(
-                    "guild_count", self.bot.shard_count
-                )
-            )
-        }
+    def get_topgg_payload(self, guild_count: int) -> dict[str, int]:
+        return {"server_count": guild_count, "shard_count": self.bot.shard_count}
 
-    async def get_dbl_payload(self) -> dict[str, int]:
-        return {
-            "guilds": sum(
-                await self.bot.cogs["Sharding"].handler(
-                    "guild_count", self.bot.shard_count
-                )
-            )
-        }
+    def get_bfd_payload(self, guild_count: int) -> dict[str, int]:
+        return {"server_count": guild_count}
+
+    def get_dbl_payload(self, guild_count: int) -> dict[str, int]:
+        return {"guilds": guild_count}
 
     def cog_unload(self) -> None:
         self.stats_updates.cancel()
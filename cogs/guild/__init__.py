@@ -149,9 +149,7 @@ class Guild(commands.Cog):
 
             To get more GvG wins, the guild leader or its officers can use `{prefix}guild battle`."""
         )
-        guilds = await self.bot.pool.fetch(
-            "SELECT * FROM guild ORDER BY wins DESC LIMIT 10;"
-        )
+        guilds = await self.bot.leaderboard.top("guild_wins")
         result = ""
         for idx, guild in enumerate(guilds):
             leader = await rpgtools.lookup(self.bot, guild["leader"])
@@ -325,6 +323,7 @@ class Guild(commands.Cog):
                 10000,
                 ctx.author.id,
             )
+        self.bot.clear_membership_cache(user_ids=[ctx.author.id])
         await ctx.send(
             _(
                 "Successfully added your guild **{name}** with a member limit of"
@@ -542,6 +541,7 @@ class Guild(commands.Cog):
         await self.bot.pool.execute(
             'UPDATE profile SET "guild"=$1 WHERE "user"=$2;', id_, newmember.id
         )
+        self.bot.clear_membership_cache(user_ids=[newmember.id])
         if channel:
             with suppress(discord.Forbidden, discord.HTTPException):
                 with handle_message_parameters(
@@ -577,6 +577,7 @@ class Guild(commands.Cog):
                 'SELECT "channel" FROM guild WHERE "id"=$1;',
                 ctx.character_data["guild"],
             )
+        self.bot.clear_membership_cache(user_ids=[ctx.author.id])
 
         if channel:
             with suppress(discord.Forbidden, discord.HTTPException):
@@ -620,6 +621,7 @@ class Guild(commands.Cog):
             channel = await conn.fetchval(
                 'SELECT channel FROM guild WHERE "id"=$1;', ctx.character_data["guild"]
             )
+        self.bot.clear_membership_cache(user_ids=[member])
         if channel:
             with suppress(discord.Forbidden, discord.HTTPException):
                 with handle_message_parameters(
@@ -655,12 +657,17 @@ class Guild(commands.Cog):
                     'DELETE FROM guild WHERE "leader"=$1 RETURNING "channel";',
                     ctx.author.id,
                 )
-                await conn.execute(
-                    'UPDATE profile SET "guild"=$1, "guildrank"=$2 WHERE "guild"=$3;',
+                members = await conn.fetch(
+                    'UPDATE profile SET "guild"=$1, "guildrank"=$2 WHERE "guild"=$3'
+                    ' RETURNING "user";',
                     0,
                     "Member",
                     ctx.character_data["guild"],
                 )
+        self.bot.clear_membership_cache(
+            user_ids=[m["user"] for m in members],
+            guild_ids=[ctx.character_data["guild"]],
+        )
         if channel:
             with suppress(discord.Forbidden, discord.HTTPException):
                 with handle_message_parameters(
@@ -806,15 +813,12 @@ class Guild(commands.Cog):
             Only players in a guild can use this command."""
         )
         await ctx.typing()
-        async with self.bot.pool.acquire() as conn:
-            guild = await conn.fetchrow(
-                'SELECT * FROM guild WHERE "id"=$1;', ctx.character_data["guild"]
-            )
-            players = await conn.fetch(
-                'SELECT "user", "name", "money" from profile WHERE "guild"=$1 ORDER BY'
-                ' "money" DESC LIMIT 10;',
-                guild["id"],
-            )
+        guild = await ctx.loader.guild()
+        players = await self.bot.pool.fetch(
+            'SELECT "user", "name", "money" from profile WHERE "guild"=$1 ORDER BY'
+            ' "money" DESC LIMIT 10;',
+            guild["id"],
+        )
         result = ""
         for idx, profile in enumerate(players):
             charname = await rpgtools.lookup(self.bot, profile["user"])
@@ -842,15 +846,12 @@ class Guild(commands.Cog):
             Only players in a guild can use this command."""
         )
         await ctx.typing()
-        async with self.bot.pool.acquire() as conn:
-            guild = await conn.fetchrow(
-                'SELECT * FROM guild WHERE "id"=$1;', ctx.character_data["guild"]
-            )
-            players = await conn.fetch(
-                'SELECT "user", "name", "xp" FROM profile WHERE "guild"=$1 ORDER BY'
-                ' "xp" DESC LIMIT 10;',
-                guild["id"],
-            )
+        guild = await ctx.loader.guild()
+        players = await self.bot.pool.fetch(
+            'SELECT "user", "name", "xp" FROM profile WHERE "guild"=$1 ORDER BY'
+            ' "xp" DESC LIMIT 10;',
+            guild["id"],
+        )
         result = ""
         for idx, profile in enumerate(players):
             charname = await rpgtools.lookup(self.bot, profile[0])
@@ -1279,10 +1280,11 @@ class Guild(commands.Cog):
                     " **{user2}**!\nBattle running..."
                 ).format(num=idx + 1, total=len(team1), user=user, user2=user2)
             )
-            val1 = sum(await self.bot.get_damage_armor_for(user)) + random.randint(1, 7)
-            val2 = sum(await self.bot.get_damage_armor_for(user2)) + random.randint(
-                1, 7
-            )
+            stats = await self.bot.get_combat_stats_many([user, user2])
+            val1, val2 = [
+                stats[u.id].damage + stats[u.id].armor + random.randint(1, 7)
+                for u in (user, user2)
+            ]
             if val1 > val2:
                 winner = user
                 wins1 += 1
@@ -17,15 +17,30 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from asyncpg.exceptions import ForeignKeyViolationError, UniqueViolationError
 from discord.ext import commands
+from lru import LRU
 
 from utils import i18n
+from utils.cache import shared_cache
 from utils.i18n import _, locale_doc
 
+# How many users' locales are kept per cluster
+LOCALE_CACHE_SIZE = 100_000
+# Distinguishes "not cached" from a cached None (user has no locale set)
+MISSING = object()
+
 
 class Locale(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.bot.locale_cache = {}
+        # user ID -> locale, None for users without a setting
+        self.bot.locale_cache = LRU(LOCALE_CACHE_SIZE)
+        shared_cache.register("locale", self._drop, self._drop_all)
+
+    def _drop(self, key):
+        self.bot.locale_cache.pop(int(key), None)
+
+    def _drop_all(self, key):
+        self.bot.locale_cache.clear()
 
     async def set_locale(self, user, locale):
         """Sets the locale for a user."""
@@ -42,6 +57,8 @@ class Locale(commands.Cog):
                     locale,
                     user.id,
                 )
+        if shared_cache.connected:
+            await shared_cache.announce("locale", str(user.id))
         self.bot.locale_cache[user.id] = locale
 
     async def get_locale(self, user):
@@ -51,13 +68,35 @@ class Locale(commands.Cog):
         )
 
     async def locale(self, user):
-        lang = self.bot.locale_cache.get(user, None)
-        if lang:
+        lang = self.bot.locale_cache.get(user, MISSING)
+        if lang is not MISSING:
             return lang
         lang = await self.get_locale(user)
         self.bot.locale_cache[user] = lang
         return lang
 
+    async def locales_for(self, users):
+        """Gets the locales for many user IDs, the uncached ones in a single query"""
+        locales = {}
+        missing = []
+        for user in users:
+            lang = self.bot.locale_cache.get(user, MISSING)
+            if lang is MISSING:
+                missing.append(user)
+            else:
+                locales[user] = lang
+        if missing:
+            found = {
+                row["user"]: row["locale"]
+                for row in await self.bot.pool.fetch(
+                    'SELECT "user", "locale" FROM user_settings WHERE "user"=ANY($1);',
+                    missing,
+                )
+            }
+            for user in missing:
+                locales[user] = self.bot.locale_cache[user] = found.get(user)
+        return locales
+
     @commands.group(
         invoke_without_command=True,
         aliases=["locale", "lang"],
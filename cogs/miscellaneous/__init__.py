@@ -243,11 +243,7 @@ class Miscellaneous(commands.Cog):
 
             Thank you for supporting IdleRPG!"""
         )
-        guild_count = sum(
-            await self.bot.cogs["Sharding"].handler(
-                "guild_count", self.bot.cluster_count
-            )
-        )
+        guild_count = (await self.bot.cogs["Sharding"].cluster_stats())["guilds"]
         await ctx.send(
             _(
                 """\
@@ -330,11 +326,7 @@ Even $1 can help us.
             )
         else:
             owner = str(await self.bot.get_user_global(self.bot.owner_id))
-        guild_count = sum(
-            await self.bot.cogs["Sharding"].handler(
-                "guild_count", self.bot.cluster_count
-            )
-        )
+        guild_count = (await self.bot.cogs["Sharding"].cluster_stats())["guilds"]
         meminfo = psutil.virtual_memory()
         cpu_freq = psutil.cpu_freq()
         cpu_name = await get_cpu_name()
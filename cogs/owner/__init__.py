@@ -32,6 +32,7 @@ from classes.bot import Bot
 from classes.context import Context
 from classes.converters import UserWithCharacter
 from utils import shell
+from utils.cache import cache_metrics, metrics_to_prometheus
 from utils.misc import random_token
 
 
@@ -104,9 +105,9 @@ class Owner(commands.Cog):
     @commands.command(hidden=True)
     async def evall(self, ctx: Context, *, code: str) -> None:
         """[Owner only] Evaluates python code on all processes."""
-        data = await self.bot.cogs["Sharding"].handler(
-            "evaluate", self.bot.shard_count, {"code": code}
-        )
+        data = (
+            await self.bot.cogs["Sharding"].gather("evaluate", {"code": code})
+        ).outputs
         filtered_data = {instance: data.count(instance) for instance in data}
         pretty_data = "".join(
             f"```py\n{count}x | {instance[6:]}"
@@ -135,6 +136,41 @@ class Owner(commands.Cog):
         except Exception:
             await ctx.send(f"```py\n{traceback.format_exc()}```")
 
+    @commands.command(hidden=True)
+    async def cachestats(self, ctx: Context, output: str = None) -> None:
+        """[Owner Only] Shows statistics of this cluster's caches."""
+        if output == "prometheus":
+            return await ctx.send(
+                file=discord.File(
+                    filename="cache.prom", fp=io.StringIO(metrics_to_prometheus())
+                )
+            )
+        lines = [
+            f"{m.name}: {len(m.cache)}/{m.maxsize} entries,"
+            f" {m.hits} hits, {m.shared_hits} shared hits, {m.misses} misses"
+            f" ({m.hit_ratio:.1%}), {m.coalesced} coalesced, {m.evictions} evictions,"
+            f" {m.avg_key_time / 1000:.1f}µs per key,"
+            f" ~{m.memory_estimate() / 1024:.1f}KiB"
+            for m in cache_metrics.values()
+        ]
+        await ctx.send(
+            f"```\nCluster #{self.bot.cluster_id} ({self.bot.cluster_name})\n"
+            + "\n".join(lines)
+            + "```"
+        )
+
+    @commands.command(hidden=True)
+    async def txlogstats(self, ctx: Context) -> None:
+        """[Owner Only] Shows statistics of this cluster's transaction log writer."""
+        log = self.bot.transaction_log
+        average = log.write_time / log.batches * 1000 if log.batches else 0.0
+        await ctx.send(
+            f"```\nCluster #{self.bot.cluster_id} ({self.bot.cluster_name})\n"
+            f"{log.queued}/{log.maxsize} queued, {log.written} written in"
+            f" {log.batches} batches ({average:.1f}ms each), {log.blocked} blocked"
+            f" by a full queue, {log.failures} failed writes```"
+        )
+
     def replace_md(self, s):
         opening = True
         out = []
@@ -1149,13 +1149,17 @@ IdleRPG is a global bot, your characters are valid everywhere"""
                 'DELETE FROM guild WHERE "leader"=$1 RETURNING "id";', ctx.author.id
             )
             if g:
-                await conn.execute(
-                    'UPDATE profile SET "guildrank"=$1, "guild"=$2 WHERE "guild"=$3;',
+                members = await conn.fetch(
+                    'UPDATE profile SET "guildrank"=$1, "guild"=$2 WHERE "guild"=$3'
+                    ' RETURNING "user";',
                     "Member",
                     0,
                     g,
                 )
                 await conn.execute('UPDATE city SET "owner"=1 WHERE "owner"=$1;', g)
+                self.bot.clear_membership_cache(
+                    user_ids=[m["user"] for m in members], guild_ids=[g]
+                )
             if partner := ctx.character_data["marriage"]:
                 await conn.execute(
                     'UPDATE profile SET "marriage"=$1 WHERE "user"=$2;',
@@ -208,24 +208,12 @@ class Raid(commands.Cog):
 
         joined.extend(view.joined)
 
-        async with self.bot.pool.acquire() as conn:
-            for u in joined:
-                if not (
-                    profile := await conn.fetchrow(
-                        'SELECT * FROM profile WHERE "user"=$1;', u.id
-                    )
-                ):
-                    continue
-                dmg, deff = await self.bot.get_raidstats(
-                    u,
-                    atkmultiply=profile["atkmultiply"],
-                    defmultiply=profile["defmultiply"],
-                    classes=profile["class"],
-                    race=profile["race"],
-                    guild=profile["guild"],
-                    conn=conn,
-                )
-                raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
+        stats = await self.bot.get_raidstats_many(joined)
+        for u in joined:
+            if (user_stats := stats.get(u.id)) is None:
+                continue
+            dmg, deff = user_stats
+            raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
 
         raiders_joined = len(raid)
         await ctx.send(f"**Done getting data! {raiders_joined} Raiders joined.**")
@@ -489,32 +477,13 @@ The cthae has gathered an army of scrael. Fight for your life!
 
         view.stop()
 
-        async with self.bot.pool.acquire() as conn:
-            raid = {}
-            for u in view.joined:
-                if (
-                    not (
-                        profile := await conn.fetchrow(
-                            'SELECT * FROM profile WHERE "user"=$1;', u.id
-                        )
-                    )
-                    or profile["god"] != "Kvothe"
-                ):
-                    continue
-                try:
-                    dmg, deff = await self.bot.get_raidstats(
-                        u,
-                        atkmultiply=profile["atkmultiply"],
-                        defmultiply=profile["defmultiply"],
-                        classes=profile["class"],
-                        race=profile["race"],
-                        guild=profile["guild"],
-                        god=profile["god"],
-                        conn=conn,
-                    )
-                except ValueError:
-                    continue
-                raid[u] = {"hp": 100, "armor": deff, "damage": dmg, "kills": 0}
+        stats = await self.bot.get_raidstats_many(view.joined, god="Kvothe")
+        raid = {}
+        for u in view.joined:
+            if (user_stats := stats.get(u.id)) is None:
+                continue
+            dmg, deff = user_stats
+            raid[u] = {"hp": 100, "armor": deff, "damage": dmg, "kills": 0}
 
         await ctx.send("**Done getting data!**")
 
@@ -661,32 +630,13 @@ This boss has {self.boss['hp']} HP and will be vulnerable in 15 Minutes
             "**The guardian is vulnerable! Fetching participant data... Hang on!**"
         )
 
-        async with self.bot.pool.acquire() as conn:
-            raid = {}
-            for u in view.joined:
-                if (
-                    not (
-                        profile := await conn.fetchrow(
-                            'SELECT * FROM profile WHERE "user"=$1;', u.id
-                        )
-                    )
-                    or profile["god"] != "Eden"
-                ):
-                    continue
-                try:
-                    dmg, deff = await self.bot.get_raidstats(
-                        u,
-                        atkmultiply=profile["atkmultiply"],
-                        defmultiply=profile["defmultiply"],
-                        classes=profile["class"],
-                        race=profile["race"],
-                        guild=profile["guild"],
-                        god=profile["god"],
-                        conn=conn,
-                    )
-                except ValueError:
-                    continue
-                raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
+        stats = await self.bot.get_raidstats_many(view.joined, god="Eden")
+        raid = {}
+        for u in view.joined:
+            if (user_stats := stats.get(u.id)) is None:
+                continue
+            dmg, deff = user_stats
+            raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
 
         await ctx.send("**Done getting data!**")
 
@@ -833,32 +783,13 @@ The hamburger will be vulnerable in 15 Minutes
             "**The hamburger is vulnerable! Fetching participant data... Hang on!**"
         )
 
-        async with self.bot.pool.acquire() as conn:
-            raid = {}
-            for u in view.joined:
-                if (
-                    not (
-                        profile := await conn.fetchrow(
-                            'SELECT * FROM profile WHERE "user"=$1;', u.id
-                        )
-                    )
-                    or profile["god"] != "CHamburr"
-                ):
-                    continue
-                try:
-                    dmg, deff = await self.bot.get_raidstats(
-                        u,
-                        atkmultiply=profile["atkmultiply"],
-                        defmultiply=profile["defmultiply"],
-                        classes=profile["class"],
-                        race=profile["race"],
-                        guild=profile["guild"],
-                        god=profile["god"],
-                        conn=conn,
-                    )
-                except ValueError:
-                    continue
-                raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
+        stats = await self.bot.get_raidstats_many(view.joined, god="CHamburr")
+        raid = {}
+        for u in view.joined:
+            if (user_stats := stats.get(u.id)) is None:
+                continue
+            dmg, deff = user_stats
+            raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
 
         await ctx.send("**Done getting data!**")
 
@@ -1062,19 +993,19 @@ Are you worthy? Can your soul handle the force of your sins?
             "**Lyx and his Ouroboros are visible! Fetch participant data... Hang on!**"
         )
 
-        async with self.bot.pool.acquire() as conn:
-            raid = []
-            for u in view.joined:
-                if (
-                    not (
-                        profile := await conn.fetchrow(
-                            'SELECT * FROM profile WHERE "user"=$1;', u.id
-                        )
-                    )
-                    or profile["god"] != "Lyx"
-                ):
-                    continue
-                raid.append(u)
+        followers = {
+            row["user"]
+            for row in await self.bot.pool.fetch(
+                'SELECT "user" FROM profile WHERE "user"=ANY($1) AND "god"=$2;',
+                [u.id for u in view.joined],
+                "Lyx",
+            )
+        }
+        raid = []
+        for u in view.joined:
+            if u.id not in followers:
+                continue
+            raid.append(u)
 
         await ctx.send("**Done getting data!**")
 
@@ -1236,19 +1167,19 @@ Mensing has {boss_hp} HP and will be vulnerable in 15 Minutes
             "**The raid on the facility started! Fetching participant data... Hang on!**"
         )
 
-        async with self.bot.pool.acquire() as conn:
-            raid = {}
-            for u in view.joined:
-                if (
-                    not (
-                        profile := await conn.fetchrow(
-                            'SELECT * FROM profile WHERE "user"=$1;', u.id
-                        )
-                    )
-                    or profile["god"] != "Monox"
-                ):
-                    continue
-                raid[u] = 250
+        followers = {
+            row["user"]
+            for row in await self.bot.pool.fetch(
+                'SELECT "user" FROM profile WHERE "user"=ANY($1) AND "god"=$2;',
+                [u.id for u in view.joined],
+                "Monox",
+            )
+        }
+        raid = {}
+        for u in view.joined:
+            if u.id not in followers:
+                continue
+            raid[u] = 250
 
         await ctx.send("**Done getting data!**")
 
@@ -1418,23 +1349,13 @@ This boss has {self.boss['hp']} HP and will be vulnerable in 15 Minutes
             "**The attack on Dream Land started! Fetching participant data... Hang on!**"
         )
 
-        async with self.bot.pool.acquire() as conn:
-            raid = {}
-            for u in view.joined:
-                if (
-                    not (
-                        profile := await conn.fetchrow(
-                            'SELECT * FROM profile WHERE "user"=$1;', u.id
-                        )
-                    )
-                    or profile["god"] != "Kirby"
-                ):
-                    continue
-                try:
-                    dmg, deff = await self.bot.get_raidstats(u, god="Kirby", conn=conn)
-                except ValueError:
-                    continue
-                raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
+        stats = await self.bot.get_raidstats_many(view.joined, god="Kirby")
+        raid = {}
+        for u in view.joined:
+            if (user_stats := stats.get(u.id)) is None:
+                continue
+            dmg, deff = user_stats
+            raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
 
         await ctx.send("**Done getting data!**")
 
@@ -1641,23 +1562,13 @@ Atheistus will be vulnerable in 15 Minutes
             "**Atheistus is vulnerable! Fetching participant data... Hang on!**"
         )
 
-        async with self.bot.pool.acquire() as conn:
-            raid = {}
-            for u in view.joined:
-                if (
-                    not (
-                        profile := await conn.fetchrow(
-                            'SELECT * FROM profile WHERE "user"=$1;', u.id
-                        )
-                    )
-                    or profile["god"] != "Jesus"
-                ):
-                    continue
-                try:
-                    dmg, deff = await self.bot.get_raidstats(u, god="Jesus", conn=conn)
-                except ValueError:
-                    continue
-                raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
+        stats = await self.bot.get_raidstats_many(view.joined, god="Jesus")
+        raid = {}
+        for u in view.joined:
+            if (user_stats := stats.get(u.id)) is None:
+                continue
+            dmg, deff = user_stats
+            raid[u] = {"hp": 250, "armor": deff, "damage": dmg}
 
         await ctx.send("**Done getting data!**")
 
@@ -15,7 +15,10 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import asyncio
+
 import discord
+import orjson
 
 from discord.ext import commands
 
@@ -25,20 +28,97 @@ from utils import misc as rpgtools
 from utils.i18n import _, locale_doc
 from utils.markdown import escape_markdown
 
+# How often the leaderboards are rebuilt from Postgres, in seconds
+RECONCILE_INTERVAL = 3600
+# How often the listening connection is checked, in seconds
+LISTEN_CHECK_INTERVAL = 30
+
 
 class Ranks(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
+        # Only one cluster keeps the leaderboards in sync
+        self._handles = 0 in self.bot.shard_ids
+        self._updates = asyncio.Queue()
+        self._conn = None
+        # Set when the listening connection died and notifications were missed
+        self._lost = asyncio.Event()
+        self._tasks = []
+
+    async def cog_load(self) -> None:
+        if not self._handles:
+            return
+        self._tasks = [
+            asyncio.create_task(self.apply_updates()),
+            asyncio.create_task(self.reconcile()),
+            asyncio.create_task(self.check_listener()),
+        ]
+
+    def cog_unload(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._conn is not None:
+            asyncio.create_task(self.bot.pool.release(self._conn))
+            self._conn = None
+
+    def _on_notification(self, conn, pid, channel, payload) -> None:
+        self._updates.put_nowait(orjson.loads(payload))
+
+    async def listen(self) -> None:
+        """(Re-)subscribes to the notifications of the leaderboard triggers"""
+        if self._conn is not None:
+            if not self._conn.is_closed():
+                return
+            await self.bot.pool.release(self._conn)
+        self._conn = await self.bot.pool.acquire()
+        await self._conn.add_listener("leaderboard", self._on_notification)
+
+    async def apply_updates(self) -> None:
+        while True:
+            updates = [await self._updates.get()]
+            while not self._updates.empty() and len(updates) < 1000:
+                updates.append(self._updates.get_nowait())
+            try:
+                await self.bot.leaderboard.apply(updates)
+            except Exception as e:
+                # The next rebuild will fix anything we miss
+                self.bot.logger.warning(f"Failed to update leaderboards: {e}")
+
+    async def reconcile(self) -> None:
+        while not self.bot.is_closed():
+            try:
+                await self.listen()
+                for table in ("profile", "guild"):
+                    await self.bot.leaderboard.rebuild(table)
+            except Exception as e:
+                self.bot.logger.warning(f"Failed to rebuild leaderboards: {e}")
+            try:
+                await asyncio.wait_for(self._lost.wait(), RECONCILE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._lost.clear()
+
+    async def check_listener(self) -> None:
+        """Resubscribes and rebuilds early if the listening connection dies"""
+        while not self.bot.is_closed():
+            await asyncio.sleep(LISTEN_CHECK_INTERVAL)
+            if self._conn is None:
+                continue
+            try:
+                await asyncio.wait_for(self._conn.execute("SELECT 1;"), 10)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.bot.logger.warning(f"Lost the leaderboard listener: {e}")
+                self._conn.terminate()
+                self._lost.set()
 
     @commands.command(brief=_("Show the top 10 richest"))
     @locale_doc
     async def richest(self, ctx: Context) -> None:
         _("""The 10 most richest players in IdleRPG.""")
         await ctx.typing()
-        players = await self.bot.pool.fetch(
-            'SELECT "user", "name", "money" FROM profile ORDER BY "money" DESC'
-            " LIMIT 10;"
-        )
+        players = await self.bot.leaderboard.top("money", '"user", "name", "money"')
         result = ""
         for idx, profile in enumerate(players):
             username = await rpgtools.lookup(self.bot, profile["user"])
@@ -60,9 +140,7 @@ class Ranks(commands.Cog):
             """Shows you the top 10 players by XP and displays the corresponding level."""
         )
         await ctx.typing()
-        players = await self.bot.pool.fetch(
-            'SELECT "user", "name", "xp" from profile ORDER BY "xp" DESC LIMIT 10;'
-        )
+        players = await self.bot.leaderboard.top("xp", '"user", "name", "xp"')
         result = ""
         for idx, profile in enumerate(players):
             username = await rpgtools.lookup(self.bot, profile["user"])
@@ -85,10 +163,7 @@ class Ranks(commands.Cog):
     async def pvpstats(self, ctx: Context) -> None:
         _("""Shows you the top 10 players by the amount of wins in PvP matches.""")
         await ctx.typing()
-        players = await self.bot.pool.fetch(
-            'SELECT "user", "name", "pvpwins" from profile ORDER BY "pvpwins" DESC'
-            " LIMIT 10;"
-        )
+        players = await self.bot.leaderboard.top("pvpwins", '"user", "name", "pvpwins"')
         result = ""
         for idx, profile in enumerate(players):
             username = await rpgtools.lookup(self.bot, profile["user"])
@@ -108,9 +183,8 @@ class Ranks(commands.Cog):
     async def lovers(self, ctx: Context) -> None:
         _("""The top 10 lovers sorted by their spouse's lovescore.""")
         await ctx.typing()
-        players = await self.bot.pool.fetch(
-            'SELECT "user", "marriage", "lovescore" FROM profile ORDER BY "lovescore"'
-            " DESC LIMIT 10;"
+        players = await self.bot.leaderboard.top(
+            "lovescore", '"user", "marriage", "lovescore"'
         )
         result = ""
         for idx, profile in enumerate(players):
@@ -18,10 +18,11 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from __future__ import annotations
 
 import asyncio
+import heapq
 
+from collections import defaultdict
 from datetime import datetime, timedelta
 
-import asyncpg
 import discord
 
 from discord.ext import commands
@@ -34,6 +35,36 @@ from cogs.help import chunks
 from utils.checks import has_char
 from utils.i18n import _, current_locale, locale_doc
 
+# How far ahead reminders are kept in memory
+TIMER_WINDOW = timedelta(hours=1)
+# How many reminder messages are sent at the same time
+DELIVERY_CONCURRENCY = 10
+# Reminders are split by user into this many partitions, each one is
+# dispatched by the cluster holding its lease
+TIMER_PARTITIONS = 64
+# How long a partition lease is valid without being renewed, in milliseconds
+LEASE_TTL = 30000
+# How often leases are renewed and orphaned partitions are claimed, in seconds
+LEASE_INTERVAL = 10
+# Longest wait in seconds before restarting the dispatcher after failures
+MAX_RESTART_DELAY = 60
+
+# Extends the lease only if this cluster still holds it
+RENEW_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Drops the lease only if this cluster still holds it
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
 
 class Timer:
     __slots__ = ("id", "user", "content", "channel", "type", "start", "end")
@@ -84,122 +115,329 @@ class Timer:
     def human_delta(self) -> str:
         return f"{self.end - self.start}".split(".")[0]
 
+    @property
+    def partition(self) -> int:
+        return self.user % TIMER_PARTITIONS
+
 
 class Scheduling(commands.Cog):
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
-        self._handles = 0 in self.bot.shard_ids
-
-        self._have_data = asyncio.Event()
-        self._current_timer = None
-
-        if self._handles:
-            self._task = asyncio.create_task(self.dispatch_timers())
+        # Partitions this cluster holds the lease for
+        self._partitions: set[int] = set()
+        self._renew_lease = bot.redis.register_script(RENEW_LEASE_SCRIPT)
+        self._release_lease = bot.redis.register_script(RELEASE_LEASE_SCRIPT)
+
+        # Min-heap of (end, id) of all loaded timers
+        # Removed timers are only dropped from _timers and skipped lazily
+        self._heap: list[tuple[datetime, int]] = []
+        self._timers: dict[int, Timer] = {}
+        # All reminders ending before this are loaded
+        self._window_end: datetime | None = None
+        self._wakeup = asyncio.Event()
+        self._send_semaphore = asyncio.Semaphore(DELIVERY_CONCURRENCY)
+        # Running deliveries, their timers are already deleted
+        self._deliveries: set[asyncio.Task] = set()
+        # Dispatcher failures in a row
+        self._failures = 0
+
+        self._task = asyncio.create_task(self.dispatch_timers())
+        self._lease_task = asyncio.create_task(self.manage_leases())
+
+    async def cog_unload(self) -> None:
+        self._task.cancel()
+        self._lease_task.cancel()
+        if self._deliveries:
+            await asyncio.wait(self._deliveries, timeout=10)
+        await self.release_leases()
+
+    def _delivered(self, task: asyncio.Task) -> None:
+        self._deliveries.discard(task)
+        if not task.cancelled() and (e := task.exception()) is not None:
+            self.bot.logger.error("Failed to deliver reminders", exc_info=e)
+
+    @staticmethod
+    def lease_key(partition: int) -> str:
+        return f"timers:lease:{partition}"
+
+    def preferred_owner(self, partition: int) -> int:
+        """The cluster a partition belongs to while it is alive"""
+        return partition % self.bot.cluster_count + 1
+
+    async def manage_leases(self) -> None:
+        """
+        Renews the partition leases of this cluster, hands partitions back to
+        their preferred cluster and takes over the ones nobody holds
+        """
+        await self.bot.wait_until_ready()
+        me = str(self.bot.cluster_id)
+        while not self.bot.is_closed():
+            try:
+                stats = await self.bot.cogs["Sharding"].cluster_stats()
+                alive = {int(i) for i in stats["clusters"]} | {self.bot.cluster_id}
+
+                for partition in range(TIMER_PARTITIONS):
+                    key = self.lease_key(partition)
+                    preferred = self.preferred_owner(partition)
+                    if partition in self._partitions:
+                        if preferred != self.bot.cluster_id and preferred in alive:
+                            await self._release_lease(keys=[key], args=[me])
+                            self._drop_partition(partition)
+                        elif not await self._renew_lease(
+                            keys=[key], args=[me, LEASE_TTL]
+                        ):
+                            self._drop_partition(partition)
+                    elif (
+                        preferred == self.bot.cluster_id or preferred not in alive
+                    ) and await self.bot.redis.execute_command(
+                        "SET", key, me, "NX", "PX", LEASE_TTL
+                    ):
+                        await self._add_partition(partition)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.bot.logger.warning(f"Failed to manage timer leases: {e}")
+            await asyncio.sleep(LEASE_INTERVAL)
+
+    async def release_leases(self) -> None:
+        me = str(self.bot.cluster_id)
+        for partition in list(self._partitions):
+            await self._release_lease(keys=[self.lease_key(partition)], args=[me])
+            self._drop_partition(partition)
+
+    async def _add_partition(self, partition: int) -> None:
+        self._partitions.add(partition)
+        # Otherwise the dispatcher loads it with the first window
+        if self._window_end is None:
+            return
+        try:
+            records = await self.bot.pool.fetch(
+                'SELECT * FROM reminders WHERE "end"<$1 AND "user" % $2 = $3;',
+                self._window_end,
+                TIMER_PARTITIONS,
+                partition,
+            )
+        except Exception:
+            # Refills skip the current window, so let the partition be claimed again
+            self._drop_partition(partition)
+            await self._release_lease(
+                keys=[self.lease_key(partition)], args=[str(self.bot.cluster_id)]
+            )
+            raise
+        for record in records:
+            self._push(Timer(record=record))
+        self._wakeup.set()
+
+    def _drop_partition(self, partition: int) -> None:
+        self._partitions.discard(partition)
+        for id in [
+            id for id, timer in self._timers.items() if timer.partition == partition
+        ]:
+            del self._timers[id]
+
+    def _push(self, timer: Timer) -> bool:
+        """Adds a timer if its partition is held here, returns whether it did"""
+        if timer.partition not in self._partitions:
+            return False
+        self._timers[timer.id] = timer
+        heapq.heappush(self._heap, (timer.end, timer.id))
+        return True
+
+    def _next_end(self) -> datetime | None:
+        while self._heap and self._heap[0][1] not in self._timers:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now: datetime) -> list[Timer]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _end, id = heapq.heappop(self._heap)
+            if (timer := self._timers.pop(id, None)) is not None:
+                due.append(timer)
+        return due
+
+    async def load_timers(self, until: datetime) -> None:
+        """Loads the reminders between the end of the current window and until"""
+        start, self._window_end = self._window_end, until
+        if not (partitions := list(self._partitions)):
+            return
+        if start is None:
+            records = await self.bot.pool.fetch(
+                'SELECT * FROM reminders WHERE "end"<$1 AND "user" % $2 = ANY($3);',
+                until,
+                TIMER_PARTITIONS,
+                partitions,
+            )
         else:
-            self._task = None
-
-    async def get_active_timer(self, *, connection=None, days=7) -> Timer | None:
-        query = 'SELECT * FROM reminders WHERE "end" < (CURRENT_DATE + $1::interval) ORDER BY "end" LIMIT 1;'
-        con = connection or self.bot.pool
-
-        record = await con.fetchrow(query, timedelta(days=days))
-        return Timer(record=record) if record else None
-
-    async def wait_for_active_timers(self, *, conn=None, days=7) -> Timer:
-        async with self.bot.pool.acquire() as conn:
-            timer = await self.get_active_timer(connection=conn, days=days)
-            if timer is not None:
-                self._have_data.set()
-                return timer
-
-            self._have_data.clear()
-            self._current_timer = None
-            await self._have_data.wait()
-            return await self.get_active_timer(connection=conn, days=days)
-
-    async def dispatch_timers(self):
+            records = await self.bot.pool.fetch(
+                'SELECT * FROM reminders WHERE "end">=$1 AND "end"<$2 AND "user" % $3'
+                " = ANY($4);",
+                start,
+                until,
+                TIMER_PARTITIONS,
+                partitions,
+            )
+        for record in records:
+            self._push(Timer(record=record))
+
+    async def dispatch_timers(self, delay: float = 0):
+        await asyncio.sleep(delay)
+        self._heap = []
+        self._timers = {}
+        self._window_end = None
         try:
             while not self.bot.is_closed():
-                timer = self._current_timer = await self.wait_for_active_timers(days=40)
                 now = datetime.utcnow()
-
-                if timer.end >= now:
-                    to_sleep = (timer.end - now).total_seconds()
-                    await asyncio.sleep(to_sleep)
-
+                if (
+                    self._window_end is None
+                    or self._window_end - now < TIMER_WINDOW / 2
+                ):
+                    await self.load_timers(now + TIMER_WINDOW)
+                    self._failures = 0
+
+                if due := self._pop_due(now):
+                    # During a lease handover two clusters may hold the same
+                    # timer, only the one that deletes it sends it
+                    deleted = {
+                        r["id"]
+                        for r in await self.bot.pool.fetch(
+                            'DELETE FROM reminders WHERE "id"=ANY($1) RETURNING "id";',
+                            [timer.id for timer in due],
+                        )
+                    }
+                    if due := [timer for timer in due if timer.id in deleted]:
+                        # Delivery runs in the background so later timers are not delayed
+                        task = asyncio.create_task(self._deliver(due))
+                        self._deliveries.add(task)
+                        task.add_done_callback(self._delivered)
+                    continue
+
+                # Sleep until the next timer is due, a new timer is added
+                # before it or the window needs to be refilled
+                wake_at = self._window_end - TIMER_WINDOW / 2
+                if (next_end := self._next_end()) is not None:
+                    wake_at = min(wake_at, next_end)
+                self._wakeup.clear()
                 try:
-                    await self._remind(timer)
-                except Exception:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), (wake_at - now).total_seconds()
+                    )
+                except asyncio.TimeoutError:
                     pass
         except asyncio.CancelledError:
             raise
-        except (OSError, discord.ConnectionClosed, asyncpg.PostgresConnectionError):
-            self.restart()
+        except Exception:
+            self._failures += 1
+            delay = min(2**self._failures, MAX_RESTART_DELAY)
+            self.bot.logger.exception(
+                f"Timer dispatcher failed, restarting in {delay}s"
+            )
+            self.restart(delay)
 
     @commands.Cog.listener()
     async def on_timer_add(self, timer: Timer) -> None:
-        if not self._handles:
+        if self._window_end is None:
             return
 
-        if (timer.end - timer.start).total_seconds() <= (86400 * 40):  # 40 days
-            self._have_data.set()
-        if self._current_timer and timer.end < self._current_timer.end:
-            self.restart()
+        # Later timers are loaded once the window reaches them
+        if timer.end < self._window_end:
+            if self._push(timer) and self._heap[0][1] == timer.id:
+                self._wakeup.set()
 
     @commands.Cog.listener()
     async def on_timer_remove(self, timer_id: int) -> None:
-        if not self._handles:
-            return
+        self._timers.pop(timer_id, None)
 
-        if self._current_timer and self._current_timer.id == timer_id:
-            self.restart()
+    async def partition_owner(self, user: int) -> int | None:
+        """Returns the cluster that dispatches the reminders of a user"""
+        owner = await self.bot.redis.execute_command(
+            "GET", self.lease_key(user % TIMER_PARTITIONS)
+        )
+        return int(owner) if owner is not None else None
 
     async def add_timer(self, timer: Timer) -> None:
-        await self.bot.cogs["Sharding"].handler("add_timer", 0, args=timer.to_dict())
+        # Without an owner the next one loads it from the database
+        if (owner := await self.partition_owner(timer.user)) is None:
+            return
+        if owner == self.bot.cluster_id:
+            self.bot.dispatch("timer_add", timer)
+        else:
+            await self.bot.cogs["Sharding"].handler(
+                "add_timer", 0, args=timer.to_dict(), cluster=owner
+            )
 
-    async def remove_timer(self, timer_id: int) -> None:
-        await self.bot.cogs["Sharding"].handler(
-            "remove_timer", 0, args={"timer_id": timer_id}
-        )
+    async def remove_timer(self, timer_id: int, user: int) -> None:
+        if (owner := await self.partition_owner(user)) is None:
+            return
+        if owner == self.bot.cluster_id:
+            self.bot.dispatch("timer_remove", timer_id)
+        else:
+            await self.bot.cogs["Sharding"].handler(
+                "remove_timer", 0, args={"timer_id": timer_id}, cluster=owner
+            )
 
-    def restart(self):
-        if self._task:
-            self._task.cancel()
-            self._task = asyncio.create_task(self.dispatch_timers())
+    def restart(self, delay: float = 0):
+        self._task.cancel()
+        self._task = asyncio.create_task(self.dispatch_timers(delay))
 
     async def short_timer_optimisation(self, seconds: int, timer: Timer) -> None:
         await asyncio.sleep(seconds)
         await self._remind(timer)
 
     async def _remind(self, timer: Timer):
-        locale = await self.bot.get_cog("Locale").locale(timer.user)
-        current_locale.set(locale)
-        await self.bot.pool.execute('DELETE FROM reminders WHERE "id"=$1;', timer.id)
+        await self._deliver([timer])
 
+    def _reminder_text(self, timer: Timer) -> str:
         if timer.type == "reminder":
-            with handle_message_parameters(
-                content=_(
-                    "{user}, you wanted to be reminded about {subject} {diff} ago."
-                ).format(
-                    user=f"<@{timer.user}>",
-                    subject=timer.content,
-                    diff=timer.human_delta,
-                )
-            ) as params:
-                await self.bot.http.send_message(
-                    timer.channel,
-                    params=params,
-                )
+            return _(
+                "{user}, you wanted to be reminded about {subject} {diff} ago."
+            ).format(
+                user=f"<@{timer.user}>",
+                subject=timer.content,
+                diff=timer.human_delta,
+            )
         else:
-            with handle_message_parameters(
-                content=_("{user}, your adventure {num} has finished.").format(
-                    user=f"<@{timer.user}>", num=timer.content
-                )
-            ) as params:
-                await self.bot.http.send_message(
-                    timer.channel,
-                    params=params,
-                )
+            return _("{user}, your adventure {num} has finished.").format(
+                user=f"<@{timer.user}>", num=timer.content
+            )
+
+    async def _deliver(self, timers: list[Timer]) -> None:
+        """Sends the reminders for timers, all reminders for a channel in one message"""
+        locales = await self.bot.get_cog("Locale").locales_for(
+            {timer.user for timer in timers}
+        )
+
+        by_channel = defaultdict(list)
+        for timer in timers:
+            current_locale.set(locales[timer.user])
+            by_channel[timer.channel].append(self._reminder_text(timer))
+
+        await asyncio.gather(
+            *[
+                self._send_reminders(channel, lines)
+                for channel, lines in by_channel.items()
+            ],
+            return_exceptions=True,
+        )
+        lag = datetime.utcnow() - min(timer.end for timer in timers)
+        self.bot.logger.debug(
+            f"Delivered {len(timers)} reminders to {len(by_channel)} channels,"
+            f" lag {lag}"
+        )
+
+    async def _send_reminders(self, channel: int, lines: list[str]) -> None:
+        # Messages to the same channel share a rate limit bucket, send them in order
+        messages = [lines[0]]
+        for line in lines[1:]:
+            if len(messages[-1]) + len(line) + 1 > 2000:
+                messages.append(line)
+            else:
+                messages[-1] = f"{messages[-1]}\n{line}"
+
+        async with self._send_semaphore:
+            for content in messages:
+                with handle_message_parameters(content=content) as params:
+                    await self.bot.http.send_message(channel, params=params)
 
     async def create_reminder(
         self,
@@ -335,7 +573,7 @@ class Scheduling(commands.Cog):
         if status == "DELETE 0":
             return await ctx.send(_("None of these reminder IDs belong to you."))
 
-        await self.remove_timer(id)
+        await self.remove_timer(id, ctx.author.id)
 
         await ctx.send(_("Successfully cancelled the reminder."))
 
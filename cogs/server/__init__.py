@@ -76,7 +76,7 @@ class Server(commands.Cog):
                         prefix,
                         ctx.guild.id,
                     )
-        self.bot.all_prefixes[ctx.guild.id] = prefix
+        await self.bot.invalidate_prefix(ctx.guild.id)
         await ctx.send(_("Prefix changed to `{prefix}`.").format(prefix=prefix))
 
     @commands.has_permissions(manage_guild=True)
@@ -85,7 +85,7 @@ class Server(commands.Cog):
     async def reset(self, ctx: Context) -> None:
         _("""Resets the server settings.""")
         await self.bot.pool.execute('DELETE FROM server WHERE "id"=$1;', ctx.guild.id)
-        self.bot.all_prefixes.pop(ctx.guild.id, None)
+        await self.bot.invalidate_prefix(ctx.guild.id)
         await ctx.send(_("Done!"))
 
     @commands.guild_only()
@@ -93,9 +93,7 @@ class Server(commands.Cog):
     @locale_doc
     async def prefix(self, ctx: Context) -> None:
         _("""View the bot prefix for the server""")
-        prefix_ = self.bot.all_prefixes.get(
-            ctx.guild.id, self.bot.config.bot.global_prefix
-        )
+        prefix_ = await self.bot.get_guild_prefix(ctx.guild.id)
         await ctx.send(
             _(
                 "The prefix for server **{server}** is"
@@ -16,22 +16,26 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import asyncio
-import json
 
 from datetime import datetime, timedelta
-from time import time
+from time import monotonic, perf_counter, time
 from typing import Any
 from uuid import uuid4
 
-import discord
+import orjson
+import psutil
 
 from discord.ext import commands
 
 from cogs.scheduler import Timer
 from utils.eval import evaluate as _evaluate
 from utils.i18n import _, locale_doc
+from utils.ipc import Channels, ClusterReply, GatherResult, cluster_for_shard
 from utils.misc import nice_join
 
+# How often every cluster reports its stats, in seconds
+HEARTBEAT_INTERVAL = 30
+
 
 # Cross-process cooldown check (pass this to commands)
 def user_on_cooldown(cooldown: int, identifier: str = None):
@@ -40,17 +44,10 @@ def user_on_cooldown(cooldown: int, identifier: str = None):
             cmd_id = ctx.command.qualified_name
         else:
             cmd_id = identifier
-        command_ttl = await ctx.bot.redis.execute_command(
-            "TTL", f"cd:{ctx.author.id}:{cmd_id}"
+        command_ttl = await ctx.bot.cooldowns.check(
+            f"cd:{ctx.author.id}:{cmd_id}", cmd_id, cooldown
         )
         if command_ttl == -2:
-            await ctx.bot.redis.execute_command(
-                "SET",
-                f"cd:{ctx.author.id}:{cmd_id}",
-                cmd_id,
-                "EX",
-                cooldown,
-            )
             return True
         else:
             raise commands.CommandOnCooldown(ctx, command_ttl, commands.BucketType.user)
@@ -63,22 +60,15 @@ def guild_on_cooldown(cooldown: int):
     async def predicate(ctx):
         guild = getattr(ctx, "character_data", None)
         if not guild:
-            guild = await ctx.bot.pool.fetchval(
-                'SELECT guild FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+            guild = await ctx.bot.get_user_guild(ctx.author.id)
         else:
             guild = guild["guild"]
-        command_ttl = await ctx.bot.redis.execute_command(
-            "TTL", f"guildcd:{guild}:{ctx.command.qualified_name}"
+        command_ttl = await ctx.bot.cooldowns.check(
+            f"guildcd:{guild}:{ctx.command.qualified_name}",
+            ctx.command.qualified_name,
+            cooldown,
         )
         if command_ttl == -2:
-            await ctx.bot.redis.execute_command(
-                "SET",
-                f"guildcd:{guild}:{ctx.command.qualified_name}",
-                ctx.command.qualified_name,
-                "EX",
-                cooldown,
-            )
             return True
         else:
             raise commands.CommandOnCooldown(
@@ -93,28 +83,17 @@ def alliance_on_cooldown(cooldown: int):
     async def predicate(ctx):
         data = getattr(ctx, "character_data", None)
         if not data:
-            alliance = await ctx.bot.pool.fetchval(
-                'SELECT alliance FROM guild WHERE "id"=(SELECT guild FROM profile WHERE'
-                ' "user"=$1);',
-                ctx.author.id,
-            )
+            guild = await ctx.bot.get_user_guild(ctx.author.id)
         else:
             guild = data["guild"]
-            alliance = await ctx.bot.pool.fetchval(
-                'SELECT alliance FROM guild WHERE "id"=$1;', guild
-            )
+        alliance = await ctx.bot.get_guild_alliance(guild)
 
-        command_ttl = await ctx.bot.redis.execute_command(
-            "TTL", f"alliancecd:{alliance}:{ctx.command.qualified_name}"
+        command_ttl = await ctx.bot.cooldowns.check(
+            f"alliancecd:{alliance}:{ctx.command.qualified_name}",
+            ctx.command.qualified_name,
+            cooldown,
         )
         if command_ttl == -2:
-            await ctx.bot.redis.execute_command(
-                "SET",
-                f"alliancecd:{alliance}:{ctx.command.qualified_name}",
-                ctx.command.qualified_name,
-                "EX",
-                cooldown,
-            )
             return True
         else:
             raise commands.CommandOnCooldown(
@@ -126,20 +105,15 @@ def alliance_on_cooldown(cooldown: int):
 
 def next_day_cooldown():
     async def predicate(ctx):
-        command_ttl = await ctx.bot.redis.execute_command(
-            "TTL", f"cd:{ctx.author.id}:{ctx.command.qualified_name}"
+        ctt = int(
+            86400 - (time() % 86400)
+        )  # Calculate the number of seconds until next UTC midnight
+        command_ttl = await ctx.bot.cooldowns.check(
+            f"cd:{ctx.author.id}:{ctx.command.qualified_name}",
+            ctx.command.qualified_name,
+            ctt,
         )
         if command_ttl == -2:
-            ctt = int(
-                86400 - (time() % 86400)
-            )  # Calculate the number of seconds until next UTC midnight
-            await ctx.bot.redis.execute_command(
-                "SET",
-                f"cd:{ctx.author.id}:{ctx.command.qualified_name}",
-                ctx.command.qualified_name,
-                "EX",
-                ctt,
-            )
             return True
         else:
             raise commands.CommandOnCooldown(ctx, command_ttl, commands.BucketType.user)
@@ -151,45 +125,90 @@ class Sharding(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.router = None
+        self.channels = Channels(bot.config.database.redis_shard_announce_channel)
+        self.inbox = self.channels.cluster(bot.cluster_id)
+        # The cluster that receives DMs and builds the stats totals
+        self.main_cluster = cluster_for_shard(0, bot.config.launcher.shards_per_cluster)
         self.pubsub = bot.redis.pubsub()
         asyncio.create_task(self.register_sub())
         self._messages = dict()
         """
         _messages should be a dict with the syntax {"<command_id>": [outputs]}
         """
+        # command_id -> (expected clusters, result, sent at, completion future)
+        self._gathers = dict()
+        # (valid until, IDs of the live clusters)
+        self._live_clusters = (0.0, None)
+        self.heartbeat = asyncio.create_task(self.stats_heartbeat())
         if 0 in self.bot.shard_ids:
+            # DM interactions arrive on shard 0, views register the cluster
+            # owning them with Bot.register_view so they can be routed there
             self.bot.add_listener(self.on_raw_interaction)
 
     def cog_unload(self):
+        self.heartbeat.cancel()
         asyncio.create_task(self.unregister_sub())
 
     async def register_sub(self):
-        await self.pubsub.subscribe(
-            self.bot.config.database.redis_shard_announce_channel
-        )
+        await self.pubsub.subscribe(self.channels.broadcast, self.inbox)
         self.router = asyncio.create_task(self.event_handler())
 
     async def unregister_sub(self):
         if self.router and not self.router.cancelled:
             self.router.cancel()
-        await self.pubsub.unsubscribe(
-            self.bot.config.database.redis_shard_announce_channel
+        await self.pubsub.unsubscribe(self.channels.broadcast, self.inbox)
+
+    async def send_output(self, command_id: str, output: Any) -> None:
+        await self.bot.redis.execute_command(
+            "PUBLISH",
+            self.channels.reply(command_id),
+            orjson.dumps(
+                {
+                    "output": output,
+                    "command_id": command_id,
+                    "cluster_id": self.bot.cluster_id,
+                }
+            ),
         )
 
+    async def send_error(self, command_id: str, error: str) -> None:
+        await self.bot.redis.execute_command(
+            "PUBLISH",
+            self.channels.reply(command_id),
+            orjson.dumps(
+                {
+                    "error": error,
+                    "command_id": command_id,
+                    "cluster_id": self.bot.cluster_id,
+                }
+            ),
+        )
+
+    async def run_action(self, payload: dict[str, Any]) -> None:
+        try:
+            await getattr(self, payload["action"])(
+                **payload.get("args", {}), command_id=payload["command_id"]
+            )
+        except Exception as e:
+            # Tell the requester instead of letting it run into the timeout
+            await self.send_error(payload["command_id"], f"{type(e).__name__}: {e}")
+
     async def event_handler(self):
         """
         main router
 
         Possible messages to come:
         {"scope":<bot/launcher>, "action": "<name>", "args": "<dict of args>", "command_id": "<uuid4>"}
-        {"output": "<string>", "command_id": "<uuid4>"}
+        {"output": "<string>", "command_id": "<uuid4>", "cluster_id": <int>}
+        {"error": "<string>", "command_id": "<uuid4>", "cluster_id": <int>}
+        {"type": "raw_interaction", "data": "<interaction payload>"}
         """
         async for message in self.pubsub.listen():
             if message["type"] != "message":
                 continue
             try:
-                payload = json.loads(message["data"])
-            except json.JSONDecodeError:
+                payload = orjson.loads(message["data"])
+            except orjson.JSONDecodeError:
                 continue
 
             if (type := payload.get("type")) and (data := payload.get("data")):
@@ -199,31 +218,138 @@ class Sharding(commands.Cog):
             if payload.get("action") and hasattr(self, payload.get("action")):
                 if payload.get("scope") != "bot":
                     continue  # it's not our cup of tea
-                if payload.get("args"):
-                    asyncio.create_task(
-                        getattr(self, payload["action"])(
-                            **payload["args"],
-                            command_id=payload["command_id"],
-                        )
-                    )
-                else:
-                    asyncio.create_task(
-                        getattr(self, payload["action"])(
-                            command_id=payload["command_id"]
-                        )
-                    )
-            if payload.get("output") and payload.get("command_id") in self._messages:
+                asyncio.create_task(self.run_action(payload))
+            if (gather := self._gathers.get(payload.get("command_id"))) is not None:
+                self._add_reply(gather, payload)
+            elif payload.get("output") and payload.get("command_id") in self._messages:
                 for fut in self._messages[payload["command_id"]]:
                     if not fut.done():
                         fut.set_result(payload["output"])
                         break
 
+    def _add_reply(self, gather, payload: dict[str, Any]) -> None:
+        expected, result, sent_at, done = gather
+        cluster_id = payload.get("cluster_id")
+        if cluster_id is None or cluster_id in result.replies:
+            return
+        result.replies[cluster_id] = ClusterReply(
+            cluster_id=cluster_id,
+            latency=perf_counter() - sent_at,
+            output=payload.get("output"),
+            error=payload.get("error"),
+        )
+        if expected <= result.replies.keys() and not done.done():
+            done.set_result(None)
+
+    async def live_clusters(self) -> set[int]:
+        """
+        Returns the IDs of the clusters the launcher reports as active
+        Cached for a few seconds, falls back to all clusters if the launcher is down
+        """
+        valid_until, clusters = self._live_clusters
+        if clusters is not None and valid_until > monotonic():
+            return clusters
+        statuses = await self.handler("statuses", 1, scope="launcher", _timeout=1)
+        if statuses:
+            clusters = {int(i) for i, data in statuses[0].items() if data["active"]}
+        else:
+            clusters = set(range(1, self.bot.cluster_count + 1))
+        self._live_clusters = (monotonic() + 10, clusters)
+        return clusters
+
+    async def gather(
+        self, action: str, args: dict | None = None, timeout: float = 2
+    ) -> GatherResult:
+        """
+        Sends an action to all clusters and collects their replies
+        Returns as soon as every live cluster answered or when the timeout is hit,
+        clusters that did not answer by then are in the result's missing set.
+
+        ex:
+            guilds = sum((await bot.cogs["Sharding"].gather("guild_count")).outputs)
+        """
+        expected = await self.live_clusters()
+        command_id = f"{uuid4()}"
+        result = GatherResult()
+        done = asyncio.get_running_loop().create_future()
+        self._gathers[command_id] = (expected, result, perf_counter(), done)
+        await self.pubsub.subscribe(self.channels.reply(command_id))
+        payload = {"scope": "bot", "action": action, "command_id": command_id}
+        if args:
+            payload["args"] = args
+        try:
+            await self.bot.redis.execute_command(
+                "PUBLISH", self.channels.broadcast, orjson.dumps(payload)
+            )
+            await asyncio.wait_for(done, timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            del self._gathers[command_id]
+            await self.pubsub.unsubscribe(self.channels.reply(command_id))
+        result.missing = expected - result.replies.keys()
+        return result
+
+    async def stats_heartbeat(self) -> None:
+        await self.bot.wait_until_ready()
+        process = psutil.Process()
+        while not self.bot.is_closed():
+            entry = {
+                "name": self.bot.cluster_name,
+                "shards": self.bot.shard_ids,
+                "guilds": len(self.bot.guilds),
+                "latency": round(self.bot.latency * 1000),
+                "memory": process.memory_info().rss,
+                "updated_at": time(),
+            }
+            await self.bot.redis.execute_command(
+                "HSET", self.channels.stats, self.bot.cluster_id, orjson.dumps(entry)
+            )
+            # Only one cluster builds the totals for everyone
+            if self.bot.cluster_id == self.main_cluster:
+                await self.aggregate_stats()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def aggregate_stats(self) -> dict[str, Any]:
+        """Builds the totals from the stats all clusters reported recently"""
+        entries = await self.bot.redis.execute_command("HGETALL", self.channels.stats)
+        now = time()
+        clusters = {}
+        for cluster_id, raw in entries.items():
+            entry = orjson.loads(raw)
+            if now - entry["updated_at"] <= HEARTBEAT_INTERVAL * 3:
+                clusters[cluster_id.decode()] = entry
+        snapshot = {
+            "guilds": sum(c["guilds"] for c in clusters.values()),
+            "shards": sum(len(c["shards"]) for c in clusters.values()),
+            "memory": sum(c["memory"] for c in clusters.values()),
+            "clusters": clusters,
+            "updated_at": now,
+        }
+        await self.bot.redis.execute_command(
+            "SET",
+            self.channels.stats_snapshot,
+            orjson.dumps(snapshot),
+            "EX",
+            HEARTBEAT_INTERVAL * 3,
+        )
+        return snapshot
+
+    async def cluster_stats(self) -> dict[str, Any]:
+        """
+        Returns the latest totals for all clusters
+        Keys are guilds, shards, memory, clusters (per cluster ID) and updated_at
+        """
+        if raw := await self.bot.redis.execute_command(
+            "GET", self.channels.stats_snapshot
+        ):
+            return orjson.loads(raw)
+        # The aggregating cluster is down
+        return await self.aggregate_stats()
+
     async def reload_bans(self, command_id: int):
         await self.bot.load_bans()
 
-    async def clear_donator_cache(self, user_id: int, command_id: int):
-        self.bot.get_donator_rank.invalidate(self.bot, user_id)
-
     async def remove_timer(self, timer_id: int, command_id: int) -> None:
         self.bot.dispatch("timer_remove", timer_id)
 
@@ -241,51 +367,26 @@ class Sharding(commands.Cog):
         self.bot.dispatch("timer_add", timer)
 
     async def guild_count(self, command_id: str):
-        payload = {"output": len(self.bot.guilds), "command_id": command_id}
-        await self.bot.redis.execute_command(
-            "PUBLISH",
-            self.bot.config.database.redis_shard_announce_channel,
-            json.dumps(payload),
-        )
+        await self.send_output(command_id, len(self.bot.guilds))
 
     async def send_latency_and_shard_count(self, command_id: str):
-        payload = {
-            "output": {
-                f"{self.bot.cluster_id}": [
-                    self.bot.cluster_name,
-                    self.bot.shard_ids,
-                    round(self.bot.latency * 1000),
-                ]
-            },
-            "command_id": command_id,
+        output = {
+            f"{self.bot.cluster_id}": [
+                self.bot.cluster_name,
+                self.bot.shard_ids,
+                round(self.bot.latency * 1000),
+            ]
         }
-        await self.bot.redis.execute_command(
-            "PUBLISH",
-            self.bot.config.database.redis_shard_announce_channel,
-            json.dumps(payload),
-        )
+        await self.send_output(command_id, output)
 
     async def evaluate(self, code, command_id: str):
         if code.startswith("```") and code.endswith("```"):
             code = "\n".join(code.split("\n")[1:-1])
         code = code.strip("` \n")
-        payload = {"output": await _evaluate(self.bot, code), "command_id": command_id}
-        await self.bot.redis.execute_command(
-            "PUBLISH",
-            self.bot.config.database.redis_shard_announce_channel,
-            json.dumps(payload),
-        )
+        await self.send_output(command_id, await _evaluate(self.bot, code))
 
     async def latency(self, command_id: str):
-        payload = {
-            "output": round(self.bot.latency * 1000, 2),
-            "command_id": command_id,
-        }
-        await self.bot.redis.execute_command(
-            "PUBLISH",
-            self.bot.config.database.redis_shard_announce_channel,
-            json.dumps(payload),
-        )
+        await self.send_output(command_id, round(self.bot.latency * 1000, 2))
 
     async def wait_for_dms(self, check, timeout, command_id: str):
         """
@@ -314,12 +415,7 @@ class Sharding(commands.Cog):
             return data_matches(check, e)
 
         out = await self.bot.wait_for("raw_message_create", check=pred, timeout=timeout)
-        payload = {"output": out, "command_id": command_id}
-        await self.bot.redis.execute_command(
-            "PUBLISH",
-            self.bot.config.database.redis_shard_announce_channel,
-            json.dumps(payload),
-        )
+        await self.send_output(command_id, out)
 
     async def handler(
         self,
@@ -328,6 +424,7 @@ class Sharding(commands.Cog):
         args: dict = {},
         _timeout: int = 2,
         scope: str = "bot",
+        cluster: int | None = None,
     ):  # TODO: think of a better name
         """
         coro
@@ -341,6 +438,7 @@ class Sharding(commands.Cog):
         args: dict           A dictionary for the action function's args to pass
         _timeout: int=2      Maximal amount of time waiting for incoming responses
         scope: str="bot"     Can be either launcher or bot. Used to differentiate them
+        cluster: int=None    Only send the event to this cluster instead of all of them
         """
         # Preparation
         command_id = f"{uuid4()}"  # str conversion
@@ -349,16 +447,19 @@ class Sharding(commands.Cog):
                 asyncio.Future() for _ in range(expected_count)
             ]  # must create it (see the router)
             results = []
+            await self.pubsub.subscribe(self.channels.reply(command_id))
 
         # Sending
         payload = {"scope": scope, "action": action, "command_id": command_id}
         if args:
             payload["args"] = args
-        await self.bot.redis.execute_command(
-            "PUBLISH",
-            self.bot.config.database.redis_shard_announce_channel,
-            json.dumps(payload),
-        )
+        if scope == "launcher":
+            channel = self.channels.launcher
+        elif cluster is not None:
+            channel = self.channels.cluster(cluster)
+        else:
+            channel = self.channels.broadcast
+        await self.bot.redis.execute_command("PUBLISH", channel, orjson.dumps(payload))
 
         if expected_count > 0:
             # Message collector
@@ -371,16 +472,20 @@ class Sharding(commands.Cog):
             except asyncio.TimeoutError:
                 pass
             del self._messages[command_id]
+            await self.pubsub.unsubscribe(self.channels.reply(command_id))
             return results
 
     async def on_raw_interaction(self, interaction_data: dict[str, Any]) -> None:
         # Method called when a DM interaction is received
         payload = {"type": "raw_interaction", "data": interaction_data}
-        await self.bot.redis.execute_command(
-            "PUBLISH",
-            self.bot.config.database.redis_shard_announce_channel,
-            json.dumps(payload),
-        )
+        channel = self.channels.broadcast
+        if message := interaction_data.get("message"):
+            owner = await self.bot.redis.execute_command(
+                "GET", self.channels.view_owner(message["id"])
+            )
+            if owner is not None:
+                channel = self.channels.cluster(int(owner))
+        await self.bot.redis.execute_command("PUBLISH", channel, orjson.dumps(payload))
 
     @commands.command(
         aliases=["cooldowns", "t", "cds"], brief=_("Lists all your cooldowns")
@@ -420,14 +525,11 @@ class Sharding(commands.Cog):
         if not launcher_res:
             return await ctx.send(_("Launcher is dead, that is really bad."))
         process_status = launcher_res[0]
-        process_res = await self.handler(
-            "send_latency_and_shard_count", self.bot.cluster_count, scope="bot"
-        )
+        cluster_stats = (await self.cluster_stats())["clusters"]
         actual_status = []
         for cluster_id, cluster_data in process_status.items():
-            process_data = discord.utils.find(lambda x: cluster_id in x, process_res)
-            if process_data:
-                cluster_data["latency"] = f"{process_data[cluster_id][2]}ms"
+            if process_data := cluster_stats.get(cluster_id):
+                cluster_data["latency"] = f"{process_data['latency']}ms"
             else:
                 cluster_data["latency"] = "NaN"
             cluster_data["cluster_id"] = cluster_id
@@ -161,13 +161,11 @@ class Tournament(commands.Cog):
             for match in matches:
                 await ctx.send(f"{match[0].mention} {text} {match[1].mention}")
                 await asyncio.sleep(2)
-                async with self.bot.pool.acquire() as conn:
-                    val1 = sum(
-                        await self.bot.get_damage_armor_for(match[0], conn=conn)
-                    ) + random.randint(1, 7)
-                    val2 = sum(
-                        await self.bot.get_damage_armor_for(match[1], conn=conn)
-                    ) + random.randint(1, 7)
+                stats = await self.bot.get_combat_stats_many(match)
+                val1, val2 = [
+                    stats[p.id].damage + stats[p.id].armor + random.randint(1, 7)
+                    for p in match
+                ]
                 if val1 > val2:
                     winner = match[0]
                     looser = match[1]
@@ -333,16 +331,16 @@ class Tournament(commands.Cog):
 
                 players = []
 
-                async with self.bot.pool.acquire() as conn:
-                    for player in match:
-                        dmg, deff = await self.bot.get_raidstats(player, conn=conn)
-                        u = {
-                            "user": player,
-                            "hp": 250,
-                            "armor": deff,
-                            "damage": dmg,
-                        }
-                        players.append(u)
+                stats = await self.bot.get_raidstats_many(match)
+                for player in match:
+                    dmg, deff = stats[player.id]
+                    u = {
+                        "user": player,
+                        "hp": 250,
+                        "armor": deff,
+                        "damage": dmg,
+                    }
+                    players.append(u)
 
                 battle_log = deque(
                     [
@@ -15,6 +15,7 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import asyncio
 import datetime
 
 from contextlib import suppress
@@ -33,14 +34,80 @@ from classes.converters import (
 from classes.errors import NoChoice
 from classes.items import ALL_ITEM_TYPES, ItemType
 from cogs.shard_communication import user_on_cooldown as user_cooldown
+from utils import partitions
 from utils.checks import has_char, has_money
 from utils.i18n import _, locale_doc
 
+# How often partitions are created, rolled up and detached, in seconds
+PARTITION_INTERVAL = 3600
+# How many of the matching sales shophistory lists
+SHOPHISTORY_SALES = 50
+
+# Totals of the rolled up days plus the raw sales of the days after them.
+# Bands are whole stats, so they only match the raw filter for whole minstats.
+# Sales that arrive after their day was rolled up are only counted once the
+# day is rolled up again, see partitions.ROLLUP_LOOKBACK.
+SHOPHISTORY_SUMMARY = """
+WITH rolled_up AS (
+    SELECT COALESCE(max("day")+1, $1) AS "until" FROM market_history_daily
+)
+SELECT
+    sum("sales") AS "sales",
+    sum("total_price") AS "total_price",
+    min("min_price") AS "min_price",
+    max("max_price") AS "max_price"
+FROM (
+    SELECT "sales", "total_price", "min_price", "max_price"
+    FROM market_history_daily
+    WHERE "day">=$1 AND "band">=$2 AND ($3::text IS NULL OR "type"=$3)
+    UNION ALL
+    SELECT 1, "price", "price", "price"
+    FROM market_history
+    WHERE "timestamp">=GREATEST($1, (SELECT "until" FROM rolled_up))
+        AND CASE WHEN "type"='Shield' THEN "armor" ELSE "damage" END>=$2
+        AND ($3::text IS NULL OR "type"=$3)
+) sales;
+"""
+
+# The same totals from the raw sales only, for fractional minstats
+SHOPHISTORY_RAW_SUMMARY = """
+SELECT
+    count(*) AS "sales",
+    sum("price") AS "total_price",
+    min("price") AS "min_price",
+    max("price") AS "max_price"
+FROM market_history
+WHERE "timestamp">=$1
+    AND CASE WHEN "type"='Shield' THEN "armor" ELSE "damage" END>=$2
+    AND ($3::text IS NULL OR "type"=$3);
+"""
+
 
 class Trading(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.markdown_escaper = commands.clean_content(escape_markdown=True)
+        # Only one cluster maintains the partitions
+        self._handles = 0 in self.bot.shard_ids
+        self._maintenance = None
+
+    async def cog_load(self) -> None:
+        if self._handles:
+            self._maintenance = asyncio.create_task(self.maintain_partitions())
+
+    def cog_unload(self) -> None:
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+
+    async def maintain_partitions(self) -> None:
+        while not self.bot.is_closed():
+            try:
+                async with self.bot.pool.acquire() as conn:
+                    today = await conn.fetchval("SELECT current_date;")
+                    await partitions.maintain(conn, today)
+            except Exception as e:
+                self.bot.logger.warning(f"Failed to maintain partitions: {e}")
+            await asyncio.sleep(PARTITION_INTERVAL)
 
     @has_char()
     @commands.command(brief=_("Put an item in the market"))
@@ -204,6 +271,7 @@ class Trading(commands.Cog):
                     subject="money",
                     data={"Amount": item["price"] + tax},
                     conn=conn,
+                    persist=True,
                 )
             await self.bot.log_transaction(
                 ctx,
@@ -212,6 +280,7 @@ class Trading(commands.Cog):
                 subject="money",
                 data={"Amount": item["price"]},
                 conn=conn,
+                persist=True,
             )
             await self.bot.log_transaction(
                 ctx,
@@ -220,6 +289,7 @@ class Trading(commands.Cog):
                 subject="shop",
                 data=item,
                 conn=conn,
+                persist=True,
             )
         await ctx.send(
             _(
@@ -310,36 +380,31 @@ class Trading(commands.Cog):
                     types=", ".join(f"`{t.value}`" for t in ALL_ITEM_TYPES)
                 )
             )
-        if itemtype == "All":
-            sales = await self.bot.pool.fetch(
-                "SELECT * FROM market_history WHERE"
-                ' ("damage">=$1 OR "armor">=$1) AND "timestamp">=$2;',
-                minstat,
-                after_date,
-            )
-        elif itemtype == "Shield":
-            sales = await self.bot.pool.fetch(
-                "SELECT * FROM market_history WHERE"
-                ' "armor">=$1 AND "timestamp">=$2 AND "type"=$3;',
-                minstat,
+        type_ = None if itemtype == "All" else itemtype
+        async with self.bot.pool.acquire() as conn:
+            if minstat.is_integer():
+                summary = await conn.fetchrow(
+                    SHOPHISTORY_SUMMARY, after_date, int(minstat), type_
+                )
+            else:
+                summary = await conn.fetchrow(
+                    SHOPHISTORY_RAW_SUMMARY, after_date, minstat, type_
+                )
+            if not summary["sales"]:
+                return await ctx.send(_("No results."))
+            sales = await conn.fetch(
+                'SELECT * FROM market_history WHERE "timestamp">=$1 AND CASE WHEN'
+                ' "type"=\'Shield\' THEN "armor" ELSE "damage" END>=$2 AND ($3::text'
+                ' IS NULL OR "type"=$3) ORDER BY "timestamp" DESC LIMIT $4;',
                 after_date,
-                "Shield",
-            )
-        else:
-            sales = await self.bot.pool.fetch(
-                "SELECT * FROM market_history WHERE"
-                ' "damage">=$1 AND "timestamp">=$2 AND "type"=$3;',
                 minstat,
-                after_date,
-                itemtype,
+                type_,
+                SHOPHISTORY_SALES,
             )
-        if not sales:
-            return await ctx.send(_("No results."))
 
-        prices = [i["price"] for i in sales]
-        max_price = max(prices)
-        min_price = min(prices)
-        avg_price = round(sum(prices) / len(prices), 2)
+        max_price = summary["max_price"]
+        min_price = summary["min_price"]
+        avg_price = round(summary["total_price"] / summary["sales"], 2)
 
         items = [
             discord.Embed(
@@ -370,7 +435,7 @@ class Trading(commands.Cog):
                     " at ${max_price}. The average sale price was"
                     " ${avg_price}.\n\nNavigate to see the sales."
                 ).format(
-                    amount=len(prices),
+                    amount=summary["sales"],
                     min_price=min_price,
                     max_price=max_price,
                     avg_price=avg_price,
@@ -569,7 +634,7 @@ class Trading(commands.Cog):
                 from_=ctx.author.id,
                 to=user.id,
                 subject="item",
-                data={"Name": item["name"], "Value": item["value"]},
+                data={"Id": itemid, "Name": item["name"], "Value": item["value"]},
                 conn=conn,
             )
             await self.bot.log_transaction(
@@ -149,7 +149,11 @@ class Valentine(commands.Cog):
                     from_=1,
                     to=ctx.author.id,
                     subject="item",
-                    data={"Name": item["name"], "Value": item["value"]},
+                    data={
+                        "Id": item["id"],
+                        "Name": item["name"],
+                        "Value": item["value"],
+                    },
                     conn=conn,
                 )
             embed = discord.Embed(
@@ -36,7 +36,10 @@ import uvloop
 from redis import asyncio as aioredis
 
 from utils import random
+from utils.catalog import compile_catalogs
 from utils.config import ConfigLoader
+from utils.i18n import index_docstrings
+from utils.ipc import Channels
 
 config = ConfigLoader("config.toml")
 
@@ -207,8 +210,9 @@ class Main:
         raise ValueError("Unknown instance")
 
     async def event_handler(self) -> None:
+        channels = Channels(config.database.redis_shard_announce_channel)
         pubsub = self.redis.pubsub()
-        await pubsub.subscribe(config.database.redis_shard_announce_channel)
+        await pubsub.subscribe(channels.launcher)
         async for message in pubsub.listen():
             if message["type"] != "message":
                 continue
@@ -250,7 +254,7 @@ class Main:
                     }
                 await self.redis.execute_command(
                     "PUBLISH",
-                    config.database.redis_shard_announce_channel,
+                    channels.reply(payload["command_id"]),
                     orjson.dumps(
                         {"command_id": payload["command_id"], "output": statuses}
                     ),
@@ -261,6 +265,9 @@ class Main:
             names = f.read().splitlines()
 
         asyncio.create_task(self.event_handler())
+        # Once here instead of in every cluster, they all share the results
+        compile_catalogs("locales")
+        index_docstrings("cogs")
 
         recommended_shard_count = await get_gateway_info()
         shard_count = recommended_shard_count + config.launcher.additional_shards
@@ -63,6 +63,46 @@ $$;
 
 ALTER FUNCTION public.insert_alliance_default() OWNER TO jens;
 
+--
+-- Name: notify_guild_leaderboard(); Type: FUNCTION; Schema: public; Owner: jens
+--
+
+CREATE FUNCTION public.notify_guild_leaderboard() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+begin
+if TG_OP = 'DELETE' then
+perform pg_notify('leaderboard', json_build_object('table', 'guild', 'id', OLD.id)::text);
+return OLD;
+end if;
+perform pg_notify('leaderboard', json_build_object('table', 'guild', 'id', NEW.id, 'wins', NEW.wins)::text);
+return NEW;
+end;
+$$;
+
+
+ALTER FUNCTION public.notify_guild_leaderboard() OWNER TO jens;
+
+--
+-- Name: notify_profile_leaderboard(); Type: FUNCTION; Schema: public; Owner: jens
+--
+
+CREATE FUNCTION public.notify_profile_leaderboard() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+begin
+if TG_OP = 'DELETE' then
+perform pg_notify('leaderboard', json_build_object('table', 'profile', 'id', OLD."user")::text);
+return OLD;
+end if;
+perform pg_notify('leaderboard', json_build_object('table', 'profile', 'id', NEW."user", 'money', NEW.money, 'xp', NEW.xp, 'pvpwins', NEW.pvpwins, 'lovescore', NEW.lovescore)::text);
+return NEW;
+end;
+$$;
+
+
+ALTER FUNCTION public.notify_profile_leaderboard() OWNER TO jens;
+
 SET default_tablespace = '';
 
 SET default_table_access_method = heap;
@@ -430,13 +470,33 @@ CREATE TABLE public.market_history (
     armor numeric(5,2) NOT NULL,
     signature character varying(50) DEFAULT NULL::character varying,
     price bigint NOT NULL,
-    "timestamp" timestamp with time zone DEFAULT now(),
+    "timestamp" timestamp with time zone DEFAULT now() NOT NULL,
     offer bigint NOT NULL
-);
+)
+PARTITION BY RANGE ("timestamp");
 
 
 ALTER TABLE public.market_history OWNER TO jens;
 
+--
+-- Name: market_history_daily; Type: TABLE; Schema: public; Owner: jens
+--
+
+CREATE TABLE public.market_history_daily (
+    day date NOT NULL,
+    type character varying(10) NOT NULL,
+    band smallint NOT NULL,
+    sales integer NOT NULL,
+    total_price bigint NOT NULL,
+    avg_price numeric NOT NULL,
+    median_price numeric NOT NULL,
+    min_price bigint NOT NULL,
+    max_price bigint NOT NULL
+);
+
+
+ALTER TABLE public.market_history_daily OWNER TO jens;
+
 --
 -- Name: market_history_id_seq; Type: SEQUENCE; Schema: public; Owner: jens
 --
@@ -606,9 +666,15 @@ CREATE TABLE public.transactions (
     "from" bigint NOT NULL,
     "to" bigint NOT NULL,
     subject character varying(50) NOT NULL,
-    info character varying(582) NOT NULL,
-    "timestamp" timestamp with time zone NOT NULL
-);
+    info character varying(582),
+    "timestamp" timestamp with time zone NOT NULL,
+    command character varying(100),
+    amount bigint,
+    item bigint,
+    rarity character varying(10),
+    data jsonb
+)
+PARTITION BY RANGE ("timestamp");
 
 
 ALTER TABLE public.transactions OWNER TO jens;
@@ -817,8 +883,16 @@ ALTER TABLE ONLY public.loot
 -- Name: market_history market_history_pkey; Type: CONSTRAINT; Schema: public; Owner: jens
 --
 
-ALTER TABLE ONLY public.market_history
-    ADD CONSTRAINT market_history_pkey PRIMARY KEY (id);
+ALTER TABLE public.market_history
+    ADD CONSTRAINT market_history_pkey PRIMARY KEY (id, "timestamp");
+
+
+--
+-- Name: market_history_daily market_history_daily_pkey; Type: CONSTRAINT; Schema: public; Owner: jens
+--
+
+ALTER TABLE ONLY public.market_history_daily
+    ADD CONSTRAINT market_history_daily_pkey PRIMARY KEY (day, type, band);
 
 
 --
@@ -865,8 +939,8 @@ ALTER TABLE ONLY public.server
 -- Name: transactions transactions_pkey; Type: CONSTRAINT; Schema: public; Owner: jens
 --
 
-ALTER TABLE ONLY public.transactions
-    ADD CONSTRAINT transactions_pkey PRIMARY KEY (id);
+ALTER TABLE public.transactions
+    ADD CONSTRAINT transactions_pkey PRIMARY KEY (id, "timestamp");
 
 
 --
@@ -947,12 +1021,105 @@ CREATE INDEX profile_pvpwins_idx ON public.profile USING btree (pvpwins);
 CREATE INDEX profile_xp_idx ON public.profile USING btree (xp);
 
 
+--
+-- Name: transactions_from_timestamp_idx; Type: INDEX; Schema: public; Owner: jens
+--
+
+CREATE INDEX transactions_from_timestamp_idx ON public.transactions USING btree ("from", "timestamp");
+
+
+--
+-- Name: transactions_to_timestamp_idx; Type: INDEX; Schema: public; Owner: jens
+--
+
+CREATE INDEX transactions_to_timestamp_idx ON public.transactions USING btree ("to", "timestamp");
+
+
+--
+-- Name: transactions_item_idx; Type: INDEX; Schema: public; Owner: jens
+--
+
+CREATE INDEX transactions_item_idx ON public.transactions USING btree (item) WHERE (item IS NOT NULL);
+
+
+--
+-- Name: transactions_data_idx; Type: INDEX; Schema: public; Owner: jens
+--
+
+CREATE INDEX transactions_data_idx ON public.transactions USING gin (data jsonb_path_ops);
+
+
+--
+-- Name: market_history_timestamp_idx; Type: INDEX; Schema: public; Owner: jens
+--
+
+CREATE INDEX market_history_timestamp_idx ON public.market_history USING btree ("timestamp");
+
+
+--
+-- Name: transactions_default; Type: TABLE; Schema: public; Owner: jens
+-- Rows outside of all monthly partitions end up here, the bot creates the
+-- monthly ones ahead of time (see utils/partitions.py)
+--
+
+CREATE TABLE public.transactions_default PARTITION OF public.transactions DEFAULT;
+
+CREATE TABLE public.market_history_default PARTITION OF public.market_history DEFAULT;
+
+DO $$
+declare
+    month date;
+    tbl text;
+begin
+    FOREACH tbl IN ARRAY ARRAY['transactions', 'market_history'] LOOP
+        FOR i IN 0..2 LOOP
+            month := date_trunc('month', now())::date + make_interval(months => i);
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L);',
+                tbl || '_' || to_char(month, 'YYYY_MM'),
+                tbl,
+                month,
+                (month + interval '1 month')::date
+            );
+        END LOOP;
+    END LOOP;
+end;
+$$;
+
+
 --
 -- Name: guild insert_alliance_default; Type: TRIGGER; Schema: public; Owner: jens
 --
 
 CREATE TRIGGER insert_alliance_default BEFORE INSERT ON public.guild FOR EACH ROW EXECUTE FUNCTION public.insert_alliance_default();
 
+--
+-- Name: guild notify_guild_leaderboard; Type: TRIGGER; Schema: public; Owner: jens
+--
+
+CREATE TRIGGER notify_guild_leaderboard AFTER INSERT OR DELETE ON public.guild FOR EACH ROW EXECUTE FUNCTION public.notify_guild_leaderboard();
+
+
+--
+-- Name: guild notify_guild_leaderboard_update; Type: TRIGGER; Schema: public; Owner: jens
+--
+
+CREATE TRIGGER notify_guild_leaderboard_update AFTER UPDATE OF wins ON public.guild FOR EACH ROW WHEN ((old.wins IS DISTINCT FROM new.wins)) EXECUTE FUNCTION public.notify_guild_leaderboard();
+
+
+--
+-- Name: profile notify_profile_leaderboard; Type: TRIGGER; Schema: public; Owner: jens
+--
+
+CREATE TRIGGER notify_profile_leaderboard AFTER INSERT OR DELETE ON public.profile FOR EACH ROW EXECUTE FUNCTION public.notify_profile_leaderboard();
+
+
+--
+-- Name: profile notify_profile_leaderboard_update; Type: TRIGGER; Schema: public; Owner: jens
+--
+
+CREATE TRIGGER notify_profile_leaderboard_update AFTER UPDATE OF money, xp, pvpwins, lovescore ON public.profile FOR EACH ROW WHEN ((old.money, old.xp, old.pvpwins, old.lovescore) IS DISTINCT FROM (new.money, new.xp, new.pvpwins, new.lovescore)) EXECUTE FUNCTION public.notify_profile_leaderboard();
+
 
 --
 -- Name: allitems allitems_owner_fkey; Type: FK CONSTRAINT; Schema: public; Owner: jens
@@ -1107,6 +1274,13 @@ GRANT SELECT ON TABLE public.market TO prest;
 GRANT SELECT ON TABLE public.market_history TO prest;
 
 
+--
+-- Name: TABLE market_history_daily; Type: ACL; Schema: public; Owner: jens
+--
+
+GRANT SELECT ON TABLE public.market_history_daily TO prest;
+
+
 --
 -- Name: SEQUENCE market_history_id_seq; Type: ACL; Schema: public; Owner: jens
 --
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Compares the gettext translations that used to be loaded for every locale at
+import time with the memory mapped catalogs: RSS after loading and _()
+throughput. Each mode runs in its own process so the RSS numbers are comparable.
+
+Run from the repository root: PYTHONPATH=. python3 scripts/benchmarks/i18n.py
+"""
+
+import contextvars
+import gettext
+import os
+import random
+import subprocess
+import sys
+import time
+
+from glob import glob
+
+import psutil
+
+CALLS = 1_000_000
+# Locales a cluster typically serves at the same time
+ACTIVE_LOCALES = ("de_DE", "es_ES", "fr_FR", "pt_BR", "ru_RU")
+
+
+def load_gettext():
+    current_locale = contextvars.ContextVar("i18n")
+    translations = {
+        locale: gettext.translation("idlerpg", languages=(locale,), localedir="locales")
+        for locale in map(os.path.basename, filter(os.path.isdir, glob("locales/*")))
+        if os.path.exists(f"locales/{locale}/LC_MESSAGES/idlerpg.mo")
+    }
+    translations["en_US"] = gettext.NullTranslations()
+
+    def _(*args, **kwargs):
+        locale = current_locale.get()
+        return translations.get(locale, translations["en_US"]).gettext(*args, **kwargs)
+
+    return _, current_locale
+
+
+def load_catalogs():
+    from utils.i18n import _, current_locale
+
+    return _, current_locale
+
+
+def run(mode):
+    from utils.catalog import read_mo
+
+    process = psutil.Process()
+    before = process.memory_info().rss
+    start = time.perf_counter()
+    _, current_locale = load_gettext() if mode == "gettext" else load_catalogs()
+    load_time = time.perf_counter() - start
+
+    rng = random.Random(0)
+    messages = [
+        msgid.decode()
+        for msgid, _msgstr in rng.sample(
+            read_mo("locales/de_DE/LC_MESSAGES/idlerpg.mo"), 500
+        )
+    ]
+    calls = [(rng.choice(ACTIVE_LOCALES), rng.choice(messages)) for _i in range(1000)]
+
+    start = time.perf_counter()
+    for _i in range(CALLS // len(calls)):
+        for locale, message in calls:
+            current_locale.set(locale)
+            _(message)
+    call_time = time.perf_counter() - start
+
+    rss = (process.memory_info().rss - before) / 1024 / 1024
+    print(
+        f"{mode:>8}: load {load_time * 1000:7.1f}ms, {CALLS / call_time:10,.0f} _()/s,"
+        f" RSS +{rss:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        from utils.catalog import compile_catalogs
+
+        compile_catalogs("locales")
+        for mode in ("gettext", "catalog"):
+            subprocess.run([sys.executable, __file__, mode], check=True)
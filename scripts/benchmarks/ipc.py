@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Load test for the cluster IPC with simulated clusters (32 by default).
+
+Every round, one cluster sends a request that is answered by one other
+cluster, and a DM interaction is forwarded to the cluster that owns it.
+This is done once with the old single broadcast channel and once with the
+routed channels. The script reports how many messages the clusters had to
+decode and how long the rounds took.
+
+Needs the local Redis configured in config.toml.
+Run from the repository root: PYTHONPATH=. python3 scripts/benchmarks/ipc.py
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from uuid import uuid4
+
+import orjson
+
+from redis import asyncio as aioredis
+
+from utils.config import ConfigLoader
+from utils.ipc import Channels
+
+CLUSTERS = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+# Roughly the size of an interaction payload
+INTERACTION = {"id": "0", "type": 3, "data": {"custom_id": "x" * 32}, "pad": "x" * 2000}
+
+
+class SimulatedCluster:
+    def __init__(self, id, url, channels, routed):
+        self.id = id
+        self.redis = aioredis.Redis.from_url(url)
+        self.pubsub = self.redis.pubsub()
+        self.channels = channels
+        self.routed = routed
+        self.decoded = 0
+        self.pending = {}
+
+    async def start(self):
+        if self.routed:
+            await self.pubsub.subscribe(
+                self.channels.broadcast, self.channels.cluster(self.id)
+            )
+        else:
+            await self.pubsub.subscribe(self.channels.broadcast)
+        self.task = asyncio.create_task(self.listen())
+
+    async def listen(self):
+        async for message in self.pubsub.listen():
+            if message["type"] != "message":
+                continue
+            payload = orjson.loads(message["data"])
+            self.decoded += 1
+            if payload.get("action") and payload.get("target", self.id) == self.id:
+                if self.routed:
+                    channel = self.channels.reply(payload["command_id"])
+                else:
+                    channel = self.channels.broadcast
+                await self.redis.execute_command(
+                    "PUBLISH",
+                    channel,
+                    orjson.dumps({"output": 1, "command_id": payload["command_id"]}),
+                )
+            elif (fut := self.pending.get(payload.get("command_id"))) is not None:
+                if not fut.done():
+                    fut.set_result(payload["output"])
+
+    async def request(self, target):
+        command_id = f"{uuid4()}"
+        fut = self.pending[command_id] = asyncio.get_running_loop().create_future()
+        payload = {"action": "ping", "command_id": command_id, "target": target}
+        if self.routed:
+            reply = self.channels.reply(command_id)
+            await self.pubsub.subscribe(reply)
+            channel = self.channels.cluster(target)
+        else:
+            channel = self.channels.broadcast
+        await self.redis.execute_command("PUBLISH", channel, orjson.dumps(payload))
+        await asyncio.wait_for(fut, timeout=5)
+        del self.pending[command_id]
+        if self.routed:
+            await self.pubsub.unsubscribe(reply)
+
+    async def forward_interaction(self, target):
+        payload = {"type": "raw_interaction", "data": INTERACTION}
+        if self.routed:
+            channel = self.channels.cluster(target)
+        else:
+            channel = self.channels.broadcast
+        await self.redis.execute_command("PUBLISH", channel, orjson.dumps(payload))
+
+    async def stop(self):
+        self.task.cancel()
+        await self.pubsub.close()
+        await self.redis.close()
+
+
+async def run(url, routed):
+    channels = Channels(f"ipc_benchmark_{uuid4()}")
+    clusters = [
+        SimulatedCluster(i, url, channels, routed) for i in range(1, CLUSTERS + 1)
+    ]
+    for cluster in clusters:
+        await cluster.start()
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        sender, target = random.sample(clusters, 2)
+        await sender.request(target.id)
+        await clusters[0].forward_interaction(target.id)
+    # Let the last interactions arrive
+    await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - start - 0.5
+
+    decoded = sum(cluster.decoded for cluster in clusters)
+    for cluster in clusters:
+        await cluster.stop()
+    name = "routed" if routed else "broadcast"
+    print(
+        f"{name:<10} {elapsed:7.2f}s, {elapsed / ROUNDS * 1000:6.2f}ms per round,"
+        f" {decoded} messages decoded ({decoded / ROUNDS:.1f} per round)"
+    )
+
+
+async def main():
+    db = ConfigLoader("config.toml").database
+    url = f"redis://{db.redis_host}:{db.redis_port}/{db.redis_database}"
+    print(f"{CLUSTERS} clusters, {ROUNDS} rounds")
+    await run(url, routed=False)
+    await run(url, routed=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Compares the old SQL leaderboard queries with the Redis sorted sets on a
+generated profile table (1M rows by default), for top 10 lists and for the
+money and xp ranks shown in $profile.
+
+Needs the local Postgres and Redis configured in config.toml. The benchmark
+table and keys are dropped afterwards.
+Run from the repository root: PYTHONPATH=. python3 scripts/benchmarks/leaderboard.py
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+import asyncpg
+
+from redis import asyncio as aioredis
+
+from utils.config import ConfigLoader
+from utils.leaderboard import RANKS_SCRIPT
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+LOOKUPS = 200
+TABLE = "leaderboard_benchmark"
+PREFIX = "leaderboard_benchmark"
+
+
+async def timed(name, coro_fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        await coro_fn(arg)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28}{elapsed / len(args) * 1000:8.3f}ms per call")
+    return elapsed
+
+
+async def main():
+    config = ConfigLoader("config.toml")
+    db = config.database
+    pool = await asyncpg.create_pool(
+        database=db.postgres_name,
+        user=db.postgres_user,
+        password=db.postgres_password,
+        host=db.postgres_host,
+        port=db.postgres_port,
+    )
+    redis = aioredis.Redis.from_url(
+        f"redis://{db.redis_host}:{db.redis_port}/{db.redis_database}"
+    )
+    ranks = redis.register_script(RANKS_SCRIPT)
+
+    rows = [
+        (i, f"Player {i}", random.randint(0, 10**9), random.randint(0, 10**7))
+        for i in range(1, ROWS + 1)
+    ]
+    print(f"Generating {ROWS} profiles")
+    await pool.execute(
+        f'CREATE UNLOGGED TABLE {TABLE} ("user" bigint PRIMARY KEY, "name"'
+        ' character varying(20), "money" bigint, "xp" integer);'
+    )
+    try:
+        await pool.copy_records_to_table(TABLE, records=rows)
+        await pool.execute(f'CREATE INDEX ON {TABLE} ("money");')
+        await pool.execute(f'CREATE INDEX ON {TABLE} ("xp");')
+        await pool.execute(f"ANALYZE {TABLE};")
+        for column, idx in (("money", 2), ("xp", 3)):
+            for i in range(0, ROWS, 10000):
+                entries = []
+                for row in rows[i : i + 10000]:
+                    entries += (row[idx], row[0])
+                await redis.execute_command("ZADD", f"{PREFIX}:{column}", *entries)
+
+        users = [random.randint(1, ROWS) for _ in range(LOOKUPS)]
+
+        async def sql_ranks(user):
+            async with pool.acquire() as conn:
+                for column in ("money", "xp"):
+                    await conn.fetchval(
+                        f'SELECT COUNT(*) FROM {TABLE} WHERE "{column}">=(SELECT'
+                        f' "{column}" FROM {TABLE} WHERE "user"=$1);',
+                        user,
+                    )
+
+        async def zset_ranks(user):
+            await ranks(keys=[f"{PREFIX}:money", f"{PREFIX}:xp"], args=[user])
+
+        async def sql_top(_):
+            await pool.fetch(
+                f'SELECT "user", "name", "money" FROM {TABLE} ORDER BY "money" DESC'
+                " LIMIT 10;"
+            )
+
+        async def zset_top(_):
+            ids = await redis.execute_command("ZREVRANGE", f"{PREFIX}:money", 0, 9)
+            await pool.fetch(
+                f'SELECT "user", "name", "money" FROM {TABLE} WHERE "user"=ANY($1)'
+                ' ORDER BY "money" DESC;',
+                [int(i) for i in ids],
+            )
+
+        old = await timed("SQL ranks (get_ranks_for)", sql_ranks, users)
+        new = await timed("ZSET ranks", zset_ranks, users)
+        print(f"{'speedup':<28}{old / new:8.1f}x")
+        old = await timed("SQL top 10", sql_top, users)
+        new = await timed("ZSET top 10", zset_top, users)
+        print(f"{'speedup':<28}{old / new:8.1f}x")
+    finally:
+        await pool.execute(f"DROP TABLE {TABLE};")
+        await redis.execute_command("DEL", f"{PREFIX}:money", f"{PREFIX}:xp")
+        await redis.close()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
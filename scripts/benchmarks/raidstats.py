@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Times fetching raid participant data for a big raid, once with one
+Bot.get_raidstats call per raider and once with Bot.get_raidstats_many.
+
+Needs a populated local database configured in config.toml.
+Run from the repository root: PYTHONPATH=. python3 scripts/benchmarks/raidstats.py
+"""
+
+import asyncio
+import sys
+import time
+
+import asyncpg
+import discord
+
+from classes.bot import Bot
+
+RAIDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+async def main():
+    bot = Bot(
+        cluster_name="benchmark",
+        cluster_id=0,
+        cluster_count=1,
+        shard_count=1,
+        intents=discord.Intents.none(),
+    )
+    db = bot.config.database
+    bot.pool = await asyncpg.create_pool(
+        database=db.postgres_name,
+        user=db.postgres_user,
+        password=db.postgres_password,
+        host=db.postgres_host,
+        port=db.postgres_port,
+    )
+    user_ids = [
+        row["user"]
+        for row in await bot.pool.fetch(
+            'SELECT "user" FROM profile ORDER BY random() LIMIT $1;', RAIDERS
+        )
+    ]
+    print(f"Fetching raid stats for {len(user_ids)} raiders")
+
+    async with bot.pool.acquire() as conn:
+        start = time.perf_counter()
+        old = {}
+        for user_id in user_ids:
+            old[user_id] = await bot.get_raidstats(user_id, conn=conn)
+        old_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = await bot.get_raidstats_many(user_ids, conn=conn)
+        new_time = time.perf_counter() - start
+
+    assert old == new, "get_raidstats_many disagrees with get_raidstats"
+    print(f"get_raidstats:      {old_time * 1000:.1f}ms")
+    print(f"get_raidstats_many: {new_time * 1000:.1f}ms")
+    print(f"speedup:            {old_time / new_time:.1f}x")
+    await bot.pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
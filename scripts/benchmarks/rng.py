@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Compares the buffered generator in utils.random against drawing every number
+from the secrets module like utils.random used to do.
+
+Run from the repository root: PYTHONPATH=. python3 scripts/benchmarks/rng.py
+"""
+
+import secrets
+import sys
+import timeit
+
+from utils import random
+
+NUMBER = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+ITEMS = list(range(100))
+
+CASES = (
+    (
+        "randint(0, 10000)",
+        lambda: secrets.randbelow(10001),
+        lambda: random.randint(0, 10000),
+    ),
+    ("choice(100 items)", lambda: secrets.choice(ITEMS), lambda: random.choice(ITEMS)),
+    ("randbits(32)", lambda: secrets.randbits(32), lambda: random.randbits(32)),
+    (
+        "100x randint(0, 10000)",
+        lambda: [secrets.randbelow(10001) for _i in range(100)],
+        lambda: random.randints(100, 0, 10000),
+    ),
+    (
+        "100x choice(100 items)",
+        lambda: [secrets.choice(ITEMS) for _i in range(100)],
+        lambda: random.choices(ITEMS, k=100),
+    ),
+)
+
+
+def rate(func, number):
+    return number / min(timeit.repeat(func, number=number, repeat=3))
+
+
+def main():
+    print(f"{'':<24}{'secrets':>14}{'utils.random':>14}")
+    for name, old, new in CASES:
+        # Batched cases do 100 draws per call
+        number = NUMBER // 100 if name.startswith("100x") else NUMBER
+        old_rate, new_rate = rate(old, number), rate(new, number)
+        print(
+            f"{name:<24}{old_rate:>10,.0f}/s{new_rate:>12,.0f}/s"
+            f"  {new_rate / old_rate:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
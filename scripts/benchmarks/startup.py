@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Times importing all initial_extensions, the part of load_extension that
+locale_doc runs in. Each mode runs in a fresh process:
+  ast      the old per command inspect.getsource and ast.parse
+  cold     the docstring index built from scratch
+  warm     the docstring index loaded from disk
+
+Run from the repository root: PYTHONPATH=. python3 scripts/benchmarks/startup.py
+"""
+
+import ast
+import importlib
+import inspect
+import os
+import subprocess
+import sys
+import time
+
+from utils.config import ConfigLoader
+
+
+def ast_docstring(func):
+    src = inspect.getsource(func)
+    try:
+        parsed_tree = ast.parse(src)
+    except IndentationError:
+        parsed_tree = ast.parse("class Foo:\n" + src)
+        tree = parsed_tree.body[0].body[0]
+    else:
+        tree = parsed_tree.body[0]
+    if (
+        isinstance(tree.body[0], ast.Expr)
+        and isinstance(call := tree.body[0].value, ast.Call)
+        and isinstance(call.func, ast.Name)
+        and call.func.id == "_"
+    ):
+        func.__doc__ = call.args[0].value
+    return func
+
+
+def run(mode):
+    from utils import i18n
+
+    if mode == "ast":
+        i18n.locale_doc = ast_docstring
+    elif mode == "cold" and os.path.exists(i18n.docstring_index_path):
+        # The index is rebuilt by this run and reused by the warm one
+        os.remove(i18n.docstring_index_path)
+    # Import everything else up front so only the extensions are timed
+    importlib.import_module("classes.bot")
+
+    config = ConfigLoader("config.toml")
+    start = time.perf_counter()
+    for extension in config.bot.initial_extensions:
+        importlib.import_module(extension)
+    i18n.docstring_index.save()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{mode:>4}: {len(config.bot.initial_extensions)} extensions in"
+        f" {elapsed * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        for mode in ("ast", "cold", "warm"):
+            subprocess.run([sys.executable, __file__, mode], check=True)
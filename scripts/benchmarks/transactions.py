@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Measures sustained transaction logging throughput with many concurrent
+writers, once with one INSERT per transaction like Bot.log_transaction used
+to do and once through the buffered TransactionLog.
+
+Needs the local Postgres configured in config.toml. The rows are written to
+the transactions table with the subject "benchmark" and deleted afterwards.
+Run from the repository root: PYTHONPATH=. python3 scripts/benchmarks/transactions.py
+"""
+
+import asyncio
+import datetime
+import sys
+import time
+
+import asyncpg
+
+from utils.config import ConfigLoader
+from utils.transactions import TransactionLog
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+WRITERS = 100
+
+
+def row(i):
+    return (
+        i,
+        1,
+        "benchmark",
+        "benchmark",
+        100,
+        None,
+        None,
+        '{"Amount": 100}',
+        datetime.datetime.now(),
+    )
+
+
+async def insert(pool, i):
+    async with pool.acquire() as conn:
+        await conn.execute(
+            'INSERT INTO transactions ("from", "to", "subject", "command", "amount",'
+            ' "item", "rarity", "data", "timestamp") VALUES ($1, $2, $3, $4, $5, $6,'
+            " $7, $8, $9);",
+            *row(i),
+        )
+
+
+async def run(name, log_one):
+    latencies = []
+
+    async def writer(offset):
+        for i in range(offset, ROWS, WRITERS):
+            start = time.perf_counter()
+            await log_one(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[writer(i) for i in range(WRITERS)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{name:<10}{ROWS / elapsed:10,.0f} rows/s,"
+        f" p50 {latencies[len(latencies) // 2] * 1000:.2f}ms,"
+        f" p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms per call"
+    )
+
+
+async def main():
+    config = ConfigLoader("config.toml")
+    db = config.database
+    pool = await asyncpg.create_pool(
+        database=db.postgres_name,
+        user=db.postgres_user,
+        password=db.postgres_password,
+        host=db.postgres_host,
+        port=db.postgres_port,
+        min_size=10,
+        max_size=20,
+    )
+    print(f"Logging {ROWS} transactions from {WRITERS} concurrent writers")
+    try:
+        await run("insert", lambda i: insert(pool, i))
+
+        log = TransactionLog(pool)
+        log.start()
+        await run("buffered", lambda i: log.log(row(i)))
+        # Includes the time until the last batch is committed
+        start = time.perf_counter()
+        await log.close()
+        print(
+            f"flushing the rest took {(time.perf_counter() - start) * 1000:.1f}ms,"
+            f" {log.batches} batches, {log.blocked} calls blocked by a full queue"
+        )
+
+        persisted = TransactionLog(pool)
+        persisted.start()
+        await run("persist", lambda i: persisted.log(row(i), persist=True))
+        await persisted.close()
+    finally:
+        await pool.execute('DELETE FROM transactions WHERE "subject"=$1;', "benchmark")
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Moves an existing transactions table to the structured schema without
+locking it for long:
+  1. adds the command, amount, item, rarity and data columns and makes info
+     nullable, both only touch the catalog
+  2. builds the indexes CONCURRENTLY
+  3. fills the new columns from the info text of old rows in small batches
+
+Step 1 has to run before the bot is updated. The backfill only touches rows
+without data, so it can be interrupted and started again at any time.
+Run from the repository root: PYTHONPATH=. python3 scripts/migrate_transactions.py [batch size]
+"""
+
+import asyncio
+import sys
+
+import asyncpg
+
+from utils.config import ConfigLoader
+from utils.transactions import parse_info, structure
+
+BATCH_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+# Pause between batches so the backfill does not starve the bot
+PAUSE = 0.1
+
+COLUMNS = """
+ALTER TABLE transactions
+    ADD COLUMN IF NOT EXISTS "command" character varying(100),
+    ADD COLUMN IF NOT EXISTS "amount" bigint,
+    ADD COLUMN IF NOT EXISTS "item" bigint,
+    ADD COLUMN IF NOT EXISTS "rarity" character varying(10),
+    ADD COLUMN IF NOT EXISTS "data" jsonb,
+    ALTER COLUMN "info" DROP NOT NULL;
+"""
+
+INDEXES = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_from_timestamp_idx ON"
+    ' transactions ("from", "timestamp");',
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_to_timestamp_idx ON"
+    ' transactions ("to", "timestamp");',
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_item_idx ON transactions"
+    " (item) WHERE (item IS NOT NULL);",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_data_idx ON transactions"
+    " USING gin (data jsonb_path_ops);",
+)
+
+BACKFILL = """
+UPDATE transactions t SET
+    "command"=u."command",
+    "amount"=u."amount",
+    "item"=u."item",
+    "rarity"=u."rarity",
+    "data"=u."data"::jsonb
+FROM unnest($1::integer[], $2::text[], $3::bigint[], $4::bigint[], $5::text[], $6::text[])
+    AS u("id", "command", "amount", "item", "rarity", "data")
+WHERE t."id"=u."id";
+"""
+
+
+async def backfill(conn):
+    last_id, max_id = await conn.fetchrow(
+        'SELECT min("id")-1, max("id") FROM transactions WHERE "data" IS NULL;'
+    )
+    if max_id is None:
+        return
+    done = 0
+    while last_id < max_id:
+        rows = await conn.fetch(
+            'SELECT "id", "info" FROM transactions WHERE "id">$1 AND "id"<=$2 AND'
+            ' "data" IS NULL AND "info" IS NOT NULL;',
+            last_id,
+            last_id + BATCH_SIZE,
+        )
+        if rows:
+            columns = [[] for _i in range(6)]
+            for row in rows:
+                command, data = parse_info(row["info"])
+                values = (row["id"], command, *structure(data))
+                for column, value in zip(columns, values):
+                    column.append(value)
+            await conn.execute(BACKFILL, *columns)
+            done += len(rows)
+        last_id += BATCH_SIZE
+        print(f"\rBackfilled {done} rows, up to ID {min(last_id, max_id)}", end="")
+        await asyncio.sleep(PAUSE)
+    print()
+
+
+async def main():
+    config = ConfigLoader("config.toml")
+    db = config.database
+    conn = await asyncpg.connect(
+        database=db.postgres_name,
+        user=db.postgres_user,
+        password=db.postgres_password,
+        host=db.postgres_host,
+        port=db.postgres_port,
+    )
+    try:
+        print("Adding columns")
+        await conn.execute(COLUMNS)
+        for index in INDEXES:
+            print(f"Creating index: {index}")
+            await conn.execute(index)
+        await backfill(conn)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
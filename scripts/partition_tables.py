@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Turns the unpartitioned transactions and market_history tables of an existing
+database into tables partitioned by month, without rewriting them.
+
+The old table becomes the partition <table>_legacy that holds everything up
+to the end of the current month. The monthly partitions follow after it and
+the bot creates, rolls up and detaches those from then on (utils/partitions.py).
+The legacy partition is never detached automatically.
+Run scripts/migrate_transactions.py first.
+Run from the repository root: PYTHONPATH=. python3 scripts/partition_tables.py
+"""
+
+import asyncio
+
+import asyncpg
+
+from utils.config import ConfigLoader
+from utils.partitions import create_partitions, month_start
+
+# Indexes of the partitioned tables by name. The legacy partitions get the
+# same ones beforehand, so creating them on the parent only attaches them.
+INDEXES = {
+    "transactions": {
+        "transactions_from_timestamp_idx": '("from", "timestamp")',
+        "transactions_to_timestamp_idx": '("to", "timestamp")',
+        "transactions_item_idx": "(item) WHERE (item IS NOT NULL)",
+        "transactions_data_idx": "USING gin (data jsonb_path_ops)",
+    },
+    "market_history": {"market_history_timestamp_idx": '("timestamp")'},
+}
+
+DAILY_TABLE = """
+CREATE TABLE IF NOT EXISTS market_history_daily (
+    day date NOT NULL,
+    type character varying(10) NOT NULL,
+    band smallint NOT NULL,
+    sales integer NOT NULL,
+    total_price bigint NOT NULL,
+    avg_price numeric NOT NULL,
+    median_price numeric NOT NULL,
+    min_price bigint NOT NULL,
+    max_price bigint NOT NULL,
+    PRIMARY KEY (day, type, band)
+);
+"""
+
+
+async def is_partitioned(conn, table):
+    return await conn.fetchval(
+        "SELECT relkind='p' FROM pg_class WHERE oid=$1::regclass;", table
+    )
+
+
+async def partition(conn, table, cutover):
+    legacy = f"{table}_legacy"
+    print(f"{table}: preparing")
+    # The partition key may not be NULL, a validated CHECK lets SET NOT NULL
+    # skip the table scan
+    await conn.execute(
+        f'UPDATE {table} SET "timestamp"=\'2018-03-17\' WHERE "timestamp" IS NULL;'
+    )
+    await conn.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_timestamp_not_null"
+        f' CHECK ("timestamp" IS NOT NULL) NOT VALID;'
+    )
+    await conn.execute(
+        f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_timestamp_not_null;"
+    )
+    await conn.execute(f'ALTER TABLE {table} ALTER COLUMN "timestamp" SET NOT NULL;')
+    await conn.execute(
+        f"ALTER TABLE {table} DROP CONSTRAINT {table}_timestamp_not_null;"
+    )
+    # Lets ATTACH PARTITION skip checking the partition bound
+    await conn.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {legacy}_bound"
+        f" CHECK (\"timestamp\" < '{cutover}') NOT VALID;"
+    )
+    await conn.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {legacy}_bound;")
+    # The partitioned primary key has to include the partition key
+    await conn.execute(
+        f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {legacy}_id_timestamp_key"
+        f' ON {table} (id, "timestamp");'
+    )
+    for name, definition in INDEXES[table].items():
+        await conn.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition};"
+        )
+
+    print(f"{table}: swapping")
+    async with conn.transaction():
+        # Frees the index names for the partitioned table
+        await conn.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+        await conn.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey;")
+        await conn.execute(
+            f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_id_timestamp_key"
+            f" UNIQUE USING INDEX {legacy}_id_timestamp_key;"
+        )
+        for name in INDEXES[table]:
+            await conn.execute(
+                f"ALTER INDEX {name} RENAME TO" f" {legacy}{name.removeprefix(table)};"
+            )
+
+        await conn.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS)"
+            ' PARTITION BY RANGE ("timestamp");'
+        )
+        await conn.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id;")
+        await conn.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "timestamp");')
+        await conn.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy}"
+            f" FOR VALUES FROM (MINVALUE) TO ('{cutover}');"
+        )
+        for name, definition in INDEXES[table].items():
+            await conn.execute(f"CREATE INDEX {name} ON {table} {definition};")
+        await conn.execute(
+            f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT;"
+        )
+        await create_partitions(conn, table, cutover)
+
+
+async def main():
+    config = ConfigLoader("config.toml")
+    db = config.database
+    conn = await asyncpg.connect(
+        database=db.postgres_name,
+        user=db.postgres_user,
+        password=db.postgres_password,
+        host=db.postgres_host,
+        port=db.postgres_port,
+    )
+    try:
+        cutover = month_start(await conn.fetchval("SELECT current_date;"), 1)
+        for table in INDEXES:
+            if await is_partitioned(conn, table):
+                print(f"{table}: already partitioned")
+            else:
+                await partition(conn, table, cutover)
+        await conn.execute(DAILY_TABLE)
+        print("Done, the bot rolls up the market history on its next maintenance run")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -27,22 +27,37 @@ DEALINGS IN THE SOFTWARE.
 import asyncio
 import enum
 import inspect
+import logging
+import sys
 import time
 
+from collections import OrderedDict
 from functools import wraps
 
+import orjson
+
 from lru import LRU
 
+log = logging.getLogger(__name__)
+
 
-def _wrap_and_store_coroutine(cache, key, coro):
+def _wrap_and_store_coroutine(store, key, coro):
     async def func():
         value = await coro
-        cache[key] = value
+        store(key, value)
         return value
 
     return func()
 
 
+def _wrap_shared_future(fut):
+    async def wait_for_future():
+        # shielded so one cancelled caller does not cancel it for everyone
+        return await asyncio.shield(fut)
+
+    return wait_for_future()
+
+
 def _wrap_new_coroutine(value):
     async def new_coroutine():
         return value
@@ -50,30 +65,346 @@ def _wrap_new_coroutine(value):
     return new_coroutine()
 
 
-class ExpiringCache(dict):
-    def __init__(self, seconds):
-        self.__ttl = seconds
-        super().__init__()
+class ExpiringCache:
+    """
+    A cache where entries expire a fixed amount of seconds after being set.
 
-    def __verify_cache_integrity(self):
-        # Have to do this in two steps...
+    Since all entries share the same TTL, insertion order is expiry order, so
+    expired entries are always at the front and can be dropped lazily in
+    amortized O(1). If maxsize is given, the oldest entries are evicted when
+    it is exceeded. callback(key, value) is called for every evicted entry.
+    """
+
+    def __init__(self, seconds, maxsize=None, callback=None):
+        self.__ttl = seconds
+        self.__maxsize = maxsize
+        self.__callback = callback
+        # key -> (value, expires_at), ordered by expires_at
+        self.__data = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __expire(self):
         current_time = time.monotonic()
-        to_remove = [
-            k for (k, (v, t)) in self.items() if current_time > (t + self.__ttl)
-        ]
-        for k in to_remove:
-            del self[k]
+        while self.__data:
+            key, (value, expires_at) = next(iter(self.__data.items()))
+            if expires_at > current_time:
+                break
+            del self.__data[key]
+            self.__evicted(key, value)
+
+    def __evicted(self, key, value):
+        self.__evictions += 1
+        if self.__callback is not None:
+            self.__callback(key, value)
 
     def __contains__(self, key):
-        self.__verify_cache_integrity()
-        return super().__contains__(key)
+        self.__expire()
+        return key in self.__data
 
     def __getitem__(self, key):
-        self.__verify_cache_integrity()
-        return super().__getitem__(key)
+        self.__expire()
+        try:
+            value = self.__data[key][0]
+        except KeyError:
+            self.__misses += 1
+            raise
+        self.__hits += 1
+        return value
 
     def __setitem__(self, key, value):
-        super().__setitem__(key, (value, time.monotonic()))
+        self.__expire()
+        self.__data[key] = (value, time.monotonic() + self.__ttl)
+        self.__data.move_to_end(key)
+        if self.__maxsize is not None and len(self.__data) > self.__maxsize:
+            key, (value, _expires_at) = self.__data.popitem(last=False)
+            self.__evicted(key, value)
+
+    def __delitem__(self, key):
+        del self.__data[key]
+
+    def __len__(self):
+        self.__expire()
+        return len(self.__data)
+
+    def keys(self):
+        self.__expire()
+        return list(self.__data.keys())
+
+    def items(self):
+        self.__expire()
+        return [(k, v) for k, (v, _expires_at) in self.__data.items()]
+
+    def clear(self):
+        self.__data.clear()
+
+    def get_stats(self):
+        """Returns (hits, misses, evictions)"""
+        return self.__hits, self.__misses, self.__evictions
+
+
+# Sets a value only if neither the key nor its namespace were invalidated
+# since the fetch read their generations
+SET_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[3]
+    or (redis.call('GET', KEYS[3]) or '') ~= ARGV[4] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+# Invalidations bump the generation before deleting the value
+DELETE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return redis.call('DEL', KEYS[1], unpack(KEYS, 3))
+"""
+
+# How long generations are kept, has to outlast any running fetch
+GENERATION_TTL = 3600
+
+
+class SharedCache:
+    """
+    A second cache level in Redis that is shared by all clusters.
+
+    Values are stored with a TTL and invalidations are announced via pub/sub,
+    so every cluster drops the key from its local cache as well.
+    Every key and namespace has a generation that invalidations increase.
+    A fetch only stores its value if the generations it read are unchanged,
+    so a value fetched before an invalidation never ends up in Redis.
+    """
+
+    def __init__(self):
+        self.redis = None
+        self.channel = None
+        self._pubsub = None
+        self._listener = None
+        self._set = None
+        self._delete = None
+        # Running invalidations
+        self._tasks = set()
+        # namespace -> functions dropping keys from the local cache
+        self._local = {}
+
+    @property
+    def connected(self):
+        return self.redis is not None
+
+    def register(self, namespace, drop, drop_containing):
+        self._local[namespace] = (drop, drop_containing)
+
+    async def connect(self, redis, channel):
+        self.redis = redis
+        self.channel = channel
+        self._set = redis.register_script(SET_SCRIPT)
+        self._delete = redis.register_script(DELETE_SCRIPT)
+        self._pubsub = redis.pubsub()
+        await self._pubsub.subscribe(channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+        self.redis = None
+
+    async def _listen(self):
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                payload = orjson.loads(message["data"])
+                drop, drop_containing = self._local[payload["namespace"]]
+            except (orjson.JSONDecodeError, KeyError):
+                continue
+            if (key := payload.get("key")) is not None:
+                drop(key)
+            elif (key := payload.get("containing")) is not None:
+                drop_containing(key)
+
+    def spawn(self, coro):
+        """Runs an invalidation in the background and logs if it fails"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and (e := task.exception()) is not None:
+            log.warning(f"Failed to invalidate the shared cache: {e}")
+
+    async def get(self, namespace, key):
+        """Returns the value of key and the generations to pass to set()"""
+        data, *generation = await self.redis.execute_command(
+            "MGET",
+            f"cache:{key}",
+            f"cache-generation:{key}",
+            f"cache-generation:{namespace}",
+        )
+        return data, [g or b"" for g in generation]
+
+    async def set(self, namespace, key, value, ttl, generation):
+        """Stores value unless key was invalidated since get() returned generation"""
+        return await self._set(
+            keys=[
+                f"cache:{key}",
+                f"cache-generation:{key}",
+                f"cache-generation:{namespace}",
+            ],
+            args=[value, ttl, *generation],
+        )
+
+    async def delete(self, namespace, key):
+        await self._delete(
+            keys=[f"cache:{key}", f"cache-generation:{key}"], args=[GENERATION_TTL]
+        )
+        await self.announce(namespace, key)
+
+    async def announce(self, namespace, key):
+        """Makes every cluster drop key from its local cache"""
+        await self.redis.execute_command(
+            "PUBLISH",
+            self.channel,
+            orjson.dumps({"namespace": namespace, "key": key}),
+        )
+
+    async def delete_containing(self, namespace, key):
+        to_remove = [
+            k
+            async for k in self.redis.scan_iter(match=f"cache:{namespace}:*")
+            if key in k.decode()
+        ]
+        await self._delete(
+            keys=[f"cache:{namespace}", f"cache-generation:{namespace}", *to_remove],
+            args=[GENERATION_TTL],
+        )
+        await self.redis.execute_command(
+            "PUBLISH",
+            self.channel,
+            orjson.dumps({"namespace": namespace, "containing": key}),
+        )
+
+
+shared_cache = SharedCache()
+
+
+class CacheMetrics:
+    """Counters for a single cached function"""
+
+    __slots__ = (
+        "name",
+        "strategy",
+        "maxsize",
+        "cache",
+        "hits",
+        "shared_hits",
+        "misses",
+        # Misses that waited for an already running call
+        "coalesced",
+        "evictions",
+        "keys_made",
+        "key_time",
+    )
+
+    def __init__(self, name, strategy, maxsize, cache):
+        self.name = name
+        self.strategy = strategy
+        self.maxsize = maxsize
+        self.cache = cache
+        self.hits = 0
+        # Local misses that were served by the shared cache
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.keys_made = 0
+        # Total time spent building keys in nanoseconds
+        self.key_time = 0
+
+    def evicted(self, key, value):
+        self.evictions += 1
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def avg_key_time(self):
+        """Average time to build a key in nanoseconds"""
+        return self.key_time / self.keys_made if self.keys_made else 0.0
+
+    def memory_estimate(self, sample_size=100):
+        """
+        Estimates the memory used by the cached keys and values in bytes
+        This is only a rough, shallow estimate based on a sample of entries
+        """
+        items = list(self.cache.items())
+        if not items:
+            return 0
+        sample = items[:sample_size]
+        sample_bytes = sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in sample)
+        return sample_bytes * len(items) // len(sample)
+
+
+# namespace -> CacheMetrics of all cached functions
+cache_metrics = {}
+
+
+def metrics_to_prometheus():
+    """Dumps the metrics of all cached functions in the Prometheus text format"""
+    metrics = [
+        ("hits_total", "counter", "Cache hits", lambda m: m.hits),
+        (
+            "shared_hits_total",
+            "counter",
+            "Local cache misses served by the shared cache",
+            lambda m: m.shared_hits,
+        ),
+        ("misses_total", "counter", "Cache misses", lambda m: m.misses),
+        (
+            "coalesced_total",
+            "counter",
+            "Cache misses that waited for a running call",
+            lambda m: m.coalesced,
+        ),
+        ("evictions_total", "counter", "Evicted entries", lambda m: m.evictions),
+        (
+            "key_seconds_total",
+            "counter",
+            "Time spent building cache keys",
+            lambda m: m.key_time / 1e9,
+        ),
+        ("keys_total", "counter", "Cache keys built", lambda m: m.keys_made),
+        ("entries", "gauge", "Entries currently cached", lambda m: len(m.cache)),
+        (
+            "max_entries",
+            "gauge",
+            "Maximum entries of the cache",
+            lambda m: m.maxsize if m.strategy is not Strategy.raw else -1,
+        ),
+        (
+            "memory_bytes",
+            "gauge",
+            "Estimated memory used by cached entries",
+            lambda m: m.memory_estimate(),
+        ),
+    ]
+    lines = []
+    for name, type_, description, getter in metrics:
+        lines.append(f"# HELP idlerpg_cache_{name} {description}")
+        lines.append(f"# TYPE idlerpg_cache_{name} {type_}")
+        for m in cache_metrics.values():
+            lines.append(f'idlerpg_cache_{name}{{function="{m.name}"}} {getter(m)}')
+    return "\n".join(lines) + "\n"
+
+
+def _default_loads(data, *args, **kwargs):
+    return orjson.loads(data)
 
 
 class Strategy(enum.Enum):
@@ -82,17 +413,71 @@ class Strategy(enum.Enum):
     timed = 3
 
 
-def cache(maxsize=128, strategy=Strategy.lru, ignore_kwargs=False):
+def cache(
+    maxsize=128,
+    strategy=Strategy.lru,
+    ignore_kwargs=False,
+    ttl=60,
+    negative_ttl=None,
+    shared_ttl=None,
+    dumps=orjson.dumps,
+    loads=_default_loads,
+):
+    """
+    Caches the results of a function
+
+    With Strategy.timed, entries expire after ttl seconds and at most
+    maxsize entries are kept.
+    If negative_ttl is set, falsy results (like None for a user that was not
+    found) are only cached for negative_ttl seconds.
+    Concurrent calls of a coroutine function with the same arguments share
+    a single call while it is running. Exceptions are never cached.
+    If shared_ttl is set and the function is a coroutine function, results
+    are also stored in the shared Redis cache for shared_ttl seconds once
+    shared_cache is connected.
+    dumps(value) has to return bytes and loads(data, *args, **kwargs) gets
+    the same arguments as the cached function to rebuild the value.
+    """
+
     def decorator(func):
+        namespace = f"{func.__module__}.{func.__name__}"
+        is_coroutine = asyncio.iscoroutinefunction(func)
+        shared = shared_ttl is not None and is_coroutine
+
+        _metrics = CacheMetrics(namespace, strategy, maxsize, None)
         if strategy is Strategy.lru:
-            _internal_cache = LRU(maxsize)
-            _stats = _internal_cache.get_stats
+            _internal_cache = LRU(maxsize, callback=_metrics.evicted)
         elif strategy is Strategy.raw:
             _internal_cache = {}
-            _stats = lambda: (0, 0)
         elif strategy is Strategy.timed:
-            _internal_cache = ExpiringCache(maxsize)
-            _stats = lambda: (0, 0)
+            _internal_cache = ExpiringCache(
+                ttl, maxsize=maxsize, callback=_metrics.evicted
+            )
+        _metrics.cache = _internal_cache
+        cache_metrics[namespace] = _metrics
+
+        if negative_ttl is not None:
+            _negative_cache = ExpiringCache(
+                negative_ttl, maxsize=maxsize, callback=_metrics.evicted
+            )
+        else:
+            _negative_cache = None
+        # key -> running task for coroutine functions
+        _in_flight = {}
+
+        def _lookup(key):
+            try:
+                return _internal_cache[key]
+            except KeyError:
+                if _negative_cache is None:
+                    raise
+                return _negative_cache[key]
+
+        def _store(key, value):
+            if _negative_cache is not None and not value:
+                _negative_cache[key] = value
+            else:
+                _internal_cache[key] = value
 
         def _make_key(args, kwargs):
             # this is a bit of a cluster fuck
@@ -102,7 +487,7 @@ def cache(maxsize=128, strategy=Strategy.lru, ignore_kwargs=False):
                     return f"<{o.__class__.__module__}.{o.__class__.__name__}>"
                 return repr(o)
 
-            key = [f"{func.__module__}.{func.__name__}"]
+            key = [namespace]
             key.extend(_true_repr(o) for o in args)
             if not ignore_kwargs:
                 for k, v in kwargs.items():
@@ -118,60 +503,129 @@ def cache(maxsize=128, strategy=Strategy.lru, ignore_kwargs=False):
 
             return ":".join(key)
 
+        async def _fetch(key, args, kwargs):
+            try:
+                if not (shared and shared_cache.connected):
+                    value = await func(*args, **kwargs)
+                else:
+                    data, generation = await shared_cache.get(namespace, key)
+                    if data is not None:
+                        _metrics.shared_hits += 1
+                        value = loads(data, *args, **kwargs)
+                    else:
+                        value = await func(*args, **kwargs)
+                        if _negative_cache is not None and not value:
+                            expiry = min(shared_ttl, negative_ttl)
+                        else:
+                            expiry = shared_ttl
+                        # Not if the key was invalidated here in the meantime,
+                        # the generations cover the other clusters
+                        if _in_flight.get(key) is asyncio.current_task():
+                            await shared_cache.set(
+                                namespace, key, dumps(value), expiry, generation
+                            )
+                # Only store it if the key was not invalidated in the meantime
+                if _in_flight.get(key) is asyncio.current_task():
+                    _store(key, value)
+                return value
+            finally:
+                if _in_flight.get(key) is asyncio.current_task():
+                    del _in_flight[key]
+
         @wraps(func)
         def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
             key = _make_key(args, kwargs)
+            _metrics.key_time += time.perf_counter_ns() - start
+            _metrics.keys_made += 1
             try:
-                value = _internal_cache[key]
+                value = _lookup(key)
             except KeyError:
+                _metrics.misses += 1
+                if is_coroutine:
+                    if (task := _in_flight.get(key)) is None:
+                        task = asyncio.ensure_future(_fetch(key, args, kwargs))
+                        _in_flight[key] = task
+                    else:
+                        _metrics.coalesced += 1
+                    return _wrap_shared_future(task)
+
                 value = func(*args, **kwargs)
 
                 if inspect.isawaitable(value):
-                    return _wrap_and_store_coroutine(_internal_cache, key, value)
+                    return _wrap_and_store_coroutine(_store, key, value)
 
-                _internal_cache[key] = value
+                _store(key, value)
                 return value
             else:
-                if asyncio.iscoroutinefunction(func):
+                _metrics.hits += 1
+                if is_coroutine:
                     return _wrap_new_coroutine(value)
                 return value
 
-        def _invalidate(*args, **kwargs):
-            try:
-                del _internal_cache[_make_key(args, kwargs)]
-            except KeyError:
-                return False
-            else:
-                return True
+        def _caches():
+            if _negative_cache is None:
+                return (_internal_cache,)
+            return (_internal_cache, _negative_cache)
 
-        def _invalidate_containing(key):
-            to_remove = []
-            for k in _internal_cache.keys():
-                if key in k:
-                    to_remove.append(k)
-            for k in to_remove:
+        def _drop(key):
+            _in_flight.pop(key, None)
+            dropped = False
+            for c in _caches():
                 try:
-                    del _internal_cache[k]
+                    del c[key]
                 except KeyError:
                     continue
+                else:
+                    dropped = True
+            return dropped
+
+        def _drop_containing(key):
+            for k in [k for k in _in_flight if key in k]:
+                del _in_flight[k]
+            for c in _caches():
+                to_remove = []
+                for k in c.keys():
+                    if key in k:
+                        to_remove.append(k)
+                for k in to_remove:
+                    try:
+                        del c[k]
+                    except KeyError:
+                        continue
+
+        def _invalidate(*args, **kwargs):
+            key = _make_key(args, kwargs)
+            if shared and shared_cache.connected:
+                shared_cache.spawn(shared_cache.delete(namespace, key))
+            return _drop(key)
+
+        def _invalidate_containing(key):
+            if shared and shared_cache.connected:
+                shared_cache.spawn(shared_cache.delete_containing(namespace, key))
+            _drop_containing(key)
 
         def _invalidate_value(pred):
-            to_remove = []
-            for k, v in _internal_cache.items():
-                if pred(v):
-                    to_remove.append(k)
-            for k in to_remove:
-                try:
-                    del _internal_cache[k]
-                except KeyError:
-                    continue
+            for c in _caches():
+                to_remove = []
+                for k, v in c.items():
+                    if pred(v):
+                        to_remove.append(k)
+                for k in to_remove:
+                    try:
+                        del c[k]
+                    except KeyError:
+                        continue
 
         wrapper.cache = _internal_cache
         wrapper.get_key = lambda *args, **kwargs: _make_key(args, kwargs)
         wrapper.invalidate = _invalidate
-        wrapper.get_stats = _stats
+        wrapper.get_stats = lambda: (_metrics.hits, _metrics.misses, _metrics.evictions)
+        wrapper.metrics = _metrics
         wrapper.invalidate_containing = _invalidate_containing
         wrapper.invalidate_value = _invalidate_value
+        if shared:
+            shared_cache.register(namespace, _drop, _drop_containing)
         return wrapper
 
     return decorator
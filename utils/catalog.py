@@ -0,0 +1,147 @@
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import mmap
+import os
+import struct
+import zlib
+
+from glob import glob
+
+MAGIC = b"IRPC"
+VERSION = 1
+
+# Layout of a compiled catalog:
+#   header: magic, version, bucket count (a power of two)
+#   buckets: hash and file offset of the entry, offset 0 marks an empty bucket
+#   entries: msgid length, msgstr length, msgid, msgstr (both UTF-8)
+# Lookups use open addressing with linear probing on the CRC32 of the msgid.
+HEADER = struct.Struct("<4sII")
+BUCKET = struct.Struct("<II")
+ENTRY = struct.Struct("<II")
+
+
+def read_mo(path: str) -> list[tuple[bytes, bytes]]:
+    """Returns the (msgid, msgstr) pairs of a .mo file, without plurals and the header"""
+    with open(path, "rb") as f:
+        data = f.read()
+    order = "<" if data[:4] == b"\xde\x12\x04\x95" else ">"
+    count, ids_offset, strs_offset = struct.unpack_from(f"{order}3I", data, 8)
+    messages = []
+    for i in range(count):
+        id_len, id_start = struct.unpack_from(f"{order}2I", data, ids_offset + i * 8)
+        str_len, str_start = struct.unpack_from(f"{order}2I", data, strs_offset + i * 8)
+        msgid = data[id_start : id_start + id_len]
+        if not msgid or b"\x00" in msgid:
+            continue
+        messages.append((msgid, data[str_start : str_start + str_len]))
+    return messages
+
+
+def compile_catalog(mo_path: str, path: str) -> None:
+    """Compiles a .mo file into the catalog format"""
+    messages = read_mo(mo_path)
+    size = 1
+    while size < len(messages) * 2:
+        size <<= 1
+    buckets = [(0, 0)] * size
+    entries = bytearray()
+    base = HEADER.size + BUCKET.size * size
+    for msgid, msgstr in messages:
+        hash = zlib.crc32(msgid)
+        i = hash & (size - 1)
+        while buckets[i][1]:
+            i = (i + 1) & (size - 1)
+        buckets[i] = (hash, base + len(entries))
+        entries += ENTRY.pack(len(msgid), len(msgstr)) + msgid + msgstr
+
+    # Clusters may read the old file while it is replaced
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size))
+        f.write(b"".join(BUCKET.pack(*bucket) for bucket in buckets))
+        f.write(entries)
+    os.replace(tmp, path)
+
+
+def catalog_path(mo_path: str) -> str:
+    return f"{os.path.splitext(mo_path)[0]}.catalog"
+
+
+def ensure_compiled(mo_path: str) -> str:
+    """Compiles a .mo file if its catalog is missing or outdated and returns the catalog path"""
+    path = catalog_path(mo_path)
+    try:
+        outdated = os.path.getmtime(path) < os.path.getmtime(mo_path)
+    except FileNotFoundError:
+        outdated = True
+    if outdated:
+        compile_catalog(mo_path, path)
+    return path
+
+
+def compile_catalogs(locale_dir: str, domain: str = "idlerpg") -> None:
+    """Compiles all outdated catalogs, run before the clusters start"""
+    for mo_path in glob(os.path.join(locale_dir, "*", "LC_MESSAGES", f"{domain}.mo")):
+        ensure_compiled(mo_path)
+
+
+class Catalog(dict):
+    """
+    Translations of one locale, used like a dict of msgid -> translation
+    Strings are looked up in the memory mapped catalog on first use and kept,
+    untranslated strings map to themselves
+    """
+
+    __slots__ = ("_map", "_size")
+
+    def __init__(self, path: str | None = None) -> None:
+        super().__init__()
+        if path is None:
+            # No translations, e.g. for the source language
+            self._map = None
+            return
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a compiled catalog")
+
+    def __missing__(self, message: str) -> str:
+        translated = self.lookup(message.encode()) if self._map is not None else None
+        self[message] = translated = translated or message
+        return translated
+
+    def lookup(self, msgid: bytes) -> str | None:
+        hash = zlib.crc32(msgid)
+        mask = self._size - 1
+        i = hash & mask
+        while True:
+            bucket_hash, offset = BUCKET.unpack_from(
+                self._map, HEADER.size + i * BUCKET.size
+            )
+            if not offset:
+                return None
+            if bucket_hash == hash:
+                id_len, str_len = ENTRY.unpack_from(self._map, offset)
+                start = offset + ENTRY.size
+                if self._map[start : start + id_len] == msgid:
+                    return self._map[start + id_len : start + id_len + str_len].decode()
+            i = (i + 1) & mask
+
+    def gettext(self, message: str) -> str:
+        return self[message]
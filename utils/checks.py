@@ -163,9 +163,7 @@ def has_char() -> "_CheckDecorator":
     """Checks for a user to have a character."""
 
     async def predicate(ctx: Context) -> bool:
-        ctx.character_data = await ctx.bot.pool.fetchrow(
-            'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-        )
+        ctx.character_data = await ctx.loader.profile()
         if ctx.character_data:
             return True
         raise NoCharacter()
@@ -177,9 +175,7 @@ def has_no_char() -> "_CheckDecorator":
     """Checks for a user to have no character."""
 
     async def predicate(ctx: Context) -> bool:
-        if await ctx.bot.pool.fetchrow(
-            'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-        ):
+        if await ctx.loader.profile():
             raise NeedsNoCharacter()
         return True
 
@@ -213,10 +209,7 @@ def has_no_guild() -> "_CheckDecorator":
     """Checks for a user to be in no guild."""
 
     async def predicate(ctx: Context) -> bool:
-        if not hasattr(ctx, "character_data"):
-            ctx.character_data = await ctx.bot.pool.fetchrow(
-                'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+        ctx.character_data = await ctx.loader.profile()
         if not ctx.character_data["guild"]:
             return True
         raise NeedsNoGuild()
@@ -228,10 +221,8 @@ def has_guild() -> "_CheckDecorator":
     """Checks for a user to be in a guild."""
 
     async def predicate(ctx: Context) -> bool:
-        if not hasattr(ctx, "character_data"):
-            ctx.character_data = await ctx.bot.pool.fetchrow(
-                'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+        # Most guild commands need the guild as well, fetch both at once
+        ctx.character_data, _guild = await ctx.loader.load("profile", "guild")
         if ctx.character_data and ctx.character_data["guild"]:
             return True
         raise NoGuild()
@@ -243,10 +234,7 @@ def is_guild_officer() -> "_CheckDecorator":
     """Checks for a user to be guild officer or leader."""
 
     async def predicate(ctx: Context) -> bool:
-        if not hasattr(ctx, "character_data"):
-            ctx.character_data = await ctx.bot.pool.fetchrow(
-                'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+        ctx.character_data = await ctx.loader.profile()
         if (
             ctx.character_data["guildrank"] == "Leader"
             or ctx.character_data["guildrank"] == "Officer"
@@ -261,10 +249,7 @@ def is_guild_leader() -> "_CheckDecorator":
     """Checks for a user to be guild leader."""
 
     async def predicate(ctx: Context) -> bool:
-        if not hasattr(ctx, "character_data"):
-            ctx.character_data = await ctx.bot.pool.fetchrow(
-                'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+        ctx.character_data = await ctx.loader.profile()
         if ctx.character_data["guildrank"] == "Leader":
             return True
         raise NoGuildPermissions()
@@ -276,10 +261,7 @@ def is_no_guild_leader() -> "_CheckDecorator":
     """Checks for a user not to be guild leader."""
 
     async def predicate(ctx: Context) -> bool:
-        if not hasattr(ctx, "character_data"):
-            ctx.character_data = await ctx.bot.pool.fetchrow(
-                'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+        ctx.character_data = await ctx.loader.profile()
         if ctx.character_data["guildrank"] != "Leader":
             return True
         raise NeedsNoGuildLeader()
@@ -291,15 +273,8 @@ def is_alliance_leader() -> "_CheckDecorator":
     """Checks for a user to be the leader of an alliance."""
 
     async def predicate(ctx: Context) -> bool:
-
-        async with ctx.bot.pool.acquire() as conn:
-            if not hasattr(ctx, "character_data"):
-                ctx.character_data = await conn.fetchrow(
-                    'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-                )
-            leading_guild = await conn.fetchval(
-                'SELECT alliance FROM guild WHERE "id"=$1;', ctx.character_data["guild"]
-            )
+        ctx.character_data = await ctx.loader.profile()
+        leading_guild = await ctx.bot.get_guild_alliance(ctx.character_data["guild"])
         if (
             leading_guild == ctx.character_data["guild"]
             and ctx.character_data["guildrank"] == "Leader"
@@ -314,14 +289,9 @@ def owns_city() -> "_CheckDecorator":
     """Checks whether an alliance owns a city."""
 
     async def predicate(ctx: Context) -> bool:
+        ctx.character_data = await ctx.loader.profile()
+        alliance = await ctx.bot.get_guild_alliance(ctx.character_data["guild"])
         async with ctx.bot.pool.acquire() as conn:
-            if not hasattr(ctx, "character_data"):
-                ctx.character_data = await conn.fetchrow(
-                    'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-                )
-            alliance = await conn.fetchval(
-                'SELECT alliance FROM guild WHERE "id"=$1', ctx.character_data["guild"]
-            )
             owned_city = await conn.fetchval(
                 'SELECT name FROM city WHERE "owner"=$1', alliance
             )
@@ -337,14 +307,9 @@ def owns_no_city() -> "_CheckDecorator":
     """Checks whether an alliance owns no city."""
 
     async def predicate(ctx: Context) -> bool:
+        ctx.character_data = await ctx.loader.profile()
+        alliance = await ctx.bot.get_guild_alliance(ctx.character_data["guild"])
         async with ctx.bot.pool.acquire() as conn:
-            if not hasattr(ctx, "character_data"):
-                ctx.character_data = await conn.fetchrow(
-                    'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-                )
-            alliance = await conn.fetchval(
-                'SELECT alliance FROM guild WHERE "id"=$1', ctx.character_data["guild"]
-            )
             owned_city = await conn.fetchval(
                 'SELECT name FROM city WHERE "owner"=$1', alliance
             )
@@ -359,10 +324,7 @@ def is_class(class_: type[GameClass]) -> "_CheckDecorator":
     """Checks for a user to be in a class line."""
 
     async def predicate(ctx: Context) -> bool:
-        if not hasattr(ctx, "character_data"):
-            ctx.character_data = await ctx.bot.pool.fetchrow(
-                'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+        ctx.character_data = await ctx.loader.profile()
         classes = [
             c for i in ctx.character_data["class"] if (c := class_from_string(i))
         ]
@@ -389,10 +351,7 @@ def has_god() -> "_CheckDecorator":
     """Checks for a user to have a god."""
 
     async def predicate(ctx: Context) -> bool:
-        if not hasattr(ctx, "character_data"):
-            ctx.character_data = await ctx.bot.pool.fetchrow(
-                'SELECT * FROM profile WHERE "user"=$1;', ctx.author.id
-            )
+        ctx.character_data = await ctx.loader.profile()
         if ctx.character_data["god"]:
             return True
         raise NeedsGod()
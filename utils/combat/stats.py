@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
+
+from classes.classes import (
+    GameClass,
+    Mage,
+    Paragon,
+    Raider,
+    Ranger,
+    Ritualist,
+    Thief,
+    Warrior,
+)
+from classes.classes import from_string as class_from_string
+from classes.items import ItemType
+
+# Everything needed to resolve a user's combat stats in a single round-trip.
+# Equipped items are aggregated in the database, the per-item bonuses only
+# depend on the item types.
+STATS_QUERY = """
+SELECT
+    p."user",
+    p."class",
+    p."race",
+    p."guild",
+    p."god",
+    p."atkmultiply",
+    p."defmultiply",
+    g."alliance",
+    c."raid_building",
+    COALESCE(e."damage", 0) AS "item_damage",
+    COALESCE(e."armor", 0) AS "item_armor",
+    COALESCE(e."types", '{}') AS "item_types"
+FROM profile p
+LEFT JOIN LATERAL (
+    SELECT
+        SUM(ai."damage") AS "damage",
+        SUM(ai."armor") AS "armor",
+        ARRAY_AGG(ai."type") AS "types"
+    FROM allitems ai
+    JOIN inventory i ON (ai."id"=i."item")
+    WHERE ai."owner"=p."user" AND i."equipped" IS TRUE
+) e ON TRUE
+LEFT JOIN guild g ON (g."id"=p."guild")
+LEFT JOIN LATERAL (
+    SELECT c."raid_building" FROM city c WHERE c."owner"=g."alliance" LIMIT 1
+) c ON TRUE
+WHERE p."user"=ANY($1);
+"""
+
+RACE_BONUSES = {
+    "Human": (2, 2),
+    "Dwarf": (1, 3),
+    "Elf": (3, 1),
+    "Orc": (0, 4),
+    "Jikill": (4, 0),
+}
+
+# Which class line gets a bonus for which item types
+ITEM_BONUSES = (
+    (Paragon, (ItemType.Spear,), 5),
+    (Thief, (ItemType.Dagger, ItemType.Knife), 5),
+    (Warrior, (ItemType.Sword,), 5),
+    (Ranger, (ItemType.Bow,), 10),
+    (Mage, (ItemType.Wand,), 5),
+    (Ritualist, (ItemType.Wand,), 5),
+    (Raider, (ItemType.Axe,), 5),
+)
+
+
+@dataclass(frozen=True)
+class ClassBonuses:
+    classes: tuple[GameClass, ...]
+    # Extra damage per equipped item type name
+    item_damage: dict[str, int]
+    damage: int
+    armor: int
+    # Multiplier bonus for raids
+    raid_multiplier: Decimal
+
+
+@lru_cache(maxsize=None)
+def get_class_bonuses(classes: tuple[str, ...]) -> ClassBonuses:
+    """Parses a class combination once and returns all bonuses it gives"""
+    parsed = tuple(i for c in classes if (i := class_from_string(c)))
+    lines = {c.get_class_line() for c in parsed}
+
+    item_damage = {}
+    for line, types, bonus in ITEM_BONUSES:
+        if line in lines:
+            for type_ in types:
+                item_damage[type_.value] = bonus
+
+    damage = 0
+    armor = 0
+    raid_multiplier = Decimal("0")
+    for class_ in parsed:
+        line, grade = class_.get_class_line(), class_.class_grade()
+        if line == Mage:
+            damage += grade
+        elif line == Warrior:
+            armor += grade
+        elif line == Paragon:
+            damage += grade
+            armor += grade
+        elif line == Raider:
+            raid_multiplier += Decimal("0.1") * grade
+
+    return ClassBonuses(
+        classes=parsed,
+        item_damage=item_damage,
+        damage=damage,
+        armor=armor,
+        raid_multiplier=raid_multiplier,
+    )
+
+
+@dataclass(frozen=True)
+class CombatStats:
+    user: int
+    # Damage and armor from items, classes and race
+    damage: Decimal
+    armor: Decimal
+    # Raid multipliers including class and city building bonuses
+    atkmultiply: Decimal
+    defmultiply: Decimal
+    classes: tuple[GameClass, ...]
+    race: str
+    guild: int
+    alliance: int | None
+    god: str | None
+
+    @property
+    def raid_damage(self) -> Decimal:
+        return self.damage * self.atkmultiply
+
+    @property
+    def raid_armor(self) -> Decimal:
+        return self.armor * self.defmultiply
+
+    def in_class_line(self, class_line: type[GameClass]) -> bool:
+        return any(c.in_class_line(class_line) for c in self.classes)
+
+
+def calculate_damage_armor(item_damage, item_armor, item_types, bonuses, race):
+    """Calculates damage and armor from item totals, class bonuses and race"""
+    damage = item_damage + bonuses.damage
+    armor = item_armor + bonuses.armor
+    for type_ in item_types:
+        damage += bonuses.item_damage.get(type_, 0)
+    race_damage, race_armor = RACE_BONUSES.get(race, (0, 0))
+    return damage + race_damage, armor + race_armor
+
+
+def resolve_stats(row) -> CombatStats:
+    """Builds the combat stats for a row returned by STATS_QUERY"""
+    bonuses = get_class_bonuses(tuple(row["class"]))
+    damage, armor = calculate_damage_armor(
+        row["item_damage"],
+        row["item_armor"],
+        row["item_types"],
+        bonuses,
+        row["race"],
+    )
+    atkmultiply = row["atkmultiply"] + bonuses.raid_multiplier
+    defmultiply = row["defmultiply"] + bonuses.raid_multiplier
+    if building := row["raid_building"]:
+        atkmultiply += building * Decimal("0.1")
+        defmultiply += building * Decimal("0.1")
+    return CombatStats(
+        user=row["user"],
+        damage=damage,
+        armor=armor,
+        atkmultiply=atkmultiply,
+        defmultiply=defmultiply,
+        classes=bonuses.classes,
+        race=row["race"],
+        guild=row["guild"],
+        alliance=row["alliance"],
+        god=row["god"],
+    )
@@ -85,6 +85,7 @@ class DatabaseSection:
         "redis_port",
         "redis_database",
         "redis_shard_announce_channel",
+        "redis_cache_channel",
     }
 
     def __init__(self, data: dict[str, Any]) -> None:
@@ -99,6 +100,7 @@ class DatabaseSection:
         self.redis_shard_announce_channel = data.get(
             "redis_shard_announce_channel", "guild_channel"
         )
+        self.redis_cache_channel = data.get("redis_cache_channel", "cache_channel")
 
 
 class StatisticsSection:
@@ -0,0 +1,82 @@
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import math
+import time
+
+# Arms the cooldown if it is not active and returns -2, otherwise returns its TTL
+COOLDOWN_SCRIPT = """
+if redis.call("SET", KEYS[1], ARGV[1], "NX", "EX", ARGV[2]) then
+    return -2
+end
+return redis.call("TTL", KEYS[1])
+"""
+
+
+class RedisCooldowns:
+    """
+    Cross-process cooldowns stored in Redis.
+
+    Checking and arming a cooldown is a single atomic script call. Keys that
+    are known to be on cooldown are remembered locally for up to local_ttl
+    seconds, so spamming a command does not hit Redis at all. Resets done by
+    other processes are therefore seen after at most local_ttl seconds.
+    """
+
+    def __init__(self, redis, local_ttl=5):
+        self.redis = redis
+        self.local_ttl = local_ttl
+        self._script = redis.register_script(COOLDOWN_SCRIPT)
+        # key -> (trust local data until, cooldown ends at)
+        self._known = {}
+
+    def _remember(self, key, ttl):
+        now = time.monotonic()
+        self._known[key] = (now + min(ttl, self.local_ttl), now + ttl)
+        if len(self._known) > 10000:
+            self._known = {k: v for k, v in self._known.items() if v[0] > now}
+
+    def forget(self, key):
+        self._known.pop(key, None)
+
+    async def check(self, key, value, cooldown):
+        """
+        Arms the cooldown if it is not active and returns -2
+        Otherwise returns the remaining seconds of the cooldown
+        """
+        if (known := self._known.get(key)) is not None:
+            now = time.monotonic()
+            if known[0] > now:
+                return math.ceil(known[1] - now)
+            del self._known[key]
+
+        ttl = await self._script(keys=[key], args=[value, cooldown])
+        if ttl == -2:
+            self._remember(key, cooldown)
+        elif ttl > 0:
+            self._remember(key, ttl)
+        return ttl
+
+    async def set(self, key, value, cooldown):
+        """Sets a cooldown or overwrites it if it already exists"""
+        await self.redis.execute_command("SET", key, value, "EX", cooldown)
+        self._remember(key, cooldown)
+
+    async def reset(self, key):
+        """Resets a cooldown, returns whether it was active"""
+        self.forget(key)
+        return await self.redis.execute_command("DEL", key) == 1
@@ -21,17 +21,22 @@ Thanks to lambda and Scragly for precious help!
 """
 import ast
 import contextvars
-import gettext
-import inspect
+import hashlib
 import os.path
 
 from glob import glob
 from os import getcwd
 from typing import Any, Callable
 
+import orjson
+
+from utils.catalog import Catalog, ensure_compiled
+
 BASE_DIR = getcwd()
 default_locale = "en_US"
 locale_dir = "locales"
+# Command docstrings per source file, see i18n_docstring
+docstring_index_path = os.path.join(BASE_DIR, locale_dir, "docstrings.json")
 
 # https://github.com/python/mypy/issues/1317
 locales: frozenset[str] = frozenset(
@@ -41,59 +46,133 @@ locales: frozenset[str] = frozenset(
     )
 )
 
-gettext_translations = {
-    locale: gettext.translation(
-        "idlerpg", languages=(locale,), localedir=os.path.join(BASE_DIR, locale_dir)
-    )
-    for locale in locales
-}
+
+class Catalogs(dict):
+    """Locale -> Catalog, catalogs are only mapped once a locale is used"""
+
+    def __missing__(self, locale: str) -> Catalog:
+        if locale not in locales:
+            return self[default_locale]
+        mo_path = os.path.join(
+            BASE_DIR, locale_dir, locale, "LC_MESSAGES", "idlerpg.mo"
+        )
+        self[locale] = catalog = Catalog(ensure_compiled(mo_path))
+        return catalog
+
+
+catalogs = Catalogs()
 
 # source code is already in en_US.
 # we don't use default_locale as the key here
 # because the default locale for this installation may not be en_US
-gettext_translations["en_US"] = gettext.NullTranslations()
+catalogs["en_US"] = Catalog()
 locales = locales | {"en_US"}
 
 
-def use_current_gettext(*args: Any, **kwargs: Any) -> str:
-    if not gettext_translations:
-        return gettext.gettext(*args, **kwargs)
-
-    locale = current_locale.get()
-    return gettext_translations.get(
-        locale, gettext_translations[default_locale]
-    ).gettext(*args, **kwargs)
+def use_current_gettext(message: str) -> str:
+    return catalogs[current_locale.get()][message]
+
+
+def extract_docstrings(tree: ast.Module) -> dict[str, str]:
+    """Returns qualified name -> docstring of all functions whose body starts with _()"""
+    docs = {}
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                visit(child, f"{prefix}{child.name}.")
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                first = child.body[0]
+                if (
+                    isinstance(first, ast.Expr)
+                    and isinstance(call := first.value, ast.Call)
+                    and isinstance(call.func, ast.Name)
+                    and call.func.id == "_"
+                    and len(call.args) == 1
+                    and isinstance(call.args[0], ast.Constant)
+                    and isinstance(call.args[0].value, str)
+                ):
+                    docs[f"{prefix}{child.name}"] = call.args[0].value
+                visit(child, f"{prefix}{child.name}.<locals>.")
+
+    visit(tree, "")
+    return docs
+
+
+class DocstringIndex:
+    """
+    The docstrings of all source files, each file is parsed once and kept
+    on disk with the hash of its source until it changes
+    Changes are only written to disk by save(), once for all files.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._entries: dict[str, dict[str, Any]] | None = None
+        # filename -> (mtime, size, docstrings) of the files checked in this process
+        self._checked: dict[str, tuple[int, int, dict[str, str]]] = {}
+        self._dirty = False
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "rb") as f:
+                    self._entries = orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                self._entries = {}
+        return self._entries
+
+    def save(self) -> None:
+        """Writes the index to disk if any file changed"""
+        if not self._dirty:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(self._entries))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def docstrings(self, filename: str) -> dict[str, str]:
+        stat = os.stat(filename)
+        checked = self._checked.get(filename)
+        if checked is not None and checked[:2] == (stat.st_mtime_ns, stat.st_size):
+            return checked[2]
+
+        with open(filename, "rb") as f:
+            source = f.read()
+        source_hash = hashlib.sha1(source).hexdigest()
+        key = os.path.relpath(filename, BASE_DIR)
+        entries = self._load()
+        if (entry := entries.get(key)) is not None and entry["hash"] == source_hash:
+            docs = entry["docs"]
+        else:
+            docs = extract_docstrings(ast.parse(source, filename))
+            entries[key] = {"hash": source_hash, "docs": docs}
+            self._dirty = True
+        self._checked[filename] = (stat.st_mtime_ns, stat.st_size, docs)
+        return docs
+
+
+docstring_index = DocstringIndex(docstring_index_path)
+
+
+def index_docstrings(directory: str) -> None:
+    """Brings the docstring index up to date for all files in directory"""
+    for filename in glob(os.path.join(directory, "**", "*.py"), recursive=True):
+        docstring_index.docstrings(os.path.abspath(filename))
+    try:
+        docstring_index.save()
+    except OSError:
+        pass
 
 
 def i18n_docstring(func: Callable[[Any], Any]) -> Callable[[Any], Any]:
-    src = inspect.getsource(func)
-    # We heavily rely on the content of the function to be correct
     try:
-        parsed_tree = ast.parse(src)
-    except IndentationError:
-        parsed_tree = ast.parse("class Foo:\n" + src)
-        assert isinstance(parsed_tree.body[0], ast.ClassDef)
-        function_body: ast.ClassDef = parsed_tree.body[0]
-        assert isinstance(function_body.body[0], ast.AsyncFunctionDef)
-        tree: ast.AsyncFunctionDef = function_body.body[0]
-    else:
-        assert isinstance(parsed_tree.body[0], ast.AsyncFunctionDef)
-        tree = parsed_tree.body[0]
-
-    if not isinstance(tree.body[0], ast.Expr):
-        return func
-
-    gettext_call = tree.body[0].value
-    if not isinstance(gettext_call, ast.Call):
+        docs = docstring_index.docstrings(func.__code__.co_filename)
+    except OSError:
         return func
-
-    if not isinstance(gettext_call.func, ast.Name) or gettext_call.func.id != "_":
-        return func
-
-    assert len(gettext_call.args) == 1
-    assert isinstance(gettext_call.args[0], ast.Str)
-
-    func.__doc__ = gettext_call.args[0].s
+    if (doc := docs.get(func.__qualname__)) is not None:
+        func.__doc__ = doc
     return func
 
 
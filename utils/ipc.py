@@ -0,0 +1,87 @@
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+
+class Channels:
+    """
+    Names of the Redis channels used between the clusters and the launcher
+
+    Requests for all clusters go to the broadcast channel, requests for a
+    single cluster to its inbox and launcher requests to the launcher channel.
+    Replies are sent to a channel of their own that only the requester
+    subscribes to, so every process only decodes messages meant for it.
+    """
+
+    __slots__ = ("base", "broadcast", "launcher", "stats", "stats_snapshot")
+
+    def __init__(self, base: str) -> None:
+        self.base = base
+        self.broadcast = base
+        self.launcher = f"{base}:launcher"
+        # Keys for the stats every cluster reports and their aggregate
+        self.stats = f"{base}:stats"
+        self.stats_snapshot = f"{base}:stats:snapshot"
+
+    def cluster(self, cluster_id: int) -> str:
+        return f"{self.base}:cluster:{cluster_id}"
+
+    def reply(self, command_id: str) -> str:
+        return f"{self.base}:reply:{command_id}"
+
+    def view_owner(self, message_id: int) -> str:
+        # Not a channel, the key storing which cluster owns a message's view
+        return f"{self.base}:view:{message_id}"
+
+
+def cluster_for_shard(shard_id: int, shards_per_cluster: int) -> int:
+    """Returns the ID of the cluster the launcher starts a shard in"""
+    return shard_id // shards_per_cluster + 1
+
+
+@dataclass
+class ClusterReply:
+    cluster_id: int
+    # Seconds between sending the request and receiving this reply
+    latency: float
+    output: Any = None
+    error: str | None = None
+
+
+@dataclass
+class GatherResult:
+    """The replies to a request sent to all live clusters"""
+
+    replies: dict[int, ClusterReply] = field(default_factory=dict)
+    # Live clusters that did not answer in time
+    missing: set[int] = field(default_factory=set)
+
+    @property
+    def outputs(self) -> list[Any]:
+        return [r.output for r in self.replies.values() if r.error is None]
+
+    @property
+    def errors(self) -> dict[int, str]:
+        return {i: r.error for i, r in self.replies.items() if r.error is not None}
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing and not self.errors
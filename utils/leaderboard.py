@@ -0,0 +1,165 @@
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# Board name -> (table, primary key, ranked column)
+BOARDS = {
+    "money": ("profile", "user", "money"),
+    "xp": ("profile", "user", "xp"),
+    "pvpwins": ("profile", "user", "pvpwins"),
+    "lovescore": ("profile", "user", "lovescore"),
+    "guild_wins": ("guild", "id", "wins"),
+}
+
+# Returns the rank of ARGV[1] on every board in KEYS, or nil if it is missing
+# on any of them. The rank is the number of members with an equal or higher
+# score, just like COUNT(*) WHERE "column">=score.
+RANKS_SCRIPT = """
+local ranks = {}
+for i, key in ipairs(KEYS) do
+    local score = redis.call("ZSCORE", key, ARGV[1])
+    if not score then
+        return nil
+    end
+    ranks[i] = redis.call("ZCOUNT", key, score, "+inf")
+end
+return ranks
+"""
+
+# Replaces KEYS[2] with KEYS[1], a rebuild without any entries empties it
+REPLACE_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("RENAME", KEYS[1], KEYS[2])
+end
+return redis.call("DEL", KEYS[2])
+"""
+
+
+class Leaderboard:
+    """
+    Rankings kept in Redis sorted sets for O(log N) rank and top-K lookups.
+
+    The sets are updated from the notifications sent by the leaderboard
+    triggers in the database and periodically rebuilt from Postgres. All
+    reads fall back to SQL while a board has not been built yet.
+    """
+
+    def __init__(self, redis, pool, prefix="leaderboard", batch_size=5000):
+        self.redis = redis
+        self.pool = pool
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self._ranks = redis.register_script(RANKS_SCRIPT)
+        self._replace = redis.register_script(REPLACE_SCRIPT)
+        # board -> members changed while the board is being rebuilt
+        self._rebuilding = {}
+
+    def key(self, board):
+        return f"{self.prefix}:{board}"
+
+    async def top(self, board, columns="*", count=10):
+        """Returns the rows of the top count entries of a board, best first"""
+        table, pk, column = BOARDS[board]
+        ids = await self.redis.execute_command(
+            "ZREVRANGE", self.key(board), 0, count - 1
+        )
+        if not ids:
+            return await self.pool.fetch(
+                f'SELECT {columns} FROM {table} ORDER BY "{column}" DESC LIMIT $1;',
+                count,
+            )
+        return await self.pool.fetch(
+            f'SELECT {columns} FROM {table} WHERE "{pk}"=ANY($1) ORDER BY "{column}"'
+            " DESC;",
+            [int(i) for i in ids],
+        )
+
+    async def ranks(self, member, *boards):
+        """Returns the ranks of a member on the boards, None if not ranked"""
+        return await self._ranks(
+            keys=[self.key(board) for board in boards], args=[member]
+        )
+
+    async def apply(self, updates):
+        """
+        Applies notifications from the database triggers in order
+        A missing or null value removes the entry from the board
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for update in updates:
+            for board, (table, _pk, column) in BOARDS.items():
+                if update["table"] != table:
+                    continue
+                member = update["id"]
+                score = update.get(column)
+                keys = [self.key(board)]
+                if (dirty := self._rebuilding.get(board)) is not None:
+                    dirty.add(member)
+                    keys.append(self.key(f"{board}:rebuild"))
+                for key in keys:
+                    if score is None:
+                        pipe.execute_command("ZREM", key, member)
+                    else:
+                        pipe.execute_command("ZADD", key, score, member)
+        await pipe.execute()
+
+    async def rebuild(self, table):
+        """
+        Rebuilds all boards of a table from a consistent snapshot
+        Entries changed while rebuilding are kept at their newer value
+        """
+        boards = {
+            board: column for board, (t, _pk, column) in BOARDS.items() if t == table
+        }
+        pk = next(BOARDS[board][1] for board in boards)
+        for board in boards:
+            await self.redis.execute_command("DEL", self.key(f"{board}:rebuild"))
+            self._rebuilding[board] = set()
+
+        columns = ", ".join(f'"{column}"' for column in boards.values())
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction(isolation="repeatable_read", readonly=True):
+                    batch = []
+                    async for row in conn.cursor(
+                        f'SELECT "{pk}", {columns} FROM {table};',
+                        prefetch=self.batch_size,
+                    ):
+                        batch.append(row)
+                        if len(batch) >= self.batch_size:
+                            await self._write_batch(boards, pk, batch)
+                            batch = []
+                    await self._write_batch(boards, pk, batch)
+
+            for board in boards:
+                await self._replace(
+                    keys=[self.key(f"{board}:rebuild"), self.key(board)]
+                )
+        finally:
+            for board in boards:
+                del self._rebuilding[board]
+
+    async def _write_batch(self, boards, pk, rows):
+        pipe = self.redis.pipeline(transaction=False)
+        for board, column in boards.items():
+            dirty = self._rebuilding[board]
+            entries = []
+            for row in rows:
+                if row[column] is not None and row[pk] not in dirty:
+                    entries += (row[column], row[pk])
+            if entries:
+                pipe.execute_command("ZADD", self.key(f"{board}:rebuild"), *entries)
+        await pipe.execute()
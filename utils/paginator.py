@@ -279,6 +279,9 @@ class ChooseLong(discord.ui.View):
             )
         )
         self.message = await messagable.send(embed=self.pages[0], view=self)
+        # Context.send registers the view itself
+        if messagable is not self.ctx:
+            await self.ctx.bot.register_view(self.message, self)
 
     def cleanup(self) -> None:
         asyncio.create_task(self.message.delete())
@@ -538,6 +541,9 @@ class ChooseView(discord.ui.View):
             else self.ctx.author
         )
         self.message = await messagable.send(embed=embed, view=self)
+        # Context.send registers the view itself
+        if messagable is not self.ctx:
+            await self.ctx.bot.register_view(self.message, self)
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if self.allowed_user.id == interaction.user.id:
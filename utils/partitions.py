@@ -0,0 +1,184 @@
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import datetime
+import logging
+
+import asyncpg
+
+log = logging.getLogger(__name__)
+
+# Partitioned table -> how many months of raw rows are kept attached
+RETENTION_MONTHS = {
+    "transactions": 12,
+    "market_history": 3,
+}
+# How many months of partitions exist ahead of the current one
+MONTHS_AHEAD = 2
+# Rolled up days that are rolled up again, sales are logged in the background
+# and may arrive after their day was rolled up
+ROLLUP_LOOKBACK = datetime.timedelta(days=2)
+
+# Sales of a day per item type and stat band. The band is the item's armor for
+# shields, damage otherwise, rounded down.
+ROLLUP_QUERY = """
+INSERT INTO market_history_daily (
+    "day", "type", "band", "sales", "total_price", "avg_price", "median_price",
+    "min_price", "max_price"
+)
+SELECT
+    "timestamp"::date,
+    "type",
+    floor(CASE WHEN "type"='Shield' THEN "armor" ELSE "damage" END)::smallint,
+    count(*),
+    sum("price"),
+    avg("price"),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY "price"),
+    min("price"),
+    max("price")
+FROM market_history
+WHERE "timestamp">=$1 AND "timestamp"<$2
+GROUP BY 1, 2, 3
+ON CONFLICT ("day", "type", "band") DO UPDATE SET
+    "sales"=EXCLUDED."sales",
+    "total_price"=EXCLUDED."total_price",
+    "avg_price"=EXCLUDED."avg_price",
+    "median_price"=EXCLUDED."median_price",
+    "min_price"=EXCLUDED."min_price",
+    "max_price"=EXCLUDED."max_price";
+"""
+
+
+def month_start(date: datetime.date, offset: int = 0) -> datetime.date:
+    """The first day of the month offset months after date"""
+    months = date.year * 12 + date.month - 1 + offset
+    return datetime.date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+async def create_partitions(
+    conn: asyncpg.Connection, table: str, today: datetime.date
+) -> None:
+    """Creates the partitions from the current month to MONTHS_AHEAD months ahead"""
+    for offset in range(MONTHS_AHEAD + 1):
+        start, end = month_start(today, offset), month_start(today, offset + 1)
+        try:
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} PARTITION"
+                f" OF {table} FOR VALUES FROM ('{start}') TO ('{end}');"
+            )
+        except asyncpg.InvalidObjectDefinitionError:
+            # The legacy partition of a migrated table covers this month
+            continue
+        except asyncpg.CheckViolationError:
+            # Rows for this month already went to the default partition
+            await move_from_default(conn, table, start, end)
+
+
+async def move_from_default(
+    conn: asyncpg.Connection, table: str, start: datetime.date, end: datetime.date
+) -> None:
+    """
+    Creates the partition for the month starting at start and moves its rows
+    out of the default partition, which retention never detaches
+    """
+    name, default = partition_name(table, start), f"{table}_default"
+    async with conn.transaction():
+        await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {default};")
+        await conn.execute(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start}')"
+            f" TO ('{end}');"
+        )
+        moved = await conn.fetchval(
+            f'WITH moved AS (DELETE FROM {default} WHERE "timestamp">=$1 AND'
+            f' "timestamp"<$2 RETURNING *), inserted AS (INSERT INTO {name}'
+            " SELECT * FROM moved RETURNING 1) SELECT count(*) FROM inserted;",
+            start,
+            end,
+        )
+        await conn.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT;")
+    log.error(f"Moved {moved} rows from {default} into the late partition {name}")
+
+
+async def rollup_until(conn: asyncpg.Connection) -> datetime.date | None:
+    """The first day that is not rolled up yet, None if nothing is"""
+    last = await conn.fetchval('SELECT max("day") FROM market_history_daily;')
+    return last + datetime.timedelta(days=1) if last is not None else None
+
+
+async def rollup_market_history(conn: asyncpg.Connection, until: datetime.date) -> None:
+    """
+    Rolls up all market sales of the days before until that are not yet and
+    rolls up the last ROLLUP_LOOKBACK of rolled up days again
+    """
+    start = await rollup_until(conn)
+    if start is None:
+        start = await conn.fetchval(
+            'SELECT min("timestamp")::date FROM market_history;'
+        )
+    else:
+        start -= ROLLUP_LOOKBACK
+    if start is None or start >= until:
+        return
+    async with conn.transaction():
+        await conn.execute(ROLLUP_QUERY, start, until)
+
+
+async def detach_partitions(
+    conn: asyncpg.Connection, table: str, before: datetime.date
+) -> list[str]:
+    """Detaches the monthly partitions of table that end before the given day"""
+    partitions = await conn.fetch(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid=i.inhrelid"
+        " WHERE i.inhparent=$1::regclass;",
+        table,
+    )
+    detached = []
+    for row in partitions:
+        name = row["relname"]
+        try:
+            month = datetime.datetime.strptime(
+                name.removeprefix(f"{table}_"), "%Y_%m"
+            ).date()
+        except ValueError:
+            # The default or legacy partition
+            continue
+        if month_start(month, 1) <= before:
+            await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name};")
+            detached.append(name)
+    return detached
+
+
+async def maintain(conn: asyncpg.Connection, today: datetime.date) -> None:
+    """
+    Creates upcoming partitions, rolls up finished days of market sales and
+    detaches partitions past their retention
+    Market partitions are only detached once all of their days are rolled up.
+    """
+    for table in RETENTION_MONTHS:
+        await create_partitions(conn, table, today)
+    await rollup_market_history(conn, today)
+
+    for table, months in RETENTION_MONTHS.items():
+        before = month_start(today, -months)
+        if table == "market_history":
+            before = min(before, await rollup_until(conn) or before)
+        for name in await detach_partitions(conn, table, before):
+            log.info(f"Detached partition {name}")
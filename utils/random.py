@@ -15,13 +15,117 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-import secrets
+import os
+import random as _random
 
 from collections.abc import Sequence, Set
 from copy import copy
+from itertools import islice
 
-choice = secrets.choice
-randbits = secrets.randbits
+# Bytes fetched from the OS per refill, one syscall serves thousands of draws
+BUFFER_SIZE = 64 * 1024
+# Draws are served as unsigned words of these widths in bytes
+WIDTHS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+# The smallest word width for every bit count up to 64
+WIDTH_FOR_BITS = [next(w for w in WIDTHS if w * 8 >= k) for k in range(65)]
+RECIP_BPF = 2**-53
+
+
+class BufferedRandom(_random.Random):
+    """A cryptographically secure random generator like random.SystemRandom.
+
+    Instead of asking the OS for every draw, it reads a large buffer from
+    os.urandom per word width and hands out its words until it is used up.
+    Iterating a buffer is atomic, so every word is only handed out once even
+    with multiple threads, and forked children discard the buffers.
+    """
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self._size = buffer_size
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        super().__init__()
+
+    def _reset(self):
+        self._words = {width: iter(()) for width in WIDTHS}
+
+    def _refill(self, width):
+        buffer = memoryview(os.urandom(self._size)).cast(WIDTHS[width])
+        self._words[width] = iter(buffer)
+
+    def _word(self, width):
+        while True:
+            try:
+                return next(self._words[width])
+            except StopIteration:
+                self._refill(width)
+
+    def _randbelow(self, n):
+        """Return a random int in the range [0,n)."""
+        if n <= 0:
+            raise ValueError("Upper bound must be positive.")
+        k = n.bit_length()
+        if k > 64:
+            return super()._randbelow_with_getrandbits(n)
+        width = WIDTH_FOR_BITS[k]
+        shift = width * 8 - k
+        r = self._word(width) >> shift
+        while r >= n:
+            r = self._word(width) >> shift
+        return r
+
+    def random(self):
+        """Get the next random number in the range 0.0 <= x < 1.0."""
+        return (self._word(8) >> 11) * RECIP_BPF
+
+    def getrandbits(self, k):
+        """getrandbits(k) -> x.  Generates an int with k random bits."""
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        if k <= 64:
+            width = WIDTH_FOR_BITS[k]
+            return self._word(width) >> (width * 8 - k) if k else 0
+        n = (k + 7) // 8
+        return int.from_bytes(os.urandom(n), "big") >> (n * 8 - k)
+
+    def randbytes(self, n):
+        """Generate n random bytes."""
+        return os.urandom(n)
+
+    def randbelows(self, n, below):
+        """Returns n random integers in the range [0, below)."""
+        if below <= 0:
+            raise ValueError("Upper bound must be positive.")
+        k = below.bit_length()
+        if k > 64:
+            return [self._randbelow(below) for _i in range(n)]
+        width = WIDTH_FOR_BITS[k]
+        shift = width * 8 - k
+        results = []
+        while (missing := n - len(results)) > 0:
+            words = list(islice(self._words[width], missing))
+            if len(words) < missing:
+                self._refill(width)
+            # Rejecting values that are too large keeps the distribution uniform
+            results.extend(r for w in words if (r := w >> shift) < below)
+        return results
+
+    def seed(self, *args, **kwargs):
+        """Stub method. Not used for a system random number generator."""
+        return None
+
+    def _notimplemented(self, *args, **kwargs):
+        """Method should not be called for a system random number generator."""
+        raise NotImplementedError("System entropy source does not have state.")
+
+    getstate = setstate = _notimplemented
+
+
+_rng = BufferedRandom()
+
+choice = _rng.choice
+randbits = _rng.getrandbits
+randbelow = _rng._randbelow
 
 
 def sample(population, k):
@@ -41,7 +145,7 @@ def sample(population, k):
 
     results = []
     for i in range(k):
-        results.append(population.pop(secrets.randbelow(n - i)))
+        results.append(population.pop(randbelow(n - i)))
 
     return results
 
@@ -54,4 +158,17 @@ def shuffle(population):
 def randint(a, b):
     """Return random integer in range [a, b], including both end points."""
     a, b = int(a), int(b)
-    return secrets.randbelow(b - a + 1) + a
+    return randbelow(b - a + 1) + a
+
+
+def randints(n, a, b):
+    """Returns n random integers in range [a, b], including both end points."""
+    a, b = int(a), int(b)
+    return [i + a for i in _rng.randbelows(n, b - a + 1)]
+
+
+def choices(population, weights=None, *, cum_weights=None, k=1):
+    """Chooses k random elements from a population sequence with replacement."""
+    if weights is not None or cum_weights is not None:
+        return _rng.choices(population, weights, cum_weights=cum_weights, k=k)
+    return [population[i] for i in _rng.randbelows(k, len(population))]
@@ -0,0 +1,314 @@
+"""
+The IdleRPG Discord Bot
+Copyright (C) 2018-2021 Diniboy and Gelbpunkt
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import datetime
+import logging
+import time
+
+from typing import Any
+
+import asyncpg
+import orjson
+
+log = logging.getLogger(__name__)
+
+TRANSACTION_COLUMNS = (
+    "from",
+    "to",
+    "subject",
+    "command",
+    "amount",
+    "item",
+    "rarity",
+    "data",
+    "timestamp",
+)
+MARKET_COLUMNS = (
+    "item",
+    "name",
+    "value",
+    "type",
+    "damage",
+    "armor",
+    "signature",
+    "price",
+    "offer",
+    "timestamp",
+)
+
+# Keys of the logged data that hold the amount, in order of preference
+AMOUNT_KEYS = ("Amount", "Gold", "Price", "price")
+
+
+def _int(value: Any) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def structure(data: dict[str, Any]) -> tuple[Any, ...]:
+    """
+    Returns the amount, item ID, crate rarity and the JSON payload of the data
+    logged for a transaction
+    """
+    amount = next((_int(data[k]) for k in AMOUNT_KEYS if k in data), None)
+    item = _int(data.get("Id", data.get("id")))
+    if not isinstance(rarity := data.get("Rarity"), str) or len(rarity) > 10:
+        rarity = None
+    payload = orjson.dumps(dict(data), default=str).decode()
+    return amount, item, rarity, payload
+
+
+def parse_info(info: str) -> tuple[str | None, dict[str, str]]:
+    """Splits the text info of old transactions into the command and the data"""
+    command = None
+    data = {}
+    for line in info.splitlines():
+        key, _sep, value = line.partition(": ")
+        if key in ("From", "To", "Subject"):
+            continue
+        if key == "Command":
+            command = value
+        else:
+            data[key] = value
+    return command, data
+
+
+# Both halves use the ("from"/"to", "timestamp") indexes and stop after limit rows
+TRANSFERS_QUERY = """
+(
+    SELECT * FROM transactions
+    WHERE "from"=$1 AND "timestamp">=$2 AND "timestamp"<$3
+    ORDER BY "timestamp" DESC LIMIT $4
+)
+UNION ALL
+(
+    SELECT * FROM transactions
+    WHERE "to"=$1 AND "from"<>$1 AND "timestamp">=$2 AND "timestamp"<$3
+    ORDER BY "timestamp" DESC LIMIT $4
+)
+ORDER BY "timestamp" DESC LIMIT $4;
+"""
+
+
+async def fetch_transfers(
+    conn: asyncpg.Pool | asyncpg.Connection,
+    user: int,
+    since: datetime.datetime,
+    until: datetime.datetime | None = None,
+    limit: int = 100,
+) -> list[asyncpg.Record]:
+    """Returns the newest transactions from or to user between since and until"""
+    if until is None:
+        until = datetime.datetime.now(datetime.timezone.utc)
+    return await conn.fetch(TRANSFERS_QUERY, user, since, until, limit)
+
+
+# Single items are in the item column, items logged together (like from
+# opening crates) in the "Items" list of the data, which the GIN index covers
+ITEM_TRANSACTIONS_QUERY = """
+(
+    SELECT * FROM transactions WHERE "item"=$1
+    ORDER BY "timestamp" DESC LIMIT $2
+)
+UNION ALL
+(
+    SELECT * FROM transactions
+    WHERE "data" @> jsonb_build_object('Items', jsonb_build_array(
+        jsonb_build_object('Id', $1::bigint)
+    ))
+    ORDER BY "timestamp" DESC LIMIT $2
+)
+ORDER BY "timestamp" DESC LIMIT $2;
+"""
+
+
+async def fetch_item_transactions(
+    conn: asyncpg.Pool | asyncpg.Connection, item: int, limit: int = 100
+) -> list[asyncpg.Record]:
+    """Returns the newest transactions that involved an item"""
+    return await conn.fetch(ITEM_TRANSACTIONS_QUERY, item, limit)
+
+
+class TransactionLog:
+    """
+    Buffers transaction log rows in a bounded queue and writes them in batches
+    with COPY, every interval seconds or once max_rows are queued
+
+    log() only waits when the queue is full, or with persist=True until the
+    batch holding the row is committed.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        max_rows: int = 500,
+        interval: float = 0.5,
+        maxsize: int = 20000,
+    ) -> None:
+        self.pool = pool
+        self.max_rows = max_rows
+        self.interval = interval
+        # (transaction row, market_history row or None, future or None)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._task: asyncio.Task | None = None
+
+        self.written = 0
+        self.batches = 0
+        # log() calls that had to wait for space in the queue
+        self.blocked = 0
+        self.failures = 0
+        # Total time spent writing batches in seconds
+        self.write_time = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+        self._task.add_done_callback(self._restart)
+
+    async def close(self, timeout: float = 10) -> None:
+        """Stops the writer after writing everything that is queued"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Dropped {self.queued} unwritten transactions")
+        task, self._task = self._task, None
+        task.cancel()
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def maxsize(self) -> int:
+        return self._queue.maxsize
+
+    async def log(
+        self,
+        transaction: tuple[Any, ...],
+        market: tuple[Any, ...] | None = None,
+        persist: bool = False,
+    ) -> None:
+        future = asyncio.get_running_loop().create_future() if persist else None
+        entry = (transaction, market, future)
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.blocked += 1
+            await self._queue.put(entry)
+        if future is not None:
+            await future
+
+    def _restart(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task is not self._task:
+            return
+        log.error("Transaction writer stopped, restarting", exc_info=task.exception())
+        self.start()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.interval
+            # Rows that have to be persisted do not wait for a full batch
+            urgent = batch[0][2] is not None
+            while len(batch) < self.max_rows:
+                try:
+                    entry = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    if urgent or (timeout := deadline - loop.time()) <= 0:
+                        break
+                    try:
+                        entry = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                batch.append(entry)
+                urgent = urgent or entry[2] is not None
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self.failures += 1
+                log.exception(f"Dropped {len(batch)} transactions")
+                for _transaction, _market, future in batch:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+            finally:
+                for _entry in batch:
+                    self._queue.task_done()
+
+    async def _copy(
+        self, conn: asyncpg.Connection, batch: list[tuple[Any, ...]]
+    ) -> None:
+        transactions = [transaction for transaction, _market, _future in batch]
+        market = [market for _transaction, market, _future in batch if market]
+        async with conn.transaction():
+            await conn.copy_records_to_table(
+                "transactions", records=transactions, columns=TRANSACTION_COLUMNS
+            )
+            if market:
+                await conn.copy_records_to_table(
+                    "market_history", records=market, columns=MARKET_COLUMNS
+                )
+
+    async def _write(self, batch: list[tuple[Any, ...]]) -> None:
+        start = time.perf_counter()
+        while True:
+            try:
+                async with self.pool.acquire() as conn:
+                    await self._copy(conn, batch)
+            except (
+                OSError,
+                asyncpg.PostgresConnectionError,
+                asyncpg.ConnectionDoesNotExistError,
+            ) as e:
+                # Keep the rows and try again, the queue fills up meanwhile
+                self.failures += 1
+                log.warning(f"Failed to write {len(batch)} transactions: {e}")
+                await asyncio.sleep(1)
+                continue
+            except Exception as e:
+                # Some row is invalid, write them one by one to only drop it
+                self.failures += 1
+                log.warning(f"Writing {len(batch)} transactions one by one: {e}")
+                await self._write_each(batch)
+                return
+            break
+
+        self.write_time += time.perf_counter() - start
+        self.written += len(batch)
+        self.batches += 1
+        for _transaction, _market, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def _write_each(self, batch: list[tuple[Any, ...]]) -> None:
+        async with self.pool.acquire() as conn:
+            for entry in batch:
+                future = entry[2]
+                try:
+                    await self._copy(conn, [entry])
+                except Exception as e:
+                    log.error(f"Dropped invalid transaction {entry[0]}: {e}")
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+                    continue
+                self.written += 1
+                if future is not None and not future.done():
+                    future.set_result(None)